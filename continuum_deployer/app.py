@@ -8,6 +8,7 @@ from continuum_deployer.dsl.importer.importer import Importer
 from continuum_deployer.dsl.importer.helm import Helm
 from continuum_deployer.resources.resources import Resources
 from continuum_deployer.utils.match_cli import MatchCli
+from continuum_deployer.utils import tracing
 from continuum_deployer.utils.ui import UI
 
 
@@ -19,6 +20,10 @@ _HELPTEXT_OUTPUT = 'Path to output file'
 _HELPTEXT_PLUGINS = 'Additional plugins directory path'
 _HELPTEXT_SOLVER = 'Type of solver'
 _HELPTEXT_SOLVERMODE = 'Mode (target) of solver'
+_HELPTEXT_SOLVERCONFIG = 'Path to YAML file with solver setting values'
+_HELPTEXT_TRACELEVEL = 'Level of the solver trace'
+_HELPTEXT_PARTIAL = 'Place the deployments that fit if the preflight checks fail, instead of stopping'
+_HELPTEXT_TRACEFILE = 'Path to JSONL file the solver trace is written to, stderr if not given'
 
 
 @click.group()
@@ -73,17 +78,25 @@ def parse_resources(file):
 @click.option('-T', '--dsltype', type=click.Choice(Importer.DSL_TYPES), default=None, show_default=True, help=_HELPTEXT_TYPEDSL)
 @click.option('-t', '--type', type=click.Choice(['yaml', 'chart']), default=None, help=_HELPTEXT_TYPE)
 @click.option('-p', '--plugins', type=str, default=None, show_default=True, help=_HELPTEXT_PLUGINS)
-@click.option('-s', '--solver', type=click.Choice(['0', '1']), default=None, help=_HELPTEXT_SOLVER)
+@click.option('-s', '--solver', type=click.Choice(['0', '1', '2', '3', '4']), default=None, help=_HELPTEXT_SOLVER)
 @click.option('-m', '--solver-mode', type=click.Choice(['0', '1', '2', '3', '4', '5']), default=None, help=_HELPTEXT_SOLVERMODE)
-def match(resources, deployment, dsltype, type, plugins, solver, solver_mode):
+@click.option('-c', '--solver-config', type=str, default=None, help=_HELPTEXT_SOLVERCONFIG)
+@click.option('--trace-level', type=click.Choice(list(tracing.LEVELS)), default='off', show_default=True, help=_HELPTEXT_TRACELEVEL)
+@click.option('--trace-file', type=str, default=None, help=_HELPTEXT_TRACEFILE)
+@click.option('--partial', is_flag=True, default=False, help=_HELPTEXT_PARTIAL)
+def match(resources, deployment, dsltype, type, plugins, solver, solver_mode, solver_config, trace_level, trace_file,
+          partial):
     """Match deployments interactively"""
 
+    tracing.configure(trace_level, trace_file)
+
     # FIXME: -t and -s should be linked to what plugins provide
     if plugins != None:
         plugins_loader.add_plugins_path(plugins)
         plugins_loader.load_plugins()
 
-    match_cli = MatchCli(resources, deployment, dsltype, type, solver, solver_mode)
+    match_cli = MatchCli(resources, deployment, dsltype, type, solver, solver_mode, solver_config,
+                         preflight_strict=not partial)
     match_cli.start()
 
 
@@ -1,12 +1,14 @@
 import yaml
 
 from continuum_deployer.dsl.exporter.exporter import Exporter
-from continuum_deployer.resources.deployment import DeploymentEntity
+from continuum_deployer.resources.deployment import DeploymentEntity, DeploymentReplica
 from continuum_deployer.resources.resource_entity import ResourceEntity
 
 
 class Kubernetes(Exporter):
 
+    KUBE_HOSTNAME_LABEL_KEY = 'kubernetes.io/hostname'
+
     @staticmethod
     def _add_hostname_label(hostname, deployment: DeploymentEntity):
         """Adds Kubernetes hostname label to deployments
@@ -19,13 +21,44 @@ class Kubernetes(Exporter):
         :rtype: :class:`continuum_deployer.resources.deployment.DeploymentEntity`
         """
 
-        KUBE_HOSTNAME_LABEL_KEY = 'kubernetes.io/hostname'
         result = deployment.yaml
         result.get('spec').get('template').get('spec')['nodeSelector'] = {
-            KUBE_HOSTNAME_LABEL_KEY: hostname}
+            Kubernetes.KUBE_HOSTNAME_LABEL_KEY: hostname}
         deployment.yaml = result
         return deployment
 
+    @staticmethod
+    def _replica_manifest(hostname, template: DeploymentEntity, count, split):
+        """Creates the manifest for the replicas of a deployment placed on one node.
+        Only the changed parts of the shared template definition are copied.
+
+        :param hostname: node hostname, content of added label
+        :type hostname: str
+        :param template: deployment the replicas were created from
+        :type template: :class:`continuum_deployer.resources.deployment.DeploymentEntity`
+        :param count: number of replicas placed on the node
+        :type count: int
+        :param split: flag if the replicas are spread over multiple nodes,
+            the name is extended with the hostname in that case
+        :type split: bool
+        :return: manifest for the replicas on the node
+        :rtype: dict
+        """
+
+        result = dict(template.yaml)
+        result['metadata'] = dict(result.get('metadata'))
+        result['spec'] = dict(result.get('spec'))
+        result['spec']['template'] = dict(result['spec'].get('template'))
+        result['spec']['template']['spec'] = dict(
+            result['spec']['template'].get('spec'))
+
+        if split:
+            result['metadata']['name'] = '{}-{}'.format(template.name, hostname)
+        result['spec']['replicas'] = count
+        result['spec']['template']['spec']['nodeSelector'] = {
+            Kubernetes.KUBE_HOSTNAME_LABEL_KEY: hostname}
+        return result
+
     def _output(self, content):
         """Helper method that exports content to different output targets
 
@@ -52,8 +85,28 @@ class Kubernetes(Exporter):
         Args:
             matched_resources (Resources): Array of matched resources to extract
         """
+        # find the nodes the replicas of each deployment are spread over
+        _spread = dict()
+        for resource in matched_resources:
+            for deployment in resource.get_deployments():
+                if isinstance(deployment, DeploymentReplica):
+                    _spread.setdefault(id(deployment.template),
+                                       set()).add(resource.name)
+
         for resource in matched_resources:
+            # replicas of the same deployment are exported as one manifest per node
+            _replica_groups = dict()
             for deployment in resource.get_deployments():
+                if isinstance(deployment, DeploymentReplica):
+                    _template, _count = _replica_groups.get(
+                        id(deployment.template), (deployment.template, 0))
+                    _replica_groups[id(_template)] = (_template, _count + 1)
+                    continue
                 deployment = Kubernetes._add_hostname_label(
                     resource.name, deployment)
                 self._output(yaml.dump(deployment.yaml))
+
+            for template, count in _replica_groups.values():
+                _manifest = Kubernetes._replica_manifest(
+                    resource.name, template, count, len(_spread[id(template)]) > 1)
+                self._output(yaml.dump(_manifest))
@@ -1,5 +1,5 @@
 import os
-import copy
+import re
 import yaml
 import json
 import click
@@ -11,18 +11,108 @@ from bitmath import KiB, MiB, GiB, TiB, PiB, EiB, kB, MB, GB, TB, PB, EB
 from progress.spinner import Spinner
 
 from continuum_deployer.dsl.importer.importer import Importer
-from continuum_deployer.resources.deployment import DeploymentEntity
-from continuum_deployer.utils.config import Config, Setting, SettingValue
+from continuum_deployer.resources.deployment import DeploymentEntity, LazyDeploymentEntity
+from continuum_deployer.solving import parallel
+from continuum_deployer.utils.config import Config, Setting, SettingValue, NumericSetting
 from continuum_deployer.utils.file_handling import FileHandling
 from continuum_deployer.utils.exceptions import RequirementsError, FileTypeNotSupported, ImporterError
 
 
+def extract_documents(documents, kinds):
+    """Worker entry point that constructs YAML documents and extracts the
+    values of the workloads among them
+
+    :param documents: text of each document
+    :type documents: list
+    :param kinds: kinds of workload documents
+    :type kinds: list
+    :return: index of the document, extracted values and warnings per workload
+    :rtype: list
+    """
+    _results = []
+    for index, document in enumerate(documents):
+        doc = yaml.load(document, Loader=FileHandling.YAML_LOADER)
+        if doc is None or doc['kind'] not in kinds:
+            continue
+        _fields, _warnings = Helm.extract_fields(doc)
+        _results.append((index, _fields, _warnings))
+    return _results
+
+
 class Helm(Importer):
 
     K8S_OBJECTS = ['Deployment', 'ReplicaSet',
                    'StatefulSet', 'DaemonSet', 'Jobs', 'CronJob']
     K8S_SCALE_CONTROLLER = ['Deployment', 'ReplicaSet', 'StatefulSet']
 
+    # document start markers, YAML does not allow them inside scalars
+    DOCUMENT_START = re.compile(r'^---(?=[ \t\r\n]|$)', re.M)
+    # plain or quoted top-level kind of a document
+    DOCUMENT_KIND = re.compile(r'^kind:[ \t]*(["\']?)([A-Za-z0-9]+)\1[ \t]*(?:#.*)?\r?$', re.M)
+    # top-level keys and directives the kind scan does not understand
+    DOCUMENT_UNSCANNABLE = re.compile(r'^(?:%|kind\b|["\'{\[?])', re.M)
+
+    @staticmethod
+    def split_documents(dsl_input):
+        """Splits a multi-document YAML stream at the document start markers
+        without constructing the documents
+
+        :param dsl_input: YAML stream
+        :type dsl_input: str
+        :return: text of each document, including its start marker
+        :rtype: list
+        """
+        _starts = [m.start() for m in Helm.DOCUMENT_START.finditer(dsl_input)]
+        if not _starts or _starts[0] != 0:
+            _starts.insert(0, 0)
+        _starts.append(len(dsl_input))
+        return [dsl_input[start:end] for start, end in zip(_starts, _starts[1:])]
+
+    @staticmethod
+    def scan_kind(document):
+        """Reads the top-level kind of a YAML document from its text
+
+        :param document: text of a single YAML document
+        :type document: str
+        :return: kind of the document, None if it can not be told without
+            constructing the document
+        :rtype: str
+        """
+        _kinds = Helm.DOCUMENT_KIND.findall(document)
+        if len(_kinds) != 1:
+            return None
+        if len(Helm.DOCUMENT_UNSCANNABLE.findall(document)) != 1:
+            # directives, flow style or quoted and complex keys
+            return None
+        if document.startswith('---'):
+            _marker = document.split('\n', 1)[0][3:].strip()
+            if _marker and not _marker.startswith('#'):
+                # content on the start marker line, e.g. tags or block scalars
+                return None
+        return _kinds[0][1]
+
+    def load_workload_documents(self, dsl_input):
+        """Constructs the documents of a YAML stream that may describe a workload.
+        Documents of other kinds are skipped before construction, documents
+        whose kind can not be scanned are constructed.
+
+        :param dsl_input: YAML stream
+        :type dsl_input: str or file
+        :return: generator of the constructed documents
+        :rtype: generator
+        """
+        if hasattr(dsl_input, 'read'):
+            dsl_input = dsl_input.read()
+        if re.search(r'^%', dsl_input, re.M):
+            # directives belong to the document after them, keep the stream intact
+            yield from yaml.load_all(dsl_input, Loader=FileHandling.YAML_LOADER)
+            return
+        for document in Helm.split_documents(dsl_input):
+            _kind = Helm.scan_kind(document)
+            if _kind is not None and _kind not in self.K8S_OBJECTS:
+                continue
+            yield yaml.load(document, Loader=FileHandling.YAML_LOADER)
+
     @staticmethod
     def parse_k8s_cpu_value(cpu_value):
         """Parse and convert Kubernetes specific CPU value
@@ -130,7 +220,11 @@ class Helm(Importer):
                     'chart', description='Takes a local helm chart or archive as input'),
                 SettingValue(
                     'yaml', 'Reads an already templated YAML file', default=True),
-            ])
+            ]),
+            NumericSetting('parse_workers', 1, value_type=int, minimum=0,
+                           description='Number of processes that parse the documents, 1 parses serially, 0 uses all cores'),
+            NumericSetting('parse_chunk_size', 64, value_type=int, minimum=1,
+                           description='Number of documents per parse task of a process'),
         ])
 
     def template_chart_archive(self, helm_path):
@@ -188,6 +282,81 @@ class Helm(Importer):
         else:
             raise NotImplementedError
 
+    @staticmethod
+    def extract_fields(doc):
+        """Extracts the values of a workload document that solving needs
+
+        :param doc: constructed workload document
+        :type doc: dict
+        :return: keyword arguments of a :class:`continuum_deployer.resources.deployment.DeploymentEntity`
+            without the yaml definition, name is None if the document has none, and
+            the warnings about the document
+        :rtype: tuple
+        """
+        _fields = dict()
+        _warnings = []
+        _name = doc.get('metadata', None).get('name', None)
+        _fields['name'] = _name
+
+        _labels = doc['spec']['template']['spec'].get(
+            'nodeSelector', None)
+        if _labels is not None:
+            _fields['labels'] = _labels
+
+        for container in doc['spec']['template']['spec']['containers']:
+            if 'resources' in container:
+                if container['resources'] is not None:
+                    _request = container.get(
+                        'resources', None).get('requests', None)
+                    if _request != None:
+                        _fields['memory'] = Helm.parse_k8s_memory_value(
+                            _request.get('memory', 0))
+                        _fields['cpu'] = Helm.parse_k8s_cpu_value(
+                            _request.get('cpu', 0))
+                    else:
+                        _warnings.append(
+                            ('\n[Warning] No resource request provided for module {}. This can result '
+                             'in suboptimal deployment placement.').format(_name))
+
+                    _limits = container.get(
+                        'resources', None).get('limits', None)
+                    if _limits != None and _limits != {}:
+                        _fields['memory_limit'] = Helm.parse_k8s_memory_value(
+                            _limits.get('memory', 0))
+                        _fields['cpu_limit'] = Helm.parse_k8s_cpu_value(
+                            _limits.get('cpu', 0))
+                    else:
+                        # as this is not an hard error just pass
+                        pass
+            else:
+                _warnings.append(
+                    ('\n[Warning] No resource request provided for module {}. This can result '
+                     'in suboptimal deployment placement.').format(_name))
+
+        # check if we have a scalable controller
+        if doc['kind'] in Helm.K8S_SCALE_CONTROLLER:
+            _number_replicas = doc['spec'].get('replicas', 1)
+
+            # case 'is None': empty replicas field in yaml
+            if _number_replicas is not None:
+                # replicas share this deployment as template, names are
+                # extended with the replica number on access
+                _fields['replicas'] = _number_replicas
+
+        return _fields, _warnings
+
+    def _add_workload(self, deployment, warnings):
+        """Adds an extracted workload and reports the warnings about it"""
+        if deployment.name is None:
+            # https://kubernetes.io/docs/concepts/overview/working-with-objects/names/
+            click.echo(click.style(
+                '[Error] No name provided in object metadata', fg='red'), err=True)
+            exit(1)
+        for warning in warnings:
+            click.echo(click.style(warning, fg='yellow'))
+
+        self.workloads.append(deployment)
+
     def parse(self, dsl_input):
         """Does the actual parsing of the provided DSL input
 
@@ -195,9 +364,16 @@ class Helm(Importer):
         :type dsl_input: str
         """
 
+        _workers = self.config.get_setting('parse_workers').get_value().value
+        if _workers != 1:
+            if hasattr(dsl_input, 'read'):
+                dsl_input = dsl_input.read()
+            if self.parse_parallel(dsl_input, _workers or os.cpu_count() or 1):
+                return
+
         # see default loader deprecation
         # https://github.com/yaml/pyyaml/wiki/PyYAML-yaml.load(input)-Deprecation
-        docs = yaml.load_all(dsl_input, Loader=yaml.SafeLoader)
+        docs = self.load_workload_documents(dsl_input)
 
         spinner = Spinner('Parsing DSL ')
 
@@ -208,69 +384,42 @@ class Helm(Importer):
             if doc is None:
                 continue
             if doc['kind'] in self.K8S_OBJECTS:
-
-                deployment = DeploymentEntity()
+                _fields, _warnings = Helm.extract_fields(doc)
                 # save YAML doc representation
-                deployment.yaml = doc
-                _name = doc.get('metadata', None).get('name', None)
-                if _name != None:
-                    deployment.name = _name
-                else:
-                    # https://kubernetes.io/docs/concepts/overview/working-with-objects/names/
-                    click.echo(click.style(
-                        '[Error] No name provided in object metadata', fg='red'), err=True)
-                    exit(1)
-
-                _labels = doc['spec']['template']['spec'].get(
-                    'nodeSelector', None)
-                if _labels is not None:
-                    deployment.labels = _labels
-
-                for container in doc['spec']['template']['spec']['containers']:
-                    if 'resources' in container:
-                        if container['resources'] is not None:
-                            _request = container.get(
-                                'resources', None).get('requests', None)
-                            if _request != None:
-                                deployment.memory = Helm.parse_k8s_memory_value(
-                                    _request.get('memory', 0))
-                                deployment.cpu = Helm.parse_k8s_cpu_value(
-                                    _request.get('cpu', 0))
-                            else:
-                                click.echo(click.style(
-                                    ('\n[Warning] No resource request provided for module {}. This can result '
-                                     'in suboptimal deployment placement.').format(_name), fg='yellow'))
-
-                            _limits = container.get(
-                                'resources', None).get('limits', None)
-                            if _limits != None and _limits != {}:
-                                deployment.memory_limit = Helm.parse_k8s_memory_value(
-                                    _limits.get('memory', 0))
-                                deployment.cpu_limit = Helm.parse_k8s_cpu_value(
-                                    _limits.get('cpu', 0))
-                            else:
-                                # as this is not an hard error just pass
-                                pass
-                    else:
-                        click.echo(click.style(
-                            ('\n[Warning] No resource request provided for module {}. This can result '
-                             'in suboptimal deployment placement.').format(_name), fg='yellow'))
+                self._add_workload(DeploymentEntity(yaml=doc, **_fields), _warnings)
 
-                # check if we have a scalable controller
-                if doc['kind'] in Helm.K8S_SCALE_CONTROLLER:
-                    _number_replicas = doc['spec'].get('replicas', 1)
+    def parse_parallel(self, dsl_input, workers):
+        """Parses the workload documents of the stream in chunks in a process
+        pool. Workers only return the extracted values, the definitions are
+        kept as text and constructed on first access. The order of the
+        documents is kept.
 
-                    # check if we need to scale higher than 1
-                    # case 'is None': empty replicas field in yaml
-                    if _number_replicas == 1 or _number_replicas is None:
-                        self.app_modules.append(deployment)
-                    else:
-                        _deployment_name = deployment.name
-                        for i in range(_number_replicas):
-                            # extent deployment name with replica number
-                            deployment.name = '{}-{}'.format(
-                                _deployment_name, i)
-                            # we need deepcopy to create new objects here in order to call append multiple times
-                            self.app_modules.append(copy.deepcopy(deployment))
-                else:
-                    self.app_modules.append(deployment)
+        :param dsl_input: YAML stream
+        :type dsl_input: str
+        :param workers: number of worker processes
+        :type workers: int
+        :return: False if the stream has to be parsed serially
+        :rtype: bool
+        """
+        if re.search(r'^%', dsl_input, re.M):
+            # directives belong to the document after them, keep the stream intact
+            return False
+        _documents = [document for document in Helm.split_documents(dsl_input)
+                      if Helm.scan_kind(document) in self.K8S_OBJECTS + [None]]
+        _size = self.config.get_setting('parse_chunk_size').get_value().value
+        _chunks = [_documents[start:start + _size] for start in range(0, len(_documents), _size)]
+        if workers < 2 or len(_chunks) < 2:
+            return False
+
+        try:
+            with parallel.create_pool(min(workers, len(_chunks))) as pool:
+                _results = list(pool.map(extract_documents, _chunks, [self.K8S_OBJECTS] * len(_chunks)))
+        except parallel.POOL_ERRORS:
+            click.echo(click.style(
+                '[Warning] Documents can not be parsed in parallel, parsing serially.', fg='yellow'))
+            return False
+
+        for chunk, results in zip(_chunks, _results):
+            for index, fields, warnings in results:
+                self._add_workload(LazyDeploymentEntity(source=chunk[index], **fields), warnings)
+        return True
@@ -2,7 +2,7 @@ import click
 
 from yapsy.IPlugin import IPlugin
 
-from continuum_deployer.resources.deployment import DeploymentEntity
+from continuum_deployer.resources.deployment import DeploymentEntity, expand_replicas
 from continuum_deployer.utils.config import Config, Setting, SettingValue
 
 
@@ -13,6 +13,8 @@ class Importer(IPlugin):
 
     def __init__(self):
         self.app_modules = []
+        # deployments in compact form, replicas share one entity
+        self.workloads = []
 
         self._check_requirements()
 
@@ -32,7 +34,17 @@ class Importer(IPlugin):
         raise NotImplementedError
 
     def get_app_modules(self):
-        """Getter method for application modules"""
+        """Getter method for application modules, one per replica. Importers that
+        emit compact workloads get light replica views of them."""
+        if self.workloads:
+            return expand_replicas(self.workloads)
+        return self.app_modules
+
+    def get_workloads(self):
+        """Getter method for the deployments in compact form, one entity per workload
+        with its number of replicas. Solvers take this form directly."""
+        if self.workloads:
+            return self.workloads
         return self.app_modules
 
     def get_config(self):
@@ -46,10 +58,11 @@ class Importer(IPlugin):
     def reset_app_modules(self):
         """Delete already parsed app modules"""
         self.app_modules = []
+        self.workloads = []
 
     def print_app_modules(self):
         """Convenience helper that prints object representation of application modules"""
         click.echo(click.style(
             "\nList of Deployments extracted:", fg='bright_blue'))
-        for module in self.app_modules:
+        for module in self.get_app_modules():
             click.echo(str(module))
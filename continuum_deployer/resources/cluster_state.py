@@ -0,0 +1,165 @@
+import numpy as np
+
+from continuum_deployer.resources.resource_entity import ResourceEntity
+
+
+class ClusterState:
+    """Columnar representation of a set of resources and workloads.
+
+    Node capacities, used amounts and label set ids as well as the workload
+    requests are held in numpy arrays, which allows solvers to check a
+    workload against all nodes with a single vectorized operation. The
+    original entities are kept by reference and are only touched again
+    when the placements get applied.
+    """
+
+    def __init__(self, resources, deployments=None, labels=True):
+        """
+        :param resources: resource entities
+        :type resources: list
+        :param deployments: deployment entities
+        :type deployments: list, optional
+        :param labels: intern the labels, without them all nodes are eligible
+            for all workloads, for callers that only need the capacities
+        :type labels: bool, optional
+        """
+        self.resources = list(resources)
+        self.deployments = list(deployments) if deployments is not None else []
+
+        # interned label sets, position in list equals label id
+        self.label_sets = []
+        self._label_set_ids = dict()
+
+        _n = len(self.resources)
+        self.cpu_capacity = np.fromiter(
+            (r.cpu for r in self.resources), dtype=np.float64, count=_n)
+        self.memory_capacity = np.fromiter(
+            (r.memory for r in self.resources), dtype=np.float64, count=_n)
+        self.used_cpu = np.fromiter(
+            (r.get_used_cpu() for r in self.resources), dtype=np.float64, count=_n)
+        self.used_memory = np.fromiter(
+            (r.get_used_memory() for r in self.resources), dtype=np.float64, count=_n)
+        self.node_label_ids = np.fromiter(
+            (self._intern_labels(r.labels if labels else None) for r in self.resources), dtype=np.int32, count=_n)
+
+        _m = len(self.deployments)
+        self.cpu_request = np.fromiter(
+            (d.cpu for d in self.deployments), dtype=np.float64, count=_m)
+        self.memory_request = np.fromiter(
+            (d.memory for d in self.deployments), dtype=np.float64, count=_m)
+        self.workload_label_ids = np.fromiter(
+            (self._intern_labels(d.labels if labels else None) for d in self.deployments), dtype=np.int32, count=_m)
+
+        # node index of each workload, -1 if unplaced
+        self.assignment = np.full(_m, -1, dtype=np.int64)
+        # placements in the order they were made, replayed by apply()
+        self.placements = []
+
+        # eligible node mask per workload label set id, built on first use
+        self._eligible = dict()
+
+    def _intern_labels(self, labels):
+        """Helper that maps a dict of labels to a stable integer id
+
+        :param labels: labels to intern, None for unlabeled entities
+        :type labels: dict
+        :return: id of the label set
+        :rtype: int
+        """
+        _key = frozenset(labels.items()) if labels else frozenset()
+        _id = self._label_set_ids.get(_key)
+        if _id is None:
+            _id = len(self.label_sets)
+            self._label_set_ids[_key] = _id
+            self.label_sets.append(_key)
+        return _id
+
+    def _label_compatibility(self, label_id):
+        """Checks for a workload label set on which label sets it may run.
+        Only done for the label sets of workloads that are asked for.
+
+        :param label_id: id of the workload label set
+        :type label_id: int
+        :return: boolean mask over all label sets
+        :rtype: :class:`numpy.ndarray`
+        """
+        _workload_labels = self.label_sets[label_id]
+        return np.fromiter((_workload_labels <= node_labels for node_labels in self.label_sets),
+                           dtype=bool, count=len(self.label_sets))
+
+    def idle_cpu(self):
+        return self.cpu_capacity - self.used_cpu
+
+    def idle_memory(self):
+        return self.memory_capacity - self.used_memory
+
+    def eligible_nodes(self, workload):
+        """Returns mask of nodes whose labels allow placing the given workload
+
+        :param workload: index of the workload
+        :type workload: int
+        :return: boolean mask over all nodes
+        :rtype: :class:`numpy.ndarray`
+        """
+        _label_id = int(self.workload_label_ids[workload])
+        _mask = self._eligible.get(_label_id)
+        if _mask is None:
+            _mask = self._label_compatibility(_label_id)[self.node_label_ids]
+            # shared by all workloads of the label set
+            _mask.flags.writeable = False
+            self._eligible[_label_id] = _mask
+        return _mask
+
+    def fitting_nodes(self, workload):
+        """Returns mask of nodes that can take the given workload with their
+        current idle capacity and labels.
+
+        :param workload: index of the workload
+        :type workload: int
+        :return: boolean mask over all nodes
+        :rtype: :class:`numpy.ndarray`
+        """
+        _tolerance = ResourceEntity.FIT_TOLERANCE
+        return ((self.idle_cpu() - self.cpu_request[workload] >= -_tolerance)
+                & (self.idle_memory() - self.memory_request[workload] >= -_tolerance)
+                & self.eligible_nodes(workload))
+
+    def place(self, workload, node):
+        """Places a workload on a node inside the state, the entities are left untouched
+
+        :param workload: index of the workload
+        :type workload: int
+        :param node: index of the node
+        :type node: int
+        """
+        self.used_cpu[node] += self.cpu_request[workload]
+        self.used_memory[node] += self.memory_request[workload]
+        self.assignment[workload] = node
+        self.placements.append((workload, node))
+
+    def get_unplaced(self):
+        """Returns the deployment entities that have no node assigned
+
+        :return: list of unplaced deployment entities
+        :rtype: list
+        """
+        return [self.deployments[j] for j in np.flatnonzero(self.assignment < 0)]
+
+    def apply(self):
+        """Writes the placements back to the resource entities.
+
+        :return: list of deployment entities that could not be added to their resource
+        :rtype: list
+        """
+        _errors = []
+        for workload, node in self.placements:
+            _deployment = self.deployments[workload]
+            if not self.resources[node].add_deployment(_deployment):
+                _errors.append(_deployment)
+        return _errors
+
+    def get_resources(self):
+        return self.resources
+
+    def get_deployments(self):
+        return self.deployments
@@ -1,7 +1,9 @@
 from dataclasses import dataclass, field
+import yaml
 import click
 
 from continuum_deployer.utils.ui import UI
+from continuum_deployer.utils.file_handling import FileHandling
 
 
 @dataclass
@@ -23,6 +25,8 @@ class DeploymentEntity:
     yaml: dict = field(default=None)
     # assigned labels
     labels: dict = field(default=None)
+    # number of identical replicas described by this deployment
+    replicas: int = field(default=1)
 
     def print(self):
         """Helper that prints values of current deployment to stdout"""
@@ -31,5 +35,118 @@ class DeploymentEntity:
         click.echo(click.style("CPU: {} \t MEMORY: {} MB".format(
             self.cpu, self.memory
         ), fg=None))
+        if self.replicas != 1:
+            click.echo("REPLICAS: {}".format(self.replicas))
         click.echo("LABEL: {}".format(UI.pretty_label_string(self.labels)))
         click.echo("-----------------------------------------")
+
+    def get_replicas(self):
+        """Returns the deployable units described by this deployment.
+        A deployment with multiple replicas is expanded to light replica
+        views that share this deployment as template.
+
+        :return: list of deployable units
+        :rtype: list
+        """
+        if self.replicas == 1:
+            return [self]
+        return [DeploymentReplica(self, i) for i in range(self.replicas)]
+
+
+class LazyDeploymentEntity(DeploymentEntity):
+    """Deployment entity that keeps its YAML definition as text. The
+    definition is constructed on first access, parsing large inputs does not
+    have to hold or ship all definitions."""
+
+    def __init__(self, source=None, **kwargs):
+        # raw YAML text of the definition
+        self.source = source
+        self._yaml = None
+        super().__init__(**kwargs)
+
+    @property
+    def yaml(self):
+        if self._yaml is None and self.source is not None:
+            self._yaml = yaml.load(self.source, Loader=FileHandling.YAML_LOADER)
+        return self._yaml
+
+    @yaml.setter
+    def yaml(self, value):
+        self._yaml = value
+
+
+class DeploymentReplica:
+    """Light view on a single replica of a deployment. All values are taken
+    from the shared template deployment, the replica name is derived on access."""
+
+    __slots__ = ('template', 'index')
+
+    def __init__(self, template: DeploymentEntity, index: int):
+        self.template = template
+        self.index = index
+
+    @property
+    def name(self):
+        return '{}-{}'.format(self.template.name, self.index)
+
+    @property
+    def memory(self):
+        return self.template.memory
+
+    @property
+    def memory_limit(self):
+        return self.template.memory_limit
+
+    @property
+    def cpu(self):
+        return self.template.cpu
+
+    @property
+    def cpu_limit(self):
+        return self.template.cpu_limit
+
+    @property
+    def yaml(self):
+        return self.template.yaml
+
+    @property
+    def labels(self):
+        return self.template.labels
+
+    @property
+    def replicas(self):
+        return 1
+
+    def __eq__(self, other):
+        if not isinstance(other, DeploymentReplica):
+            return NotImplemented
+        return self.template is other.template and self.index == other.index
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'DeploymentReplica(name={!r}, memory={!r}, cpu={!r}, labels={!r})'.format(
+            self.name, self.memory, self.cpu, self.labels)
+
+    def get_replicas(self):
+        return [self]
+
+    print = DeploymentEntity.print
+
+
+def expand_replicas(entities):
+    """Helper that expands deployments with multiple replicas to their replica views
+
+    :param entities: list of deployment entities or replicas
+    :type entities: list
+    :return: list with one entry per deployable unit
+    :rtype: list
+    """
+    if entities is None:
+        return None
+    if all(entity.replicas == 1 for entity in entities):
+        return entities
+    _result = []
+    for entity in entities:
+        _result.extend(entity.get_replicas())
+    return _result
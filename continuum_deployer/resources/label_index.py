@@ -0,0 +1,125 @@
+class LabelIndex:
+    """Inverted index that maps each label pair (key, value) to a bitset
+    of node ids. The node id is the position of the resource in the list
+    the index was built for. Selecting the nodes that carry all labels of
+    a selector is then a intersection of the bitsets of its pairs.
+    """
+
+    def __init__(self):
+        # (key, value) -> bitset of node ids
+        self.pairs = dict()
+        # (key, value) -> id of the pair, used for selector tokens
+        self.pair_ids = dict()
+        # bitset of nodes that have labels assigned at all
+        self.labeled = 0
+
+    @classmethod
+    def from_resources(cls, resources):
+        """Builds an index for the given list of resources
+
+        :param resources: list of resource entities
+        :type resources: list
+        :return: index over the labels of the resources
+        :rtype: :class:`continuum_deployer.resources.label_index.LabelIndex`
+        """
+        _index = cls()
+        for node_id, resource in enumerate(resources):
+            _index.add(node_id, resource.labels)
+        return _index
+
+    def add(self, node_id, labels):
+        """Adds the labels of a node to the index
+
+        :param node_id: id of the node
+        :type node_id: int
+        :param labels: labels of the node, may be None
+        :type labels: dict
+        """
+        if labels is None:
+            return
+        _bit = 1 << node_id
+        self.labeled |= _bit
+        for pair in labels.items():
+            self.pairs[pair] = self.pairs.get(pair, 0) | _bit
+
+    def remove(self, node_id, labels):
+        """Removes the labels of a node from the index
+
+        :param node_id: id of the node
+        :type node_id: int
+        :param labels: labels the node was added with, may be None
+        :type labels: dict
+        """
+        if labels is None:
+            return
+        _mask = ~(1 << node_id)
+        self.labeled &= _mask
+        for pair in labels.items():
+            _bitset = self.pairs.get(pair, 0) & _mask
+            if _bitset:
+                self.pairs[pair] = _bitset
+            else:
+                self.pairs.pop(pair, None)
+
+    def update(self, node_id, old_labels, new_labels):
+        """Updates the labels of a node, only changed pairs are touched
+
+        :param node_id: id of the node
+        :type node_id: int
+        :param old_labels: labels the node was added with, may be None
+        :type old_labels: dict
+        :param new_labels: new labels of the node, may be None
+        :type new_labels: dict
+        """
+        if old_labels is None or new_labels is None:
+            self.remove(node_id, old_labels)
+            self.add(node_id, new_labels)
+            return
+        self.remove(node_id, dict(old_labels.items() - new_labels.items()))
+        self.add(node_id, dict(new_labels.items() - old_labels.items()))
+
+    def select(self, labels):
+        """Returns the bitset of nodes that have all of the given labels
+
+        :param labels: labels of the selector
+        :type labels: dict
+        :return: bitset of matching node ids
+        :rtype: int
+        """
+        _result = self.labeled
+        for pair in labels.items():
+            _result &= self.pairs.get(pair, 0)
+            if not _result:
+                break
+        return _result
+
+    def token(self, labels):
+        """Returns a token that is equal for equal sets of labels.
+        The token is a bitset of label pair ids and is stable for the
+        lifetime of the index.
+
+        :param labels: labels to tokenize
+        :type labels: dict
+        :return: token of the labels
+        :rtype: int
+        """
+        _token = 0
+        for pair in labels.items():
+            _id = self.pair_ids.get(pair)
+            if _id is None:
+                _id = len(self.pair_ids)
+                self.pair_ids[pair] = _id
+            _token |= 1 << _id
+        return _token
+
+    @staticmethod
+    def iter_ids(bitset):
+        """Iterates the node ids of a bitset in ascending order
+
+        :param bitset: bitset of node ids
+        :type bitset: int
+        """
+        while bitset:
+            _lowest = bitset & -bitset
+            yield _lowest.bit_length() - 1
+            bitset ^= _lowest
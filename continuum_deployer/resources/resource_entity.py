@@ -10,11 +10,28 @@ from continuum_deployer.utils.ui import UI
 class ResourceEntity:
     """Data Class that hold extracted values for resources."""
 
+    # tolerance for rounding errors of accumulated float requests
+    FIT_TOLERANCE = 1e-9
+
     name: str = field(default=None)
     memory: float = field(default=None)
     cpu: float = field(default=None)
     deployments: List[DeploymentEntity] = field(default_factory=list)
     labels: dict = field(default=None)
+    # running totals of the resources requested by the placed deployments,
+    # kept in sync by add_deployment(), remove_deployment() and clear_deployments()
+    used_cpu: float = field(default=0, init=False, repr=False, compare=False)
+    used_memory: float = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._recalculate_usage()
+
+    def _recalculate_usage(self):
+        """Recomputes the running totals from the list of placed deployments.
+        Only needed if the deployments list was assigned directly.
+        """
+        self.used_cpu = sum(d.cpu for d in self.deployments)
+        self.used_memory = sum(d.memory for d in self.deployments)
 
     def check_resources_fit(self, entity):
         """Idempotent helper method that checks if given deployment entity 
@@ -25,14 +42,23 @@ class ResourceEntity:
         :return: Check result if deployment entity cloud be placed as boolean
         :rtype: bool
         """
-        available_cpu = self.cpu
-        available_memory = self.memory
-        deployments_proposal = self.deployments + [entity]
-        for deployment in deployments_proposal:
-            available_cpu -= deployment.cpu
-            available_memory -= deployment.memory
-
-        if available_memory >= 0 and available_cpu >= 0:
+        return self.check_resources_fit_values(entity.cpu, entity.memory)
+
+    def check_resources_fit_values(self, cpu, memory):
+        """Idempotent helper method that checks if the given request
+        can be added to the resource without exceeding the limits.
+
+        :param cpu: requested cpu
+        :type cpu: float
+        :param memory: requested memory
+        :type memory: float
+        :return: Check result if request cloud be placed as boolean
+        :rtype: bool
+        """
+        available_cpu = self.get_idle_cpu() - cpu
+        available_memory = self.get_idle_memory() - memory
+
+        if available_memory >= -self.FIT_TOLERANCE and available_cpu >= -self.FIT_TOLERANCE:
             return True
         else:
             return False
@@ -47,10 +73,33 @@ class ResourceEntity:
         """
         if self.check_resources_fit(entity):
             self.deployments.append(entity)
+            self.used_cpu += entity.cpu
+            self.used_memory += entity.memory
             return True
         else:
             return False
 
+    def remove_deployment(self, entity):
+        """Remove a placed deployment entity from current resource.
+
+        :param entity: deployment entity that should be removed
+        :type entity: :class:`continuum_deployer.resources.deployment.DeploymentEntity`
+        :return: result of remove operation
+        :rtype: bool
+        """
+        for i, deployment in enumerate(self.deployments):
+            if deployment is entity:
+                del self.deployments[i]
+                if self.deployments:
+                    self.used_cpu -= entity.cpu
+                    self.used_memory -= entity.memory
+                else:
+                    # reset to avoid accumulating floating point drift
+                    self.used_cpu = 0
+                    self.used_memory = 0
+                return True
+        return False
+
     def print(self):
         """Helper method that prints resource entity parameters and current deployments to stdout
         """
@@ -59,9 +108,9 @@ class ResourceEntity:
         click.echo(click.style("CPU: {} \t MEMORY: {} MB".format(
             self.cpu, self.memory
         ), fg=None))
-        UI.print_percent_bar('CPU', (sum(d.cpu for d in self.deployments)/self.cpu) * 100
+        UI.print_percent_bar('CPU', (self.used_cpu/self.cpu) * 100
                              if len(self.deployments) != 0 else 0)
-        UI.print_percent_bar('RAM', (sum(d.memory for d in self.deployments)/self.memory) * 100
+        UI.print_percent_bar('RAM', (self.used_memory/self.memory) * 100
                              if len(self.deployments) != 0 else 0)
         _printed_deployments = "\n"
         for deployment in self.deployments:
@@ -76,14 +125,22 @@ class ResourceEntity:
     def get_deployments(self):
         return self.deployments
 
+    def get_used_cpu(self):
+        return self.used_cpu
+
+    def get_used_memory(self):
+        return self.used_memory
+
     def get_idle_cpu(self):
-        return self.cpu - sum(d.cpu for d in self.deployments)
+        return self.cpu - self.used_cpu
 
     def get_idle_memory(self):
-        return self.memory - sum(d.memory for d in self.deployments)
+        return self.memory - self.used_memory
 
     def clear_deployments(self):
         """ Removes all placed deployments
         """
 
         self.deployments = []
+        self.used_cpu = 0
+        self.used_memory = 0
@@ -2,6 +2,9 @@ import yaml
 import click
 
 from continuum_deployer.resources.resource_entity import ResourceEntity
+from continuum_deployer.resources.cluster_state import ClusterState
+from continuum_deployer.resources.label_index import LabelIndex
+from continuum_deployer.utils.file_handling import FileHandling
 
 
 class Resources:
@@ -10,6 +13,7 @@ class Resources:
 
     def __init__(self):
         self.resources = list()
+        self.label_index = LabelIndex()
 
     def check_mandatory_fields(self, node):
         """Checks if all mandatory resource entity fields are set
@@ -31,18 +35,69 @@ class Resources:
         :type definition: str
         """
 
+        for node in self._load_nodes(definition):
+            _resource = self._node_to_entity(node)
+            self.label_index.add(len(self.resources), _resource.labels)
+            self.resources.append(_resource)
+
+    def update(self, definition):
+        """Replaces the parsed resources with the given resource definitions.
+        The resource list is changed in place and the label index is only
+        updated for nodes whose labels changed.
+
+        :param definition: str with plain YAML resource definitions
+        :type definition: str
+        """
+
+        _nodes = self._load_nodes(definition)
+
+        for node_id, node in enumerate(_nodes):
+            _resource = self._node_to_entity(node)
+            if node_id < len(self.resources):
+                self.label_index.update(
+                    node_id, self.resources[node_id].labels, _resource.labels)
+                self.resources[node_id] = _resource
+            else:
+                self.label_index.add(node_id, _resource.labels)
+                self.resources.append(_resource)
+
+        # drop nodes that were removed from the definition
+        for node_id in range(len(self.resources) - 1, len(_nodes) - 1, -1):
+            self.label_index.remove(node_id, self.resources[node_id].labels)
+            del self.resources[node_id]
+
+    def _load_nodes(self, definition):
+        """Loads the list of nodes from the given resource definitions
+
+        :param definition: str with plain YAML resource definitions
+        :type definition: str
+        :return: list of node dicts
+        :rtype: list
+        """
+
         # see default loader deprecation
         # https://github.com/yaml/pyyaml/wiki/PyYAML-yaml.load(input)-Deprecation
-        nodes = yaml.load(definition, Loader=yaml.SafeLoader)['resources']
+        nodes = yaml.load(definition, Loader=FileHandling.YAML_LOADER)['resources']
 
         for node in nodes:
             self.check_mandatory_fields(node)
-            _resource = ResourceEntity()
-            _resource.name = node.get('name')
-            _resource.memory = node.get('memory')
-            _resource.cpu = node.get('cpu')
-            _resource.labels = node.get('labels', None)
-            self.resources.append(_resource)
+        return nodes
+
+    @staticmethod
+    def _node_to_entity(node):
+        """Converts a node dict into a resource entity
+
+        :param node: node definition
+        :type node: dict
+        :return: resource entity
+        :rtype: :class:`continuum_deployer.resources.resource_entity.ResourceEntity`
+        """
+        _resource = ResourceEntity()
+        _resource.name = node.get('name')
+        _resource.memory = node.get('memory')
+        _resource.cpu = node.get('cpu')
+        _resource.labels = node.get('labels', None)
+        return _resource
 
     def print_resources(self):
         """Helper function that prints each resource to stdout 
@@ -53,3 +108,16 @@ class Resources:
 
     def get_resources(self):
         return self.resources
+
+    def get_label_index(self):
+        return self.label_index
+
+    def get_cluster_state(self, deployments=None):
+        """Creates a columnar view of the parsed resources for vectorized solvers
+
+        :param deployments: deployment entities, e.g. the importer app modules, defaults to None
+        :type deployments: list, optional
+        :return: cluster state referencing the parsed resources
+        :rtype: :class:`continuum_deployer.resources.cluster_state.ClusterState`
+        """
+        return ClusterState(self.resources, deployments)
@@ -0,0 +1,186 @@
+from bisect import bisect_left, insort
+
+from continuum_deployer.resources.resource_entity import ResourceEntity
+
+_TOLERANCE = ResourceEntity.FIT_TOLERANCE
+
+
+class CapacityTree:
+    """Segment tree over a fixed list of resources that holds the maximum idle
+    cpu and memory of each subtree. Finds the first resource in list order that
+    can take a deployment by skipping subtrees that can not take it.
+
+    The maxima of both dimensions are pruned on separately, so a subtree may pass
+    with its largest cpu and its largest memory on different resources. Lookups
+    take logarithmic time if a single dimension is tight, in the worst case of
+    two dimensions they visit all resources."""
+
+    def __init__(self, resources):
+        self.resources = resources
+        self.size = 1
+        while self.size < len(resources):
+            self.size *= 2
+        # leaves start at self.size, unused leaves can not take anything
+        self.cpu = [float('-inf')] * (2 * self.size)
+        self.memory = [float('-inf')] * (2 * self.size)
+        for i, resource in enumerate(resources):
+            self.cpu[self.size + i] = resource.get_idle_cpu()
+            self.memory[self.size + i] = resource.get_idle_memory()
+        for node in range(self.size - 1, 0, -1):
+            self._pull(node)
+
+    def _pull(self, node):
+        self.cpu[node] = max(self.cpu[2 * node], self.cpu[2 * node + 1])
+        self.memory[node] = max(self.memory[2 * node], self.memory[2 * node + 1])
+
+    def update(self, index):
+        """Refreshes the idle capacity of the resource at the given position
+
+        :param index: position of the resource in the list
+        :type index: int
+        """
+        _node = self.size + index
+        self.cpu[_node] = self.resources[index].get_idle_cpu()
+        self.memory[_node] = self.resources[index].get_idle_memory()
+        _node //= 2
+        while _node:
+            self._pull(_node)
+            _node //= 2
+
+    def first_fit(self, cpu, memory):
+        """Returns the position of the first resource that can take the given request.
+        O(log n) if one dimension decides, O(n) in the two dimensional worst case.
+
+        :param cpu: requested cpu
+        :type cpu: float
+        :param memory: requested memory
+        :type memory: float
+        :return: position of the resource or None if no resource fits
+        :rtype: int
+        """
+        _stack = [1]
+        while _stack:
+            _node = _stack.pop()
+            if self.cpu[_node] - cpu < -_TOLERANCE or self.memory[_node] - memory < -_TOLERANCE:
+                continue
+            if _node >= self.size:
+                return _node - self.size
+            # visit left child first
+            _stack.append(2 * _node + 1)
+            _stack.append(2 * _node)
+        return None
+
+
+class SortedCapacity:
+    """Sorted index of resources by their idle capacity in one dimension. The
+    entries are kept in bucketed sorted lists, so that the first resource with
+    enough capacity in the indexed dimension is found in logarithmic time and
+    updates only shift a single small bucket.
+
+    The other dimension is not indexed, from that resource on the entries are
+    checked one by one until one fits both dimensions. Lookups are linear in the
+    worst case, e.g. if the request is tight in the other dimension."""
+
+    LOAD = 256
+
+    def __init__(self, resources, attr):
+        self.resources = resources
+        self.attr = attr
+        self.keys = [self._key(i) for i in range(len(resources))]
+        _sorted = sorted(self.keys)
+        self.buckets = [_sorted[i:i + self.LOAD]
+                        for i in range(0, len(_sorted), self.LOAD)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+
+    def _idle(self, resource, attr):
+        if attr == 'cpu':
+            return resource.get_idle_cpu()
+        return resource.get_idle_memory()
+
+    def _key(self, index):
+        return (self._idle(self.resources[index], self.attr), index)
+
+    def _insert(self, key):
+        if not self.buckets:
+            self.buckets.append([key])
+            self.maxes.append(key)
+            return
+        _pos = bisect_left(self.maxes, key)
+        if _pos == len(self.buckets):
+            _pos -= 1
+        _bucket = self.buckets[_pos]
+        insort(_bucket, key)
+        self.maxes[_pos] = _bucket[-1]
+        if len(_bucket) > 2 * self.LOAD:
+            self.buckets[_pos:_pos + 1] = [_bucket[:self.LOAD], _bucket[self.LOAD:]]
+            self.maxes[_pos:_pos + 1] = [_bucket[self.LOAD - 1], _bucket[-1]]
+
+    def _remove(self, key):
+        _pos = bisect_left(self.maxes, key)
+        _bucket = self.buckets[_pos]
+        del _bucket[bisect_left(_bucket, key)]
+        if _bucket:
+            self.maxes[_pos] = _bucket[-1]
+        else:
+            del self.buckets[_pos]
+            del self.maxes[_pos]
+
+    def update(self, index):
+        """Refreshes the idle capacity of the resource at the given position
+
+        :param index: position of the resource in the list
+        :type index: int
+        """
+        self._remove(self.keys[index])
+        self.keys[index] = self._key(index)
+        self._insert(self.keys[index])
+
+    def _fits(self, index, cpu, memory):
+        _resource = self.resources[index]
+        return _resource.check_resources_fit_values(cpu, memory)
+
+    def best_fit(self, cpu, memory):
+        """Returns the position of the resource with the least idle capacity in the
+        indexed dimension that can take the given request. The other dimension
+        is checked by a linear scan from the first candidate on.
+
+        :param cpu: requested cpu
+        :type cpu: float
+        :param memory: requested memory
+        :type memory: float
+        :return: position of the resource or None if no resource fits
+        :rtype: int
+        """
+        _request = cpu if self.attr == 'cpu' else memory
+        _lowest = (_request - _TOLERANCE, -1)
+        _pos = bisect_left(self.maxes, _lowest)
+        for b in range(_pos, len(self.buckets)):
+            _bucket = self.buckets[b]
+            _start = bisect_left(_bucket, _lowest) if b == _pos else 0
+            for _, index in _bucket[_start:]:
+                if self._fits(index, cpu, memory):
+                    return index
+        return None
+
+    def worst_fit(self, cpu, memory):
+        """Returns the position of the resource with the most idle capacity in the
+        indexed dimension that can take the given request. The other dimension
+        is checked by a linear scan from the largest resource on.
+
+        :param cpu: requested cpu
+        :type cpu: float
+        :param memory: requested memory
+        :type memory: float
+        :return: position of the resource or None if no resource fits
+        :rtype: int
+        """
+        _request = cpu if self.attr == 'cpu' else memory
+        for bucket in reversed(self.buckets):
+            if bucket[-1][0] - _request < -_TOLERANCE:
+                return None
+            for key, index in reversed(bucket):
+                if key - _request < -_TOLERANCE:
+                    return None
+                if self._fits(index, cpu, memory):
+                    return index
+        return None
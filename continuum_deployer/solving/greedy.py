@@ -1,12 +1,28 @@
 import click
+import numpy as np
 
 from continuum_deployer.resources.resource_entity import ResourceEntity
+from continuum_deployer.resources.cluster_state import ClusterState
 from continuum_deployer.solving.solver import Solver
+from continuum_deployer.solving.capacity_index import CapacityTree, SortedCapacity
 from continuum_deployer.utils.config import Config, Setting, SettingValue
 
 
 class Greedy(Solver):
 
+    # target setting value -> (placement policy, sort attribute)
+    TARGETS = {
+        'cpu': ('first_fit', 'cpu'),
+        'memory': ('first_fit', 'memory'),
+        'best_fit_cpu': ('best_fit', 'cpu'),
+        'best_fit_memory': ('best_fit', 'memory'),
+        'worst_fit_cpu': ('worst_fit', 'cpu'),
+        'worst_fit_memory': ('worst_fit', 'memory'),
+        'dot_product': ('vector', 'dot_product'),
+        'l2_norm': ('vector', 'l2_norm'),
+        'dominant_resource': ('vector', 'dominant_resource'),
+    }
+
     @staticmethod
     def sort_by_attr(items, attr):
         """Helper function that sorts list of items based on configurable attribute
@@ -51,27 +67,153 @@ class Greedy(Solver):
                 SettingValue(
                     'cpu', description='Sorts resources and workloads by cpu for greedy matching', default=True),
                 SettingValue(
-                    'memory', 'Sorts resources and workloads by memory for greedy matching')
+                    'memory', 'Sorts resources and workloads by memory for greedy matching'),
+                SettingValue(
+                    'best_fit_cpu', 'Places workloads by decreasing cpu on the target with the least idle cpu that fits'),
+                SettingValue(
+                    'best_fit_memory', 'Places workloads by decreasing memory on the target with the least idle memory that fits'),
+                SettingValue(
+                    'worst_fit_cpu', 'Places workloads by decreasing cpu on the target with the most idle cpu'),
+                SettingValue(
+                    'worst_fit_memory', 'Places workloads by decreasing memory on the target with the most idle memory'),
+                SettingValue(
+                    'dot_product', 'Places workloads on the target whose idle cpu and memory are best aligned with the request'),
+                SettingValue(
+                    'l2_norm', 'Places workloads on the target with the smallest cpu and memory residual (L2 norm) after placement'),
+                SettingValue(
+                    'dominant_resource', 'Places workloads on the target with the least idle capacity left in their dominant resource'),
             ])
         ])
 
     def greedy_attr(self, entities, resources, attr):
+        """First fit decreasing placement, resources are tried in order of their size
+
+        :param entities: deployment entities to place
+        :type entities: list
+        :param resources: resource entities to place on
+        :type resources: list
+        :param attr: name of the attribute the sorting should be carried out with
+        :type attr: str
+        """
         entities_sorted = Greedy.sort_by_attr(entities, attr)
         resources_sorted = Greedy.sort_by_attr(resources, attr)
+        index = CapacityTree(resources_sorted)
+
+        for entity in entities_sorted:
+            position = index.first_fit(entity.cpu, entity.memory)
+            if position is None or not resources_sorted[position].add_deployment(entity):
+                self.placement_errors.append(entity)
+            else:
+                index.update(position)
+
+    def greedy_fit(self, entities, resources, attr, policy):
+        """Best or worst fit decreasing placement based on the idle capacity
+        of the resources in the dimension given by attr
+
+        :param entities: deployment entities to place
+        :type entities: list
+        :param resources: resource entities to place on
+        :type resources: list
+        :param attr: name of the attribute the sorting should be carried out with
+        :type attr: str
+        :param policy: 'best_fit' or 'worst_fit'
+        :type policy: str
+        """
+        entities_sorted = Greedy.sort_by_attr(entities, attr)
+        index = SortedCapacity(resources, attr)
+        _find = index.best_fit if policy == 'best_fit' else index.worst_fit
 
         for entity in entities_sorted:
-            if not Greedy.deploy_iterate(entity, resources_sorted):
+            position = _find(entity.cpu, entity.memory)
+            if position is None or not resources[position].add_deployment(entity):
                 self.placement_errors.append(entity)
+            else:
+                index.update(position)
+
+    @staticmethod
+    def vector_scores(heuristic, demand, idle, capacity):
+        """Scores all candidate targets for a workload on cpu and memory at once.
+        Lower scores are better.
+
+        :param heuristic: one of dot_product, l2_norm or dominant_resource
+        :type heuristic: str
+        :param demand: normalized request of the workload, shape (2,)
+        :type demand: :class:`numpy.ndarray`
+        :param idle: normalized idle capacity of the candidates, shape (n, 2)
+        :type idle: :class:`numpy.ndarray`
+        :param capacity: normalized capacity of the candidates, shape (n, 2)
+        :type capacity: :class:`numpy.ndarray`
+        :raises ValueError: raised if the heuristic is unknown
+        :return: score per candidate
+        :rtype: :class:`numpy.ndarray`
+        """
+        if heuristic == 'dot_product':
+            # prefer targets whose idle capacity points in the direction of the request
+            return -(idle @ demand)
+        if heuristic == 'l2_norm':
+            # prefer targets that are left with the smallest residual vector
+            _residual = idle - demand
+            return np.einsum('ij,ij->i', _residual, _residual)
+        if heuristic == 'dominant_resource':
+            # prefer targets with the least share left in the dominant dimension of the request
+            _dominant = int(np.argmax(demand))
+            _capacity = np.where(capacity[:, _dominant] > 0, capacity[:, _dominant], 1)
+            return (idle[:, _dominant] - demand[_dominant]) / _capacity
+        raise ValueError('unknown vector heuristic {}'.format(heuristic))
+
+    def greedy_vector(self, entities, resources, heuristic):
+        """Multi-dimensional placement that scores each workload against all
+        fitting resources on cpu and memory at once.
+
+        :param entities: deployment entities to place
+        :type entities: list
+        :param resources: resource entities to place on
+        :type resources: list
+        :param heuristic: one of dot_product, l2_norm or dominant_resource
+        :type heuristic: str
+        """
+        state = ClusterState(resources, entities)
+
+        # normalize both dimensions by the largest resource to make them comparable
+        _scale = np.array([state.cpu_capacity.max(initial=0),
+                           state.memory_capacity.max(initial=0)])
+        _scale[_scale <= 0] = 1
+        _demand = np.column_stack((state.cpu_request, state.memory_request)) / _scale
+        _capacity = np.column_stack((state.cpu_capacity, state.memory_capacity)) / _scale
+
+        # largest workloads first
+        if heuristic == 'dominant_resource':
+            _size = _demand.max(axis=1, initial=0)
+        else:
+            _size = _demand.sum(axis=1)
+        _order = np.argsort(-_size, kind='stable')
+
+        for j in _order:
+            _candidates = np.flatnonzero(state.fitting_nodes(j))
+            if len(_candidates) == 0:
+                continue
+            _idle = np.column_stack((state.idle_cpu()[_candidates],
+                                     state.idle_memory()[_candidates])) / _scale
+            _scores = Greedy.vector_scores(
+                heuristic, _demand[j], _idle, _capacity[_candidates])
+            state.place(j, _candidates[int(np.argmin(_scores))])
+
+        self.placement_errors.extend(state.get_unplaced())
+        self.placement_errors.extend(state.apply())
 
     def do_matching(self, deployment_entities, resources):
         """Does actual deployment to resource matching
         """
 
-        self.greedy_attr(
-            deployment_entities,
-            resources,
-            self.config.get_setting('target').get_value().value
-        )
+        _policy, _attr = self.TARGETS[self.config.get_setting(
+            'target').get_value().value]
+
+        if _policy == 'first_fit':
+            self.greedy_attr(deployment_entities, resources, _attr)
+        elif _policy == 'vector':
+            self.greedy_vector(deployment_entities, resources, _attr)
+        else:
+            self.greedy_fit(deployment_entities, resources, _attr, _policy)
 
     def match(self):
         super(Greedy, self).match()
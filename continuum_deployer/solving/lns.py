@@ -0,0 +1,266 @@
+import os
+import random
+
+import click
+
+from continuum_deployer.solving import parallel
+from continuum_deployer.solving.solver import Solver
+from continuum_deployer.solving.sat import SAT
+from continuum_deployer.solving.capacity_index import CapacityTree
+from continuum_deployer.utils.config import Config, SettingValue, NumericSetting
+
+
+def solve_neighborhood(config, deployments, extras, resources, previous):
+    """Worker entry point that re-optimizes the deployments of a neighborhood
+    with the SAT solver. Additional unplaced deployments are tried first, if
+    the subproblem is infeasible with them it is solved without.
+
+    :param config: configuration of the SAT solver
+    :type config: :class:`continuum_deployer.utils.config.Config`
+    :param deployments: detached deployments currently placed in the neighborhood
+    :type deployments: list
+    :param extras: detached deployments that are not placed yet
+    :type extras: list
+    :param resources: detached resources of the neighborhood, without the deployments
+    :type resources: list
+    :param previous: deployment name to resource name of the current placement, used as hint
+    :type previous: dict
+    :return: (resource index, deployment index) placements, indices of the
+        deployments refer to deployments + extras, None if no solution was found
+    :rtype: list
+    """
+    _attempts = [deployments + extras, deployments] if extras else [deployments]
+    for candidates in _attempts:
+        _resources = parallel.detach_resources(resources)
+        _solver = SAT(candidates, _resources)
+        _solver.config = config
+        _solver.previous_placement = previous
+        _solver.do_matching(candidates, _resources)
+        if _solver.get_placement_errors():
+            continue
+
+        _ids = {id(d): j for j, d in enumerate(candidates)}
+        return [(i, _ids[id(d)]) for i, resource in enumerate(_resources)
+                for d in resource.get_deployments()]
+    return None
+
+
+class LNS(Solver):
+    """Large neighborhood search for clusters that are too large for a single
+    CP-SAT model. Starts from a first-fit decreasing placement and repeatedly
+    re-optimizes the deployments of disjoint random sets of resources with
+    small SAT subproblems, that are solved in parallel. Improvements are kept."""
+
+    # subproblems are solved in parallel, label groups are solved one by one
+    PARALLEL_GROUPS = False
+
+    # tolerance for float rounding when comparing scores
+    EPSILON = 1e-9
+
+    def __init__(self, deployment_entities, resources):
+        super().__init__(deployment_entities, resources)
+        # accepted neighborhoods and unplaced deployments of each round
+        self.search_stats = []
+
+    def _gen_config(self):
+        return Config(SAT.gen_objective_settings() + [
+            NumericSetting('neighborhood_size', 32, value_type=int, minimum=1,
+                           description='Number of resources per subproblem'),
+            NumericSetting('iterations', 10, value_type=int, minimum=1,
+                           description='Number of search rounds, each round visits all resources once'),
+            NumericSetting('time_limit', 2.0, minimum=0,
+                           description='Wall-clock limit per subproblem in seconds, 0 for no limit'),
+            NumericSetting('num_workers', 0, value_type=int, minimum=0,
+                           description='Number of subproblems solved in parallel, 0 for the number of cores'),
+            NumericSetting('random_seed', 0, value_type=int, minimum=0,
+                           description='Random seed of the neighborhood selection'),
+        ])
+
+    def _gen_subproblem_config(self):
+        """Creates the SAT configuration of the subproblems
+
+        :return: SAT solver configuration
+        :rtype: :class:`continuum_deployer.utils.config.Config`
+        """
+        _config = SAT([], []).get_config()
+        for name in ['target', 'objective_mode', 'time_limit', 'random_seed']:
+            _config.get_setting(name).set_value(self.config.get_setting(name).get_value())
+        # parallelism is spent on the subproblems
+        _config.get_setting('num_workers').set_value(1)
+        _config.get_setting('warm_start').set_value(SettingValue('previous'))
+        return _config
+
+    def score(self, resources, totals):
+        """Scores the placement on the given resources with the configured
+        target, higher is better. Only used resources count, like in SAT.
+
+        :param resources: resources to score
+        :type resources: list
+        :param totals: cpu and memory capacity to normalize weighted scores
+        :type totals: tuple
+        :return: score, compared lexicographically
+        :rtype: tuple
+        """
+        return SAT.score_placement(resources,
+                                   self.config.get_setting('target').get_value().value,
+                                   self.config.get_setting('objective_mode').get_value().value,
+                                   totals)
+
+    @staticmethod
+    def _at_least(score, other):
+        """Helper that compares two scores lexicographically with tolerance
+
+        :return: True if score is at least as good as other
+        :rtype: bool
+        """
+        for a, b in zip(score, other):
+            if a > b + LNS.EPSILON:
+                return True
+            if a < b - LNS.EPSILON:
+                return False
+        return True
+
+    @staticmethod
+    def first_fit(deployment_entities, resources):
+        """Cheap initial placement, first-fit decreasing over the resources in list order
+
+        :param deployment_entities: deployments to place
+        :type deployment_entities: list
+        :param resources: resources to place on
+        :type resources: list
+        :return: deployments that did not fit
+        :rtype: list
+        """
+        _tree = CapacityTree(resources)
+        _unplaced = []
+        for deployment in sorted(deployment_entities, key=lambda d: (d.cpu, d.memory), reverse=True):
+            i = _tree.first_fit(deployment.cpu, deployment.memory)
+            if i is None or not resources[i].add_deployment(deployment):
+                _unplaced.append(deployment)
+                continue
+            _tree.update(i)
+        return _unplaced
+
+    def _solve_tasks(self, pool, config, tasks):
+        """Solves the subproblems of a round, in the pool if one is given
+
+        :return: result of solve_neighborhood() per task
+        :rtype: list
+        """
+        _args = [(config, parallel.detach_deployments(task['deployments']),
+                  parallel.detach_deployments(task['extras']), task['resources'], task['previous'])
+                 for task in tasks]
+        if pool is not None:
+            _futures = [pool.submit(solve_neighborhood, *args) for args in _args]
+            return [future.result() for future in _futures]
+        return [solve_neighborhood(*args) for args in _args]
+
+    def do_matching(self, deployment_entities, resources):
+        """Actual solver implementation, see class description
+
+        :param deployment_entities: list of :class:`continuum_deployer.resources.deployment.DeploymentEntity` objects to place
+        :type deployment_entities: list
+        :param resources: list of :class:`continuum_deployer.resources.resource_entity.ResourceEntity` object to fill with deployments
+        :type resources: list
+        """
+        if not deployment_entities:
+            return
+        _unplaced = LNS.first_fit(deployment_entities, resources)
+        _own = {id(d) for d in deployment_entities}
+
+        _size = self.config.get_setting('neighborhood_size').get_value().value
+        _workers = self.config.get_setting('num_workers').get_value().value or os.cpu_count() or 1
+        _rng = random.Random(self.config.get_setting('random_seed').get_value().value)
+        _totals = (max(sum(r.cpu for r in resources), self.EPSILON),
+                   max(sum(r.memory for r in resources), self.EPSILON))
+        _config = self._gen_subproblem_config()
+
+        _order = list(range(len(resources)))
+        _pool = parallel.create_pool(_workers) if _workers > 1 and len(resources) > _size else None
+        try:
+            for iteration in range(self.config.get_setting('iterations').get_value().value):
+                _rng.shuffle(_order)
+                # each round re-optimizes all resources, split into disjoint neighborhoods
+                _neighborhoods = [_order[start:start + _size]
+                                  for start in range(0, len(_order), _size)]
+
+                # take the deployments of the neighborhoods out of the placement
+                _tasks = []
+                for n, nodes in enumerate(_neighborhoods):
+                    _resources = [resources[i] for i in nodes]
+                    _placed = [(r, d) for r in _resources for d in r.get_deployments() if id(d) in _own]
+                    _score = self.score(_resources, _totals)
+                    for resource, deployment in _placed:
+                        resource.remove_deployment(deployment)
+                    _tasks.append({
+                        'nodes': nodes, 'placed': _placed, 'score': _score,
+                        'deployments': [d for _, d in _placed],
+                        'extras': _unplaced[n::len(_neighborhoods)],
+                        'previous': {d.name: r.name for r, d in _placed},
+                        'resources': parallel.detach_resources(_resources),
+                    })
+
+                try:
+                    _results = self._solve_tasks(_pool, _config, _tasks)
+                except parallel.POOL_ERRORS:
+                    if _pool is None:
+                        raise
+                    click.echo(click.style(
+                        '[Warning] Subproblems can not be solved in parallel, solving serially.', fg='yellow'))
+                    _pool.shutdown()
+                    _pool = None
+                    _results = self._solve_tasks(_pool, _config, _tasks)
+
+                _accepted = 0
+                for task, result in zip(_tasks, _results):
+                    if not self._apply(task, result, resources, _totals):
+                        continue
+                    _accepted += 1
+                    if len(result) > len(task['deployments']):
+                        _placed = {id(d) for d in task['extras']}
+                        _unplaced = [d for d in _unplaced if id(d) not in _placed]
+                self.search_stats.append({'iteration': iteration, 'accepted': _accepted,
+                                          'unplaced': len(_unplaced)})
+
+                if len(_neighborhoods[0]) == len(resources):
+                    # a single neighborhood covers the whole task, nothing left to improve
+                    break
+        finally:
+            if _pool is not None:
+                _pool.shutdown()
+
+        self.placement_errors.extend(_unplaced)
+
+    def _apply(self, task, result, resources, totals):
+        """Applies the result of a subproblem if it places more deployments or
+        scores at least as good as the current placement, restores the current
+        placement otherwise.
+
+        :return: True if the result was applied
+        :rtype: bool
+        """
+        _resources = [resources[i] for i in task['nodes']]
+        if result is not None:
+            _candidates = task['deployments'] + task['extras']
+            _added = []
+            for i, j in result:
+                if not _resources[i].add_deployment(_candidates[j]):
+                    break
+                _added.append((_resources[i], _candidates[j]))
+            else:
+                if len(_added) > len(task['deployments']) or \
+                        LNS._at_least(self.score(_resources, totals), task['score']):
+                    return True
+            for resource, deployment in _added:
+                resource.remove_deployment(deployment)
+
+        for resource, deployment in task['placed']:
+            resource.add_deployment(deployment)
+        return False
+
+    def reset_matching(self):
+        super(LNS, self).reset_matching()
+        self.search_stats = []
+
+    def get_search_stats(self):
+        return self.search_stats
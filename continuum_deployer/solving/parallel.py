@@ -0,0 +1,117 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from continuum_deployer.resources.deployment import DeploymentEntity
+from continuum_deployer.resources.resource_entity import ResourceEntity
+
+# errors that show that a job can not be shipped to a worker process or the
+# pool can not be started, e.g. solver classes of plugins that are not
+# importable by name. Errors raised by the job itself are not included.
+POOL_ERRORS = (pickle.PicklingError, BrokenProcessPool, OSError)
+
+
+def detach_deployments(entities):
+    """Creates light copies of deployment entities that only carry the
+    values solvers need. Used to ship entities to worker processes without
+    the raw YAML definitions.
+
+    :param entities: deployment entities to copy
+    :type entities: list
+    :return: list of detached deployment entities
+    :rtype: list
+    """
+    return [DeploymentEntity(name=e.name, memory=e.memory, memory_limit=e.memory_limit,
+                             cpu=e.cpu, cpu_limit=e.cpu_limit, labels=e.labels)
+            for e in entities]
+
+
+def detach_resources(resources):
+    """Creates empty copies of resource entities that keep the current
+    idle capacity of the originals.
+
+    :param resources: resource entities to copy
+    :type resources: list
+    :return: list of detached resource entities
+    :rtype: list
+    """
+    _result = []
+    for resource in resources:
+        _copy = ResourceEntity(name=resource.name, memory=resource.memory,
+                               cpu=resource.cpu, labels=resource.labels)
+        _copy.used_cpu = resource.get_used_cpu()
+        _copy.used_memory = resource.get_used_memory()
+        _result.append(_copy)
+    return _result
+
+
+def apply_placements(resources, deployments, placements, errors):
+    """Replays index based placements on the original entities
+
+    :param resources: original resource entities
+    :type resources: list
+    :param deployments: original deployment entities
+    :type deployments: list
+    :param placements: (resource index, deployment index) pairs
+    :type placements: list
+    :param errors: indices of deployments that could not be placed
+    :type errors: list
+    :return: deployment entities that could not be placed
+    :rtype: list
+    """
+    _errors = [deployments[j] for j in errors]
+    for i, j in placements:
+        if not resources[i].add_deployment(deployments[j]):
+            _errors.append(deployments[j])
+    return _errors
+
+
+def solve_detached(solver_class, config, jobs, resources):
+    """Worker entry point that runs do_matching() of a fresh solver instance
+    for a list of jobs on detached entities.
+
+    :param solver_class: class of the solver to use
+    :type solver_class: type
+    :param config: solver configuration
+    :type config: :class:`continuum_deployer.utils.config.Config`
+    :param jobs: list of (deployment entities, resource indices) pairs, solved in order
+    :type jobs: list
+    :param resources: detached resource entities shared by all jobs
+    :type resources: list
+    :return: per job a list of (resource index, deployment index) placements in
+        placement order and a list of deployment indices that could not be placed
+    :rtype: list
+    """
+    _solver = solver_class([d for deployments, _ in jobs for d in deployments], resources)
+    _solver.config = config
+
+    _results = []
+    for deployments, resource_ids in jobs:
+        _resources = [resources[i] for i in resource_ids]
+        _placed_before = {i: len(resources[i].get_deployments()) for i in resource_ids}
+        _solver.placement_errors = []
+        _solver.do_matching(deployments, _resources)
+
+        _ids = {id(d): j for j, d in enumerate(deployments)}
+        _placements = []
+        for i in resource_ids:
+            for deployment in resources[i].get_deployments()[_placed_before[i]:]:
+                _placements.append((i, _ids[id(deployment)]))
+        _errors = [_ids[id(d)] for d in _solver.get_placement_errors() if id(d) in _ids]
+        _results.append((_placements, _errors))
+    return _results
+
+
+def create_pool(max_workers=None, initializer=None, initargs=()):
+    """Creates the process pool used for parallel solving
+
+    :param max_workers: maximum number of worker processes, defaults to number of cores
+    :type max_workers: int, optional
+    :param initializer: called in each worker process on start
+    :type initializer: function, optional
+    :param initargs: arguments of the initializer
+    :type initargs: tuple, optional
+    :return: process pool executor
+    :rtype: :class:`concurrent.futures.ProcessPoolExecutor`
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs)
@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+import signal
+import multiprocessing
+from multiprocessing import connection
+
+import click
+
+from continuum_deployer import plugins
+from continuum_deployer.solving import parallel
+from continuum_deployer.solving.solver import Solver
+from continuum_deployer.solving.greedy import Greedy
+from continuum_deployer.solving.sat import SAT
+from continuum_deployer.solving.rbmm import Rbmm
+from continuum_deployer.solving.lns import LNS
+from continuum_deployer.utils.config import Config, NumericSetting
+
+
+def run_candidate(conn, solver_class, config, deployments, resources):
+    """Process entry point that runs the full matching of one candidate solver
+    on detached entities and sends the result through the given connection.
+
+    :param conn: connection to send the result with
+    :type conn: :class:`multiprocessing.connection.Connection`
+    :param solver_class: class of the solver to run
+    :type solver_class: type
+    :param config: solver configuration, None for the defaults of the solver
+    :type config: :class:`continuum_deployer.utils.config.Config`
+    :param deployments: detached deployment entities
+    :type deployments: list
+    :param resources: detached resource entities
+    :type resources: list
+    """
+    # lead an own process group, cancelling then also stops the worker processes of the candidate
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    # the output of the candidates would interleave
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        _solver = solver_class(deployments, resources)
+        if config is not None:
+            _solver.config = config
+        # checks are run once by the portfolio, candidates run in own processes
+        _solver.PREFLIGHT_CHECKS = False
+        _solver.PARALLEL_GROUPS = False
+        _solver.match()
+
+        _ids = {id(d): j for j, d in enumerate(deployments)}
+        _placements = [(i, _ids[id(d)]) for i, resource in enumerate(resources)
+                       for d in resource.get_deployments()]
+        _errors = [_ids[id(d)] for d in _solver.get_placement_errors() if id(d) in _ids]
+        conn.send((_placements, _errors, None))
+    except Exception as e:
+        conn.send((None, None, '{}: {}'.format(type(e).__name__, e)))
+    finally:
+        conn.close()
+
+
+class Portfolio(Solver):
+    """Runs the built-in and plugin solvers in parallel processes on the same
+    input. Each result is scored with the configured objective, the best
+    result available at the deadline is used and the remaining solvers are
+    cancelled."""
+
+    # share of the deadline that solvers with a time limit get for their search
+    TIME_LIMIT_SHARE = 0.9
+
+    def __init__(self, deployment_entities, resources):
+        super().__init__(deployment_entities, resources)
+        # outcome of each candidate of the last race
+        self.portfolio_stats = []
+        self.winner = None
+
+    def _gen_config(self):
+        return Config(SAT.gen_objective_settings() + [
+            NumericSetting('deadline', 30.0, minimum=0,
+                           description='Seconds until the best available result is used, 0 waits for all solvers'),
+        ])
+
+    def get_candidates(self):
+        """Returns the solver classes that take part in the race
+
+        :return: list of solver classes
+        :rtype: list
+        """
+        _candidates = [Greedy, SAT, Rbmm, LNS]
+        for plugin in plugins.plugin_manager.getPluginsOfCategory("Solver"):
+            _candidates.append(plugin.plugin_object)
+        return _candidates
+
+    def _candidate_config(self, solver_class):
+        """Creates the configuration of a candidate. Settings shared with the
+        portfolio are taken over if the candidate offers the chosen value.
+
+        :param solver_class: class of the candidate
+        :type solver_class: type
+        :return: configuration of the candidate
+        :rtype: :class:`continuum_deployer.utils.config.Config`
+        """
+        _config = solver_class([], []).get_config()
+        for name in ['target', 'objective_mode']:
+            _setting = _config.get_setting(name)
+            if _setting is None:
+                continue
+            _value = self.config.get_setting(name).get_value().value
+            for option in _setting.get_options():
+                if option.value == _value:
+                    _setting.set_value(option)
+
+        _deadline = self.config.get_setting('deadline').get_value().value
+        if issubclass(solver_class, SAT) and _deadline > 0:
+            # return the best solution found instead of being cancelled, the
+            # limit is shared by the stages and label groups of the matching
+            _config.get_setting('total_time_limit').set_value(_deadline * self.TIME_LIMIT_SHARE)
+        return _config
+
+    def _score(self, deployment_entities, resources, placements, errors):
+        """Scores the result of a candidate, placing more deployments comes first
+
+        :param deployment_entities: deployments of the task
+        :type deployment_entities: list
+        :param resources: resources of the task
+        :type resources: list
+        :param placements: (resource index, deployment index) placements
+        :type placements: list
+        :param errors: indices of deployments that could not be placed
+        :type errors: list
+        :return: score, higher is better
+        :rtype: tuple
+        """
+        _resources = parallel.detach_resources(resources)
+        _errors = parallel.apply_placements(
+            _resources, parallel.detach_deployments(deployment_entities), placements, errors)
+        _totals = (max(sum(r.cpu for r in resources), 1),
+                   max(sum(r.memory for r in resources), 1))
+        return (len(deployment_entities) - len(_errors),) + SAT.score_placement(
+            _resources,
+            self.config.get_setting('target').get_value().value,
+            self.config.get_setting('objective_mode').get_value().value,
+            _totals)
+
+    @staticmethod
+    def cancel(process):
+        """Stops a candidate process together with the processes it started
+
+        :param process: candidate process started by :meth:`race`
+        :type process: :class:`multiprocessing.Process`
+        """
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except (AttributeError, OSError):
+            # no process groups on the platform or the candidate has not created its group yet
+            process.terminate()
+        process.join()
+
+    def race(self, deployment_entities, resources):
+        """Runs all candidates and collects their results until the deadline
+
+        :param deployment_entities: deployments to place
+        :type deployment_entities: list
+        :param resources: resources to place on
+        :type resources: list
+        :return: (solver name, placements, errors) per finished candidate
+        :rtype: list
+        """
+        _deadline = self.config.get_setting('deadline').get_value().value
+        _end = time.time() + _deadline if _deadline > 0 else None
+        _context = multiprocessing.get_context()
+
+        _pending = dict()
+        for solver_class in self.get_candidates():
+            _name = solver_class.__name__
+            _receiver, _sender = _context.Pipe(duplex=False)
+            _process = _context.Process(target=run_candidate, args=(
+                _sender, solver_class, self._candidate_config(solver_class),
+                parallel.detach_deployments(deployment_entities),
+                parallel.detach_resources(resources)))
+            try:
+                _process.start()
+            except parallel.POOL_ERRORS as e:
+                self.portfolio_stats.append({'solver': _name, 'status': 'failed', 'error': str(e)})
+                continue
+            finally:
+                _sender.close()
+            _pending[_receiver] = (_name, _process, time.time())
+
+        _results = []
+        try:
+            while _pending:
+                _timeout = None if _end is None else max(0, _end - time.time())
+                _ready = connection.wait(list(_pending.keys()), timeout=_timeout)
+                if not _ready:
+                    break
+                for receiver in _ready:
+                    _name, _process, _start = _pending.pop(receiver)
+                    try:
+                        _placements, _errors, _error = receiver.recv()
+                    except EOFError:
+                        _placements, _errors, _error = None, None, 'terminated'
+                    _process.join()
+                    _stats = {'solver': _name, 'wall_time': time.time() - _start}
+                    if _placements is None:
+                        _stats.update(status='failed', error=_error)
+                    else:
+                        _stats.update(status='finished', unplaced=len(_errors))
+                        _results.append((_name, _placements, _errors))
+                    self.portfolio_stats.append(_stats)
+        finally:
+            # cancel the solvers that missed the deadline
+            for _name, _process, _start in _pending.values():
+                Portfolio.cancel(_process)
+                self.portfolio_stats.append({'solver': _name, 'status': 'cancelled',
+                                             'wall_time': time.time() - _start})
+        return _results
+
+    def do_matching(self, deployment_entities, resources):
+        """Races the candidates on the given task and applies the best result.
+        Candidates run their complete matching including label handling.
+
+        :param deployment_entities: list of :class:`continuum_deployer.resources.deployment.DeploymentEntity` objects to place
+        :type deployment_entities: list
+        :param resources: list of :class:`continuum_deployer.resources.resource_entity.ResourceEntity` object to fill with deployments
+        :type resources: list
+        """
+        _best = None
+        for name, placements, errors in self.race(deployment_entities, resources):
+            _score = self._score(deployment_entities, resources, placements, errors)
+            if _best is None or _score > _best[0]:
+                _best = (_score, name, placements, errors)
+
+        if _best is None:
+            click.echo(click.style(
+                '[Warning] No solver finished before the deadline.', fg='yellow'))
+            self.placement_errors.extend(deployment_entities)
+            return
+
+        _, self.winner, _placements, _errors = _best
+        self.placement_errors.extend(parallel.apply_placements(
+            resources, deployment_entities, _placements, _errors))
+
+    def match(self):
+        """Runs the preflight checks once and races the candidates on all deployments
+        """
+        self.check_upper_bound(self.deployment_entities, self.resources)
+        self.preflight()
+        self.do_matching(self.deployment_entities, self.resources)
+
+    def reset_matching(self):
+        super(Portfolio, self).reset_matching()
+        self.portfolio_stats = []
+        self.winner = None
+
+    def get_portfolio_stats(self):
+        return self.portfolio_stats
+
+    def get_winner(self):
+        return self.winner
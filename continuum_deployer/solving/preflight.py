@@ -0,0 +1,185 @@
+import math
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from continuum_deployer.resources.cluster_state import ClusterState
+from continuum_deployer.resources.label_index import LabelIndex
+from continuum_deployer.utils.ui import UI
+
+
+@dataclass
+class Infeasibility:
+    """Data Class that describes a single reason why a matching is infeasible."""
+
+    # name of the failed check: capacity, lower_bound or no_resources
+    check: str = field(default=None)
+    # resource dimension the check failed for (cpu or memory), None if not related
+    dimension: str = field(default=None)
+    # labels of the affected group, None for all deployments
+    group: dict = field(default=None)
+    # amount required by the deployments (resources or number of nodes)
+    required: float = field(default=0)
+    # amount available on the suitable resources
+    available: float = field(default=0)
+
+    def __str__(self):
+        _group = 'group [{}]'.format(UI.pretty_label_string(self.group)) \
+            if self.group is not None else 'all deployments'
+        if self.check == 'no_resources':
+            return 'No suitable resources for {}.'.format(_group)
+        if self.check == 'lower_bound':
+            return ('{} packing of {} needs at least {} nodes, '
+                    'only {} suitable nodes available.').format(
+                self.dimension, _group, self.required, self.available)
+        return '{} request of {} ({:g}) exceeds available capacity ({:g}).'.format(
+            self.dimension, _group, self.required, self.available)
+
+
+@dataclass
+class PreflightReport:
+    """Data Class that holds the results of the preflight checks."""
+
+    issues: List[Infeasibility] = field(default_factory=list)
+
+    def is_feasible(self):
+        return len(self.issues) == 0
+
+    def summary(self):
+        """Creates a human readable summary of the found issues
+
+        :return: summary, one issue per line
+        :rtype: str
+        """
+        return '[Error] Matching is infeasible:\n{}'.format(
+            '\n'.join(' - {}'.format(issue) for issue in self.issues))
+
+
+class Preflight:
+    """Cheap feasibility checks that are run before the actual matching. Checks
+    aggregated capacity and bin-packing lower bounds on the number of needed nodes
+    for all deployments and for each label group."""
+
+    DIMENSIONS = ['cpu', 'memory']
+
+    # tolerance for float rounding of cpu values
+    EPSILON = 1e-9
+
+    def __init__(self, deployment_entities, resources, label_index=None):
+        self.deployment_entities = deployment_entities
+        self.resources = resources
+        self.label_index = label_index if label_index is not None \
+            else LabelIndex.from_resources(resources)
+
+    @staticmethod
+    def lower_bound(sizes, capacity):
+        """Martello-Toth lower bound L2 on the number of bins of the given capacity
+        needed to pack the given item sizes. As any node of a heterogeneous set is
+        at most as large as the largest one, the bound holds with its capacity.
+
+        :param sizes: item sizes
+        :type sizes: :class:`numpy.ndarray`
+        :param capacity: bin capacity
+        :type capacity: float
+        :return: lower bound on the number of bins
+        :rtype: int
+        """
+        _sizes = np.sort(sizes[sizes > 0])[::-1]
+        if len(_sizes) == 0:
+            return 0
+        if capacity <= 0:
+            return math.inf
+
+        _l1 = math.ceil(_sizes.sum() / capacity - Preflight.EPSILON)
+
+        # ascending sizes with prefix sums for range queries
+        _asc = _sizes[::-1]
+        _prefix = np.concatenate(([0], np.cumsum(_asc)))
+
+        def _count_sum(low, high, low_inclusive):
+            # number and sum of sizes in (low, high] or [low, high]
+            _lo = np.searchsorted(_asc, low, side='left' if low_inclusive else 'right')
+            _hi = np.searchsorted(_asc, high, side='right')
+            return max(_hi - _lo, 0), _prefix[max(_hi, _lo)] - _prefix[_lo]
+
+        _best = _l1
+        _half = capacity / 2
+        _alphas = np.unique(np.concatenate(([0], _asc[_asc <= _half])))
+        for alpha in _alphas:
+            _j1, _ = _count_sum(capacity - alpha, np.inf, False)
+            _j2, _sum_j2 = _count_sum(_half, capacity - alpha, False)
+            _j3, _sum_j3 = _count_sum(alpha, _half, True)
+            _free_j2 = _j2 * capacity - _sum_j2
+            _bound = _j1 + _j2 + max(0, math.ceil(
+                (_sum_j3 - _free_j2) / capacity - Preflight.EPSILON))
+            _best = max(_best, _bound)
+        return int(_best)
+
+    def _check_group(self, state, workloads, nodes, labels):
+        """Runs the capacity and lower bound checks for a set of workloads
+
+        :param state: cluster state of all resources and deployments
+        :type state: :class:`continuum_deployer.resources.cluster_state.ClusterState`
+        :param workloads: indices of the workloads of the group
+        :type workloads: :class:`numpy.ndarray`
+        :param nodes: indices of the suitable nodes
+        :type nodes: :class:`numpy.ndarray`
+        :param labels: labels of the group, None for all deployments
+        :type labels: dict
+        :return: list of found issues
+        :rtype: list
+        """
+        if len(workloads) == 0:
+            return []
+        if len(nodes) == 0:
+            return [Infeasibility(check='no_resources', group=labels)]
+
+        _issues = []
+        _requests = {'cpu': state.cpu_request, 'memory': state.memory_request}
+        _idle = {'cpu': state.idle_cpu(), 'memory': state.idle_memory()}
+        for dimension in self.DIMENSIONS:
+            _sizes = _requests[dimension][workloads]
+            _capacities = _idle[dimension][nodes]
+
+            _required = float(_sizes.sum())
+            _available = float(_capacities.sum())
+            if _required > _available + self.EPSILON:
+                _issues.append(Infeasibility(check='capacity', dimension=dimension,
+                                             group=labels, required=_required, available=_available))
+                continue
+
+            _bound = Preflight.lower_bound(_sizes, float(_capacities.max()))
+            if _bound > len(nodes):
+                _issues.append(Infeasibility(check='lower_bound', dimension=dimension,
+                                             group=labels, required=_bound, available=len(nodes)))
+        return _issues
+
+    def run(self):
+        """Runs all preflight checks
+
+        :return: report with all found issues
+        :rtype: :class:`continuum_deployer.solving.preflight.PreflightReport`
+        """
+        _report = PreflightReport()
+        # label groups are taken from the label index, only capacities are needed
+        _state = ClusterState(self.resources, self.deployment_entities, labels=False)
+
+        _report.issues.extend(self._check_group(
+            _state, np.arange(len(self.deployment_entities)), np.arange(len(self.resources)), None))
+
+        # group labeled deployments by their labels
+        _groups = dict()
+        for j, entity in enumerate(self.deployment_entities):
+            if entity.labels is not None:
+                _groups.setdefault(self.label_index.token(
+                    entity.labels), []).append(j)
+
+        for token in sorted(_groups.keys()):
+            _labels = self.deployment_entities[_groups[token][0]].labels
+            _nodes = np.fromiter(LabelIndex.iter_ids(
+                self.label_index.select(_labels)), dtype=np.int64)
+            _report.issues.extend(self._check_group(
+                _state, np.array(_groups[token]), _nodes, _labels))
+
+        return _report
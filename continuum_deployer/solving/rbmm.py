@@ -1,12 +1,15 @@
+import os
+import multiprocessing
+
 import click
-import copy
-import sys
+import numpy as np
 
 from continuum_deployer.resources.resource_entity import ResourceEntity
+from continuum_deployer.solving import parallel
 from continuum_deployer.solving.solver import Solver
-from continuum_deployer.utils.config import Config, Setting, SettingValue
-
-IDENTITY = 0x23420509
+from continuum_deployer.solving.rbmm_rules import IDENTITY, FactorTable, RuleSet, RuleSetting
+from continuum_deployer.utils.config import Config, Setting, SettingValue, NumericSetting
+from continuum_deployer.utils import tracing
 
 
 class MultiFactor:
@@ -30,8 +33,163 @@ class Artefact(MultiFactor):
     pass
 
 
+# steps of the search between checks for cancellation
+CANCEL_CHECK_INTERVAL = 256
+
+# search state of a worker process, set by init_worker()
+_worker_state = None
+
+
+def feasible(masks, order, depth, used):
+    """Checks if the artefacts from the given depth on can still be mapped.
+    Every remaining artefact needs a free valid resource and all of them
+    together need enough distinct free resources.
+
+    :param masks: bitmask of the valid resources per artefact
+    :type masks: list
+    :param order: artefact indices in search order
+    :type order: list
+    :param depth: number of mapped artefacts
+    :type depth: int
+    :param used: bitmask of the mapped resources
+    :type used: int
+    :return: False if no mapping below this state exists
+    :rtype: bool
+    """
+    union = 0
+    for j in order[depth:]:
+        free = masks[j] & ~used
+        if not free:
+            return False
+        union |= free
+    return bin(union).count("1") >= len(order) - depth
+
+
+def branches(masks, order, candidates, limit, prefix=(), cancelled=None):
+    """Iterative branch and bound over the mappings of artefacts to distinct
+    resources. Yields the feasible mappings of the first limit artefacts that
+    extend the prefix, in search order. A limit of all artefacts yields
+    complete mappings.
+
+    :param masks: bitmask of the valid resources per artefact
+    :type masks: list
+    :param order: artefact indices in search order
+    :type order: list
+    :param candidates: resource indices per search depth, in the order they are tried
+    :type candidates: list
+    :param limit: number of artefacts to map
+    :type limit: int
+    :param prefix: resource indices of the first artefacts, fixed
+    :type prefix: tuple
+    :param cancelled: called periodically, the search stops if it returns True
+    :type cancelled: function
+    :return: generator of resource index lists per search depth
+    :rtype: generator
+    """
+    start = len(prefix)
+    assigned = list(prefix) + [None] * (len(order) - start)
+    used = 0
+    for i in prefix:
+        used |= 1 << i
+    position = [0] * len(order)
+    failed = set()
+    depth = start
+    steps = 0
+    _trace = tracing.enabled(tracing.TRACE)
+    while depth >= start:
+        if depth == limit:
+            yield assigned[:limit]
+            # continue with the next candidate of the last mapped artefact
+            depth -= 1
+            if depth >= start:
+                used &= ~(1 << assigned[depth])
+            continue
+
+        steps += 1
+        if cancelled is not None and steps % CANCEL_CHECK_INTERVAL == 0 and cancelled():
+            return
+        advanced = False
+        while position[depth] < len(candidates[depth]):
+            i = candidates[depth][position[depth]]
+            position[depth] += 1
+            if used >> i & 1:
+                continue
+            state = used | 1 << i
+            if (depth + 1, state) in failed:
+                continue
+            if not feasible(masks, order, depth + 1, state):
+                failed.add((depth + 1, state))
+                continue
+            if _trace:
+                tracing.trace(tracing.TRACE, 'rbmm.assign', depth=depth, artefact=order[depth], resource=i)
+            assigned[depth] = i
+            used = state
+            depth += 1
+            advanced = True
+            break
+        if advanced:
+            if depth < len(order):
+                position[depth] = 0
+            continue
+        # no candidate left, undo the mapping of the previous artefact.
+        # the same artefacts are left for the same resources on every path
+        # to this state, so it is not searched again.
+        failed.add((depth, used))
+        if _trace:
+            tracing.trace(tracing.TRACE, 'rbmm.backtrack', depth=depth)
+        depth -= 1
+        if depth >= start:
+            used &= ~(1 << assigned[depth])
+
+
+def init_worker(masks, order, candidates, best):
+    """Initializer of the worker processes of a parallel search
+
+    :param best: shared index of the first subtree with a mapping found so far
+    :type best: :class:`multiprocessing.Value`
+    """
+    global _worker_state
+    _worker_state = (masks, order, candidates, best)
+
+
+def search_subtrees(first, prefixes):
+    """Worker entry point that searches the subtrees below the given prefixes
+    in order. Subtrees after the first subtree with a mapping found by any
+    worker are skipped or cancelled.
+
+    :param first: index of the first subtree
+    :type first: int
+    :param prefixes: prefixes of the subtrees
+    :type prefixes: list
+    :return: subtree index and resource indices per search depth of the first
+        mapping found, None if none was found
+    :rtype: tuple
+    """
+    masks, order, candidates, best = _worker_state
+    for k, prefix in enumerate(prefixes, first):
+        if best.value < k:
+            return None
+        _mapping = next(branches(masks, order, candidates, len(order), prefix,
+                                 lambda: best.value < k), None)
+        if _mapping is not None:
+            with best.get_lock():
+                if k < best.value:
+                    best.value = k
+            return k, _mapping
+    return None
+
+
 class Rbmm(Solver):
 
+    # subtrees are searched in parallel, label groups are solved one by one
+    PARALLEL_GROUPS = False
+
+    # smaller searches are not worth starting worker processes
+    PARALLEL_MIN_ARTEFACTS = 64
+
+    # subtrees per task of a worker process are balanced to this many tasks per worker
+    TASKS_PER_WORKER = 4
+
     @staticmethod
     def deploy_iterate(entity, resource):
         if resource.add_deployment(entity):
@@ -39,7 +197,39 @@ class Rbmm(Solver):
         return False
 
     def _gen_config(self):
-        return Config([])
+        return Config([
+            RuleSetting('rules', description='Dependency and accumulation rules, set from a rule definition'),
+            NumericSetting('split_depth', 1, value_type=int, minimum=0,
+                           description='Number of artefacts mapped before the search is split into subtrees searched in parallel, 0 searches serially'),
+            NumericSetting('num_workers', 0, value_type=int, minimum=0,
+                           description='Number of subtrees searched in parallel, 0 for the number of cores'),
+        ])
+
+    @staticmethod
+    def get_factors(entity, names):
+        """Extracts the factors of an entity, additional factors are taken
+        from the attribute or label of the same name
+
+        :param entity: deployment or resource entity
+        :type entity: object
+        :param names: additional factors the rules refer to
+        :type names: set
+        :return: factors of the entity
+        :rtype: dict
+        """
+        _factors = {"name": entity.name, "cpu": entity.cpu, "memory": entity.memory}
+        for name in sorted(names - set(_factors)):
+            _value = getattr(entity, name, None)
+            if _value is None and entity.labels and name in entity.labels:
+                # label values are strings, numeric ones are compared as numbers
+                _value = entity.labels[name]
+                try:
+                    _value = float(_value)
+                except (TypeError, ValueError):
+                    pass
+            if _value is not None:
+                _factors[name] = _value
+        return _factors
 
     def rbmm_match(self, entities, resources):
         app = []
@@ -47,24 +237,29 @@ class Rbmm(Solver):
         resList = list(resources)
         entityList = list(entities)
 
-        # DeploymentEntity -> Artefact, considering only cpu & memory for now but can be extended to add all props of Deployment entity
+        rules = self.config.get_setting('rules').get_value().value
+        artefact_factors, resource_factors = rules.get_factors()
+
+        # DeploymentEntity -> Artefact, with the factors the rules refer to
         for entity in entityList:
-            app.append(Artefact({"name": entity.name, "cpu": entity.cpu, "memory": entity.memory}))
+            app.append(Artefact(Rbmm.get_factors(entity, artefact_factors)))
 
         # ResourceEntity -> Resource
         for r in resList:
-            res.append(Resource({"name": r.name, "cpu": r.cpu, "memory": r.memory}))
-
-        # Dep Rules
-        dep_rules = {"memory": ("memory", ">=", IDENTITY),
-                     "cpu": ("cpu", ">=", IDENTITY)}
+            res.append(Resource(Rbmm.get_factors(r, resource_factors)))
 
-        # Acc Rules
-        # acc_rules = None
-        acc_rules = {"memory": "-"}
+        dep_rules = rules.dep_rules
+        acc_rules = rules.acc_rules
 
         # map Artefacts ( i.e, Deployment entities) to resources
         mapping = Rbmm.mapArtefactResources(self, app, res, dep_rules, acc_rules, 0, None)
+        if mapping is None:
+            click.echo(click.style(
+                '[Warning] No rule based mapping to distinct resources exists, deployments share resources.',
+                fg='yellow'))
+            mapping = {}
+            for a in app:
+                mapping.update(Rbmm.mapArtefactResources(self, [a], res, dep_rules, None, 0, None) or {})
 
         newMappingDict = {}
         for k, v in mapping.items():
@@ -73,11 +268,14 @@ class Rbmm(Solver):
         for entity in entities:
             # Get resource mapping of artefact of same name from entity
             mappedResource = newMappingDict.get(entity.name)
+            if mappedResource is None:
+                self.placement_errors.append(entity)
+                continue
 
             # Resource -> ResourceEntity
             resEntity = next((x for x in resources if x.name == mappedResource.factors.get('name')), None)
 
-            if not Rbmm.deploy_iterate(entity, resEntity):
+            if resEntity is None or not Rbmm.deploy_iterate(entity, resEntity):
                 self.placement_errors.append(entity)
 
     def do_matching(self, deployment_entities, resources):
@@ -86,123 +284,170 @@ class Rbmm(Solver):
             resources
         )
 
-    def mapArtefactResources(self, app, res, dep_rules, acc_rules, level=0, skip=None):
-        print("/// enter mapping", app, "X", res, "@", level)
-        if skip:
-            a_copy = {}
-            r_copy = {}
-            for f in skip:
-                for a in app:
-                    if f in a.factors:
-                        a_copy.setdefault(a, {})[f] = a.factors[f]
-                        del a.factors[f]
-                        print("! filter", a, f)
-                for r in res:
-                    if f in r.factors:
-                        r_copy.setdefault(r, {})[f] = r.factors[f]
-                        del r.factors[f]
-                        print("! filter", r, f)
-        mapping = {}
-        if acc_rules:
-            rescopy = copy.deepcopy(res)
-            res = rescopy
-        breakres = False
+    @staticmethod
+    def rule_masks(app, res, rules, skip=None):
+        """Checks the rules of each artefact against all resources at once
+
+        :param app: artefacts to map
+        :type app: list
+        :param res: resources to map to
+        :type res: list
+        :param rules: compiled rules
+        :type rules: :class:`continuum_deployer.solving.rbmm_rules.RuleSet`
+        :param skip: factors to ignore
+        :type skip: list
+        :return: bitmask of the valid resources per artefact
+        :rtype: list
+        """
+        table = FactorTable(res)
+        masks = []
+        _trace = tracing.enabled(tracing.TRACE)
         for a in app:
-            if breakres:
-                break
-            for r in res:
-                print("match", a, "X", r)
-                if acc_rules:
-                    rforig = copy.deepcopy(r.factors)
-                valid = True
-                if a.factors:
-                    for f in a.factors:
-                        print(" -", f)
-                        if f in dep_rules:
-                            reval = False
-                            rf, op, val = dep_rules[f]
-                            if not r.factors or not rf in r.factors:
-                                print("   !! factor absent from resource")
-                            else:
-                                rfval = r.factors[rf]  # take value from resource, eg node-1
-                                if val == IDENTITY:
-                                    val = a.factors[f]
-                                reval = self.matchop(rfval, op, val)
-                            print("   ->", self.printablerules(dep_rules[f]), reval)
-                            if not reval:
-                                valid = False
-                        if acc_rules and valid:
-                            if f in acc_rules:
-                                if f in r.factors and f in a.factors:
-                                    op = acc_rules[f]
-                                    if op == "-":
-                                        print("# reduce", f, "in", r, "by", a.factors[f])
-                                        # reduce memory in Resource[{'name': 'node-3', 'cpu': 2, 'memory': 540}] by 536
-                                        r.factors[f] -= a.factors[f]
-                                else:
-                                    print("!! factor absent in resource or app")
-                print("= valid", valid)
-                if valid:
-                    mapping[a] = r
-                    if not acc_rules:
-                        break
-                    else:
-                        print("//> partial mapping", a, "->", r)
-                        # recursion starts here
-                        remres = []
-                        for rr in res:
-                            if r != rr:
-                                remres.append(rr)
-                        remapp = []
-                        for ra in app:
-                            if a != ra:
-                                remapp.append(ra)
-                        if remapp:
-                            # shortcut, not strictly necessary
-                            rmapping = self.mapArtefactResources(remapp, remres, dep_rules, acc_rules, level + 1)
-                            if not rmapping:
-                                valid = False
-                            else:
-                                for a in rmapping:
-                                    mapping[a] = rmapping[a]
-                        if valid:
-                            breakres = True
-                            break
-                if not valid:
-                    if acc_rules:
-                        r.factors = rforig
-            if not a in mapping:
-                print("!! mapping failed")
-                return
-        if skip:
-            for a in a_copy:
-                a.factors.update(a_copy[a])
-            for r in res:
-                r.factors.update(r_copy[r])
-        print("/// leave mapping:", mapping, "@", level)
+            mask = rules.evaluate(a.factors, table, skip)
+            masks.append(int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little"))
+            if _trace:
+                tracing.trace(tracing.TRACE, 'rbmm.rules', artefact=a.factors.get("name"),
+                              valid=[r.factors.get("name") for r, valid in zip(res, mask) if valid])
+        return masks
+
+    @staticmethod
+    def max_matching(masks, order):
+        """Size of a maximum matching of artefacts to distinct resources,
+        computed with augmenting paths
+
+        :param masks: bitmask of the valid resources per artefact
+        :type masks: list
+        :param order: artefact indices to match
+        :type order: list
+        :return: number of matched artefacts
+        :rtype: int
+        """
+        owner = dict()
+        size = 0
+        for a in order:
+            visited = 0
+            # iterative depth-first search for an augmenting path
+            stack = [[a, masks[a], -1]]
+            while stack:
+                top = stack[-1]
+                cand = top[1] & ~visited
+                if not cand:
+                    stack.pop()
+                    continue
+                low = cand & -cand
+                visited |= low
+                top[1] = cand & ~low
+                top[2] = low.bit_length() - 1
+                if top[2] not in owner:
+                    for art, _, r in stack:
+                        owner[r] = art
+                    size += 1
+                    break
+                stack.append([owner[top[2]], masks[owner[top[2]]], -1])
+        return size
+
+    def mapArtefactResources(self, app, res, dep_rules, acc_rules, level=0, skip=None):
+        """Maps the artefacts to the resources so that all dependency rules
+        hold. Without accumulation rules each artefact takes the first valid
+        resource, with accumulation rules each artefact takes a resource of its
+        own, which is searched by an iterative branch and bound.
+
+        :param app: artefacts to map
+        :type app: list
+        :param res: resources to map to
+        :type res: list
+        :param dep_rules: dependency rules, artefact factor -> (resource factor, operator, value)
+        :type dep_rules: dict
+        :param acc_rules: accumulation rules, factor -> operator
+        :type acc_rules: dict
+        :param level: unused, kept for compatibility
+        :type level: int
+        :param skip: factors to ignore
+        :type skip: list
+        :return: artefact -> resource, None if no mapping exists
+        :rtype: dict
+        """
+        if tracing.enabled(tracing.DEBUG):
+            tracing.trace(tracing.DEBUG, 'rbmm.mapping', artefacts=len(app), resources=len(res),
+                          rules=[self.printablerules(rule) for rule in dep_rules.values()], acc_rules=acc_rules)
+        # the mapped resource is not available to other artefacts anymore, so
+        # the validity of each pair does not change during the search
+        masks = Rbmm.rule_masks(app, res, RuleSet(dep_rules, acc_rules), skip)
+
+        if not acc_rules:
+            if not all(masks):
+                tracing.trace(tracing.DEBUG, 'rbmm.failed', reason='artefact without valid resource')
+                return None
+            return {a: res[(mask & -mask).bit_length() - 1] for a, mask in zip(app, masks)}
+
+        # most constrained artefacts first, least contested resources first
+        n = len(app)
+        order = sorted(range(n), key=lambda j: (bin(masks[j]).count("1"), j))
+        contested = [sum(mask >> i & 1 for mask in masks) for i in range(len(res))]
+        candidates = [sorted((i for i in range(len(res)) if masks[j] >> i & 1),
+                             key=lambda i: (contested[i], i)) for j in order]
+        if n > len(res) or self.max_matching(masks, order) < n:
+            tracing.trace(tracing.DEBUG, 'rbmm.failed', reason='no mapping to distinct resources')
+            return None
+
+        assigned = self.search(masks, order, candidates)
+        if assigned is None:
+            tracing.trace(tracing.DEBUG, 'rbmm.failed', reason='search exhausted')
+            return None
+        mapping = {app[j]: res[i] for j, i in zip(order, assigned)}
+        if tracing.enabled(tracing.DEBUG):
+            tracing.trace(tracing.DEBUG, 'rbmm.mapped', mapping={
+                a.factors.get("name"): r.factors.get("name") for a, r in mapping.items()})
         return mapping
 
+    def search(self, masks, order, candidates):
+        """Searches the first mapping of the artefacts to distinct resources.
+        Large searches are split into the subtrees below the mappings of the
+        first artefacts, which are searched in parallel. The result is the
+        same as of the serial search.
+
+        :param masks: bitmask of the valid resources per artefact
+        :type masks: list
+        :param order: artefact indices in search order
+        :type order: list
+        :param candidates: resource indices per search depth, in the order they are tried
+        :type candidates: list
+        :return: resource indices per search depth, None if no mapping exists
+        :rtype: list
+        """
+        _depth = min(self.config.get_setting('split_depth').get_value().value, len(order))
+        _workers = self.config.get_setting('num_workers').get_value().value or os.cpu_count() or 1
+        if _depth == 0 or _workers < 2 or len(order) < self.PARALLEL_MIN_ARTEFACTS:
+            return next(branches(masks, order, candidates, len(order)), None)
+
+        _prefixes = list(branches(masks, order, candidates, _depth))
+        if len(_prefixes) < 2:
+            return next(branches(masks, order, candidates, len(order)), None)
+
+        _best = multiprocessing.Value('q', len(_prefixes))
+        _size = max(1, -(-len(_prefixes) // (_workers * self.TASKS_PER_WORKER)))
+        try:
+            _pool = parallel.create_pool(_workers, initializer=init_worker,
+                                         initargs=(masks, order, candidates, _best))
+            with _pool:
+                _futures = [_pool.submit(search_subtrees, first, _prefixes[first:first + _size])
+                            for first in range(0, len(_prefixes), _size)]
+                _results = [future.result() for future in _futures]
+        except parallel.POOL_ERRORS:
+            click.echo(click.style(
+                '[Warning] Subtrees can not be searched in parallel, searching serially.', fg='yellow'))
+            return next(branches(masks, order, candidates, len(order)), None)
+
+        _found = [result for result in _results if result is not None]
+        if not _found:
+            return None
+        return min(_found, key=lambda result: result[0])[1]
+
     def printablerules(self, r):
         rx = r[2]
         if rx == IDENTITY:
             rx = "*"
         return f"({r[0]} {r[1]} {rx})"
 
-    def matchop(self, rfval, op, val):
-        r = False
-        if op == "=":
-            if rfval == val:
-                r = True
-        elif op == ">=":
-            if rfval >= val:
-                r = True
-        elif op == "<=":
-            if rfval <= val:
-                r = True
-        elif op == "<>" or op == "!=":
-            if rfval != val:
-                r = True
-        return r
-
     def match(self):
         super(Rbmm, self).match()
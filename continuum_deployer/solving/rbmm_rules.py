@@ -0,0 +1,217 @@
+import operator
+
+import numpy as np
+
+from continuum_deployer.utils.config import Setting, SettingValue
+
+# rule value that stands for the value of the artefact factor
+IDENTITY = 0x23420509
+
+# comparison operators of dependency rules
+OPERATORS = {
+    "=": operator.eq,
+    ">=": operator.ge,
+    "<=": operator.le,
+    "<>": operator.ne,
+    "!=": operator.ne,
+}
+
+# operators of accumulation rules
+ACCUMULATORS = {"-"}
+
+DEFAULT_DEP_RULES = {"memory": ("memory", ">=", IDENTITY),
+                     "cpu": ("cpu", ">=", IDENTITY)}
+DEFAULT_ACC_RULES = {"memory": "-"}
+
+
+class FactorTable:
+    """Column view on the factors of a list of resources. Each factor is kept
+    as array over all resources, so rules are checked for all resources at
+    once."""
+
+    def __init__(self, items):
+        self.items = items
+        self.size = len(items)
+        self._columns = dict()
+
+    def column(self, name):
+        """Returns the values of a factor over all resources
+
+        :param name: name of the factor
+        :type name: str
+        :return: values, numeric if possible, and mask of the resources that have the factor
+        :rtype: tuple
+        """
+        if name not in self._columns:
+            _values = [(item.factors or {}).get(name) for item in self.items]
+            _present = np.array([v is not None for v in _values], dtype=bool)
+            try:
+                _column = np.array([np.nan if v is None else float(v) for v in _values], dtype=float)
+            except (TypeError, ValueError):
+                _column = np.empty(self.size, dtype=object)
+                _column[:] = _values
+            self._columns[name] = (_column, _present)
+        return self._columns[name]
+
+
+class RuleSet:
+    """Dependency and accumulation rules of RBMM, compiled to predicates that
+    evaluate one artefact against all resources of a :class:`FactorTable`.
+
+    Dependency rules map an artefact factor to (resource factor, operator,
+    value), a value of IDENTITY compares with the artefact factor. Accumulation
+    rules map a factor to an operator that is applied to the resource factor
+    once the artefact factor was checked.
+    """
+
+    def __init__(self, dep_rules=None, acc_rules=None):
+        self.dep_rules = dict(DEFAULT_DEP_RULES if dep_rules is None else dep_rules)
+        self.acc_rules = dict(acc_rules or {})
+        self._predicates = {f: RuleSet._compile(*rule) for f, rule in self.dep_rules.items()}
+
+    def __getstate__(self):
+        # compiled predicates are closures, they are compiled again after unpickling
+        return {'dep_rules': self.dep_rules, 'acc_rules': self.acc_rules}
+
+    def __setstate__(self, state):
+        self.__init__(state['dep_rules'], state['acc_rules'])
+
+    @staticmethod
+    def _compile(resource_factor, op, value):
+        """Compiles a dependency rule
+
+        :raises ValueError: raised if the operator is unknown
+        :return: predicate(table, reduced, artefact value) returning a mask over the resources
+        :rtype: function
+        """
+        if op not in OPERATORS:
+            raise ValueError('unknown rule operator {}'.format(op))
+        _compare = OPERATORS[op]
+
+        def predicate(table, reduced, artefact_value):
+            _values, _present = table.column(resource_factor)
+            if resource_factor in reduced:
+                _values = _values - reduced[resource_factor]
+            _value = artefact_value if value == IDENTITY else value
+            try:
+                _result = np.asarray(_compare(_values, _value), dtype=bool)
+            except TypeError:
+                # values of mixed types, fall back to comparing one by one
+                _result = np.array([RuleSet._safe_compare(_compare, v, _value) for v in _values], dtype=bool)
+            return _present & _result
+
+        return predicate
+
+    @staticmethod
+    def _safe_compare(compare, a, b):
+        try:
+            return bool(compare(a, b))
+        except TypeError:
+            return False
+
+    @staticmethod
+    def from_definition(definition):
+        """Creates a rule set from a definition as loaded from YAML, e.g.::
+
+            dep_rules:
+              cpu: [cpu, '>=', '*']
+              gpu: {resource: gpu, operator: '>=', value: 1}
+            acc_rules:
+              memory: '-'
+
+        The resource factor defaults to the artefact factor and the value to '*',
+        which stands for the value of the artefact factor.
+
+        :param definition: rule definition
+        :type definition: dict
+        :raises ValueError: raised if the definition is malformed
+        :return: compiled rules
+        :rtype: :class:`RuleSet`
+        """
+        if not isinstance(definition, dict):
+            raise ValueError('rules must be a mapping')
+        _unknown = set(definition) - {'dep_rules', 'acc_rules'}
+        if _unknown:
+            raise ValueError('unknown rule sections {}'.format(', '.join(sorted(_unknown))))
+
+        _dep_rules = dict()
+        for factor, rule in (definition.get('dep_rules') or {}).items():
+            if isinstance(rule, dict):
+                rule = (rule.get('resource', factor), rule.get('operator'), rule.get('value', '*'))
+            if not isinstance(rule, (list, tuple)) or len(rule) != 3:
+                raise ValueError('rule of {} must be [resource factor, operator, value]'.format(factor))
+            _resource_factor, _op, _value = rule
+            _dep_rules[factor] = (_resource_factor, _op, IDENTITY if _value == '*' else _value)
+
+        _acc_rules = dict(definition.get('acc_rules') or {})
+        for factor, op in _acc_rules.items():
+            if op not in ACCUMULATORS:
+                raise ValueError('unknown accumulation operator {} of {}'.format(op, factor))
+        return RuleSet(_dep_rules, _acc_rules)
+
+    def get_factors(self):
+        """Returns the factors the rules refer to
+
+        :return: artefact factors and resource factors
+        :rtype: tuple
+        """
+        _artefact = set(self.dep_rules) | set(self.acc_rules)
+        _resource = {rule[0] for rule in self.dep_rules.values()} | set(self.acc_rules)
+        return _artefact, _resource
+
+    def evaluate(self, factors, table, skip=None):
+        """Checks the factors of an artefact against all resources. Factors are
+        checked in order, accumulation rules reduce the resource factors for
+        the factors checked after them.
+
+        :param factors: factors of the artefact
+        :type factors: dict
+        :param table: resources to check
+        :type table: :class:`FactorTable`
+        :param skip: factors to ignore
+        :type skip: list
+        :return: mask of the resources all dependency rules hold for
+        :rtype: :class:`numpy.ndarray`
+        """
+        _mask = np.ones(table.size, dtype=bool)
+        _reduced = dict()
+        for f, value in (factors or {}).items():
+            if skip and f in skip:
+                continue
+            if f in self._predicates:
+                _mask &= self._predicates[f](table, _reduced, value)
+                if not _mask.any():
+                    break
+            if f in self.acc_rules:
+                # resources without the factor stay untouched
+                _reduced[f] = _reduced.get(f, 0) + value
+        return _mask
+
+
+class RuleSetting(Setting):
+    """Setting that holds a compiled :class:`RuleSet`, set from a rule definition"""
+
+    def __init__(self, name, default=None, description=''):
+        super().__init__(name, [], description=description)
+        self.default = default if default is not None else RuleSet(DEFAULT_DEP_RULES, DEFAULT_ACC_RULES)
+
+    def parse(self, value):
+        """Compiles the given rule definition
+
+        :param value: rule definition, see :meth:`RuleSet.from_definition`
+        :type value: dict or :class:`RuleSet`
+        :raises ValueError: raised if the definition is malformed
+        :return: compiled rules
+        :rtype: :class:`RuleSet`
+        """
+        if isinstance(value, RuleSet):
+            return value
+        return RuleSet.from_definition(value)
+
+    def set_value(self, value):
+        if isinstance(value, SettingValue):
+            value = value.value
+        self.value = SettingValue(self.parse(value))
+
+    def get_default(self):
+        return SettingValue(self.default, description=self.description, default=True)
@@ -1,3 +1,7 @@
+import math
+import time
+from dataclasses import dataclass, field
+
 import click
 
 from continuum_deployer.resources.resource_entity import ResourceEntity
@@ -5,36 +9,96 @@ from ortools.sat.python import cp_model
 
 
 from continuum_deployer.solving.solver import Solver
+from continuum_deployer.solving.sat_model import PlacementModel, round_request, round_capacity
 from continuum_deployer.resources.deployment import DeploymentEntity
 from continuum_deployer.resources.resources import Resources, ResourceEntity
-from continuum_deployer.utils.config import Config, Setting, SettingValue
+from continuum_deployer.utils.config import Config, Setting, SettingValue, NumericSetting
+from continuum_deployer.utils import tracing
+
+@dataclass
+class SolutionEvent:
+    """Data Class that describes an improving solution found during the search."""
+
+    # lexicographic stage of the objective
+    stage: int = field(default=0)
+    # objective value of the solution
+    objective: float = field(default=None)
+    # best proven bound of the objective
+    bound: float = field(default=None)
+    # seconds since the start of the stage
+    wall_time: float = field(default=0)
+    # number of solutions found in the stage so far
+    solutions: int = field(default=0)
+
+    def gap(self):
+        return abs(self.objective - self.bound) / max(1, abs(self.objective))
+
 
 class CB(cp_model.CpSolverSolutionCallback):
-    def __init__(self, solver):
+    def __init__(self, solver, publisher=None, stage=0):
         cp_model.CpSolverSolutionCallback.__init__(self)
         self.solver = solver
+        # SAT solver that publishes the solutions to its subscribers
+        self.publisher = publisher
+        self.stage = stage
+        self.solutions = 0
 
     def on_solution_callback(self):
         # When this callback is called, the status is either FEASIBLE or OPTIMAL.
         # Since the status can apparently not be queried from self.solver, we
-        # assume (heuristically) FEASIBLE. If it is OPTIMAL, the code below would
-        # anyway output a status message and we parse OPTIMAL with higher priority
-        # in the log analysis.
-        print("status: LIKELY-FEASIBLE")
+        # assume (heuristically) FEASIBLE. The final status is traced after the search.
+        self.solutions += 1
+        if tracing.enabled(tracing.DEBUG):
+            tracing.trace(tracing.DEBUG, 'sat.solution', status='LIKELY-FEASIBLE', stage=self.stage,
+                          objective=self.ObjectiveValue(), bound=self.BestObjectiveBound(),
+                          wall_time=self.WallTime(), solutions=self.solutions)
+
+        if self.publisher is None:
+            return
+        self.publisher.publish(SolutionEvent(
+            stage=self.stage, objective=self.ObjectiveValue(), bound=self.BestObjectiveBound(),
+            wall_time=self.WallTime(), solutions=self.solutions))
+        if self.publisher.is_stop_requested():
+            self.StopSearch()
+
 
 class SAT(Solver):
 
     CPU_SCALE_FACTOR = 10e2
 
+    # CP-SAT searches with several threads itself and the stats, progress events,
+    # kept models and time budget live in this instance, label groups are solved one by one
+    PARALLEL_GROUPS = False
+
+    # keep the models between runs and update them for changed tasks
+    INCREMENTAL = True
+    # seconds a CP-SAT run gets to find a first solution once total_time_limit is used up
+    MIN_TIME_LIMIT = 0.1
+
     def __init__(self,
                  deployment_entities: DeploymentEntity,
                  resources: Resources):
         super().__init__(deployment_entities, resources)
+        # status, objective, bound and gap of each CP-SAT run
+        self.solve_stats = []
+        # deployment name to resource name of the last finished matching
+        self.previous_placement = dict()
+        # models of earlier runs by the names of their resources and the labels of their deployments
+        self.models = dict()
+        # keys of the models used since the last reset
+        self._used_models = set()
+        # callables that receive a SolutionEvent for each improving solution
+        self.subscribers = []
+        self._stop_requested = False
+        self._callback = None
+        # end of the total_time_limit, set by the first CP-SAT run of a matching
+        self._deadline = None
 
     @staticmethod
     def scale_cpu_values(entities, idle=False):
         """Helper function that scales cpu values to integers.
-        Necessary for the digestion trough the CP-SAT solver.
+        Necessary for the digestion trough the CP-SAT solver. Requests are
+        rounded up and idle capacities down.
 
         :param entities: list of entities with cpu values that should be scaled
         :type entities: list
@@ -47,9 +111,9 @@ class SAT(Solver):
         for entity in entities:
             if idle:
                 result.append(
-                    int(entity.get_idle_cpu()*SAT.CPU_SCALE_FACTOR))
+                    round_capacity(entity.get_idle_cpu()*SAT.CPU_SCALE_FACTOR))
             else:
-                result.append(int(entity.cpu*SAT.CPU_SCALE_FACTOR))
+                result.append(round_request(entity.cpu*SAT.CPU_SCALE_FACTOR))
         return result
 
     @staticmethod
@@ -59,25 +123,301 @@ class SAT(Solver):
             _result.append(deployment.name)
         return _result
 
-    def _gen_config(self):
-        return Config([
+    @staticmethod
+    def gen_objective_settings():
+        """Creates the target and objective_mode settings. Shared with solvers
+        that optimize the same objectives.
+
+        :return: list of settings
+        :rtype: list
+        """
+        return [
             Setting('target', [
                 SettingValue(
-                    'max_idle_cpu', description='SAT solver tries to maximize idle cpu resources', default=True),
+                    'max_idle_cpu', description='SAT solver tries to maximize idle cpu of used resources', default=True),
+                SettingValue(
+                    'max_idle_memory', description='SAT solver tries to maximize idle memory of used resources'),
                 SettingValue(
-                    'max_idle_memory', description='SAT solver tries to maximize idle memory resources'),
+                    'min_idle_cpu', description='SAT solver tries to minimize idle cpu of used resources'),
                 SettingValue(
-                    'min_idle_cpu', description='SAT solver tries to minimize idle cpu resources'),
+                    'min_idle_memory', description='SAT solver tries to minimize idle memory of used resources'),
                 SettingValue(
-                    'min_idle_memory', description='SAT solver tries to minimize idle memory resources'),
+                    'min_idle_resources', description='SAT solver tries to minimize idle resources (cpu+memory) of used resources'),
                 SettingValue(
-                    'min_idle_resources', description='SAT solver tries to minimize idle resources (cpu+memory)'),
+                    'max_idle_resources', description='SAT solver tries to maximize idle resources (cpu+memory) of used resources'),
+            ]),
+            Setting('objective_mode', [
                 SettingValue(
-                    'max_idle_resources', description='SAT solver tries to maximize idle resources (cpu+memory)'),
-            ])
+                    'lexicographic', description='Optimize cpu first, then memory with the cpu optimum fixed', default=True),
+                SettingValue(
+                    'weighted', description='Optimize the sum of cpu and memory, each normalized by its capacity'),
+            ]),
+        ]
+
+    @staticmethod
+    def score_placement(resources, target, mode, totals):
+        """Scores a placement with the objective of the given target and
+        objective mode, higher is better. Only used resources count.
+
+        :param resources: resources holding the placement
+        :type resources: list
+        :param target: value of the target setting
+        :type target: str
+        :param mode: value of the objective_mode setting
+        :type mode: str
+        :param totals: cpu and memory capacity to normalize weighted scores
+        :type totals: tuple
+        :return: score, compared lexicographically
+        :rtype: tuple
+        """
+        _used = [r for r in resources if r.get_deployments()]
+        _cpu = sum(r.get_idle_cpu() for r in _used)
+        _memory = sum(r.get_idle_memory() for r in _used)
+        _sign = 1 if target.startswith('max_') else -1
+        if target.endswith('_cpu'):
+            return (_sign * _cpu,)
+        if target.endswith('_memory'):
+            return (_sign * _memory,)
+        if mode == 'weighted':
+            return (_sign * (_cpu / totals[0] + _memory / totals[1]),)
+        return (_sign * _cpu, _sign * _memory)
+
+    def _gen_config(self):
+        return Config(SAT.gen_objective_settings() + [
+            Setting('warm_start', [
+                SettingValue(
+                    'greedy', description='Hint CP-SAT with a first-fit decreasing solution', default=True),
+                SettingValue(
+                    'previous', description='Hint CP-SAT with the previous matching, first-fit for new deployments'),
+                SettingValue(
+                    'none', description='Start CP-SAT without solution hint'),
+            ]),
+            Setting('label_mode', [
+                SettingValue(
+                    'grouped', description='Solve each label group on its own, unlabeled deployments last', default=True),
+                SettingValue(
+                    'global', description='Solve all deployments in a single model with label eligibility'),
+            ]),
+            NumericSetting('time_limit', 0.0, minimum=0,
+                           description='Wall-clock limit per CP-SAT run in seconds, 0 for no limit'),
+            NumericSetting('total_time_limit', 0.0, minimum=0,
+                           description='Wall-clock limit of all CP-SAT runs of a matching in seconds, 0 for no limit'),
+            NumericSetting('num_workers', 8, value_type=int, minimum=0,
+                           description='Number of parallel CP-SAT search workers, 0 for the CP-SAT default'),
+            NumericSetting('relative_gap', 0.0, minimum=0, maximum=1,
+                           description='Stop as soon as the relative gap to the best bound is reached, 0 for optimality'),
+            NumericSetting('random_seed', 0, value_type=int, minimum=0,
+                           description='Random seed of the CP-SAT search'),
         ])
 
-    def do_matching(self, deployment_entities, resources):
+    def _set_solver_parameters(self, solver):
+        """Applies the numeric solver settings to the CP-SAT parameters
+
+        :param solver: CP-SAT solver to configure
+        :type solver: :class:`ortools.sat.python.cp_model.CpSolver`
+        """
+        _limits = []
+        _time_limit = self.config.get_setting('time_limit').get_value().value
+        if _time_limit > 0:
+            _limits.append(_time_limit)
+        _remaining = self._remaining_time()
+        if _remaining is not None:
+            _limits.append(max(_remaining, self.MIN_TIME_LIMIT))
+        if _limits:
+            solver.parameters.max_time_in_seconds = min(_limits)
+        _num_workers = self.config.get_setting('num_workers').get_value().value
+        if _num_workers > 0:
+            solver.parameters.num_search_workers = _num_workers
+        solver.parameters.relative_gap_limit = self.config.get_setting(
+            'relative_gap').get_value().value
+        solver.parameters.random_seed = self.config.get_setting(
+            'random_seed').get_value().value
+        # Ctrl+C is handled by the caller, which stops the search with stop_search()
+        solver.parameters.catch_sigint_signal = False
+
+    def _remaining_time(self):
+        """Returns the seconds left of the total_time_limit of the current
+        matching. The clock starts with the first CP-SAT run.
+
+        :return: seconds left, None without total limit
+        :rtype: float
+        """
+        if self._deadline is None:
+            _total = self.config.get_setting('total_time_limit').get_value().value
+            if _total <= 0:
+                return None
+            self._deadline = time.time() + _total
+        return self._deadline - time.time()
+
+    def _get_objectives(self, placement):
+        """Creates the objectives selected by the target and objective_mode settings
+
+        :param placement: model of the current placement task
+        :type placement: :class:`continuum_deployer.solving.sat_model.PlacementModel`
+        :return: list of (terms, maximize) pairs, one per lexicographic stage,
+            terms is a list of (variable, coefficient) pairs
+        :rtype: list
+        """
+        _target = self.config.get_setting('target').get_value().value
+        _maximize = _target.startswith('max_')
+        _cpu = [(placement.idle_cpu, 1)]
+        _memory = [(placement.idle_ram, 1)]
+        if _target.endswith('_cpu'):
+            return [(_cpu, _maximize)]
+        if _target.endswith('_memory'):
+            return [(_memory, _maximize)]
+
+        _mode = self.config.get_setting('objective_mode').get_value().value
+        if _mode == 'weighted':
+            # normalize both dimensions by their overall capacity
+            _cpu_scale = max(1, sum(placement.resource_cpu))
+            _memory_scale = max(1, sum(placement.resource_memory))
+            _gcd = math.gcd(_cpu_scale, _memory_scale)
+            return [([(placement.idle_cpu, _memory_scale // _gcd),
+                      (placement.idle_ram, _cpu_scale // _gcd)], _maximize)]
+        return [(_cpu, _maximize), (_memory, _maximize)]
+
+    def _get_model(self, deployment_entities, resources, deployment_cpu, resource_cpu, selectors=None):
+        """Returns the model for the given task. A kept model of an earlier
+        run on the same resources is updated in place, otherwise a new model
+        is built.
+
+        :param deployment_entities: deployments to place
+        :type deployment_entities: list
+        :param resources: resources to place on
+        :type resources: list
+        :param deployment_cpu: scaled integer cpu request per deployment
+        :type deployment_cpu: list
+        :param resource_cpu: scaled integer idle cpu per resource
+        :type resource_cpu: list
+        :param selectors: bitset of the eligible resources per deployment
+        :type selectors: list, optional
+        :return: placement model
+        :rtype: :class:`continuum_deployer.solving.sat_model.PlacementModel`
+        """
+        if not self.INCREMENTAL:
+            return PlacementModel(deployment_entities, resources, deployment_cpu, resource_cpu, selectors)
+
+        _key = SAT._model_key(deployment_entities, resources, selectors)
+        self._used_models.add(_key)
+        _placement = self.models.get(_key)
+        if _placement is None:
+            _placement = PlacementModel(
+                deployment_entities, resources, deployment_cpu, resource_cpu, selectors)
+            self.models[_key] = _placement
+        else:
+            _placement.update(deployment_entities, resources, deployment_cpu,
+                              resource_cpu, selectors)
+        return _placement
+
+    @staticmethod
+    def _model_key(deployment_entities, resources, selectors=None):
+        """Creates the key of a kept model. Label groups on the same resources
+        get their own model, edits of requests and capacities keep the key.
+
+        :param deployment_entities: deployments to place
+        :type deployment_entities: list
+        :param resources: resources to place on
+        :type resources: list
+        :param selectors: bitset of the eligible resources per deployment
+        :type selectors: list, optional
+        :rtype: tuple
+        """
+        _labels = frozenset(tuple(sorted((d.labels or {}).items())) for d in deployment_entities)
+        return tuple(r.name for r in resources), _labels, selectors is not None
+
+    def clear_models(self):
+        """Drops the kept models, the next run builds them from scratch
+        """
+        self.models = dict()
+        self._used_models = set()
+
+    def _get_hint(self, placement, deployment_entities, resources):
+        """Computes the solution hint selected by the warm_start setting
+
+        :param placement: model of the current placement task
+        :type placement: :class:`continuum_deployer.solving.sat_model.PlacementModel`
+        :param deployment_entities: deployments of the current task
+        :type deployment_entities: list
+        :param resources: resources of the current task
+        :type resources: list
+        :return: class counts per (resource index, class index), None for no hint
+        :rtype: dict
+        """
+        _warm_start = self.config.get_setting('warm_start').get_value().value
+        if _warm_start == 'none':
+            return None
+        if placement.solution:
+            # re-solve of a kept model, start from its last solution
+            return placement.solution
+
+        _counts = dict()
+        if _warm_start == 'previous' and self.previous_placement:
+            _resource_ids = {r.name: i for i, r in enumerate(resources)}
+            _assignment = dict()
+            for j, deployment in enumerate(deployment_entities):
+                i = _resource_ids.get(self.previous_placement.get(deployment.name))
+                if i is not None:
+                    _assignment[j] = i
+            # deployments without previous placement are left to CP-SAT
+            _counts = placement.assignment_counts(_assignment)
+        if not _counts:
+            _counts = placement.first_fit_counts()
+        return _counts
+
+    @staticmethod
+    def _relative_gap(solver):
+        """Helper that calculates the relative gap between the objective
+        of the found solution and the best proven bound
+
+        :param solver: CP-SAT solver after a solve
+        :type solver: :class:`ortools.sat.python.cp_model.CpSolver`
+        :return: relative gap
+        :rtype: float
+        """
+        _objective = solver.ObjectiveValue()
+        _bound = solver.BestObjectiveBound()
+        return abs(_objective - _bound) / max(1, abs(_objective))
+
+    def match_labeled(self):
+        """Matches all deployments in a single model if the label_mode setting
+        is global, otherwise solves the label groups one by one.
+        """
+        if self.config.get_setting('label_mode').get_value().value != 'global':
+            super(SAT, self).match_labeled()
+            return
+
+        _errors = len(self.placement_errors)
+        _runs = len(self.solve_stats)
+        _index = self.get_label_index()
+        _selectors = dict()
+        for deployment in self.deployment_entities:
+            if deployment.labels is not None:
+                _token = _index.token(deployment.labels)
+                if _token not in _selectors:
+                    _selectors[_token] = _index.select(deployment.labels)
+        _deployments = []
+        _deployment_selectors = []
+        for deployment in self.deployment_entities:
+            _selector = _selectors[_index.token(deployment.labels)] \
+                if deployment.labels is not None else None
+            if _selector == 0:
+                # no suitable resources, would render the whole model infeasible
+                self.placement_errors.append(deployment)
+                continue
+            _deployments.append(deployment)
+            _deployment_selectors.append(_selector)
+        self.do_matching(_deployments, self.resources, _deployment_selectors)
+
+        if self.solve_stats[_runs:] and self.solve_stats[_runs]['status'] == 'INFEASIBLE':
+            # a single group over capacity renders the whole model infeasible,
+            # the groups are solved one by one instead to place what fits
+            click.echo(click.style(
+                '[Warning] Global model is infeasible, solving label groups one by one.', fg='yellow'))
+            del self.placement_errors[_errors:]
+            super(SAT, self).match_labeled()
+
+    def do_matching(self, deployment_entities, resources, selectors=None):
         """Actual solver implementation. Uses constraint programming to find an optimal solution
         for the deployment placing task.
 
@@ -85,78 +425,126 @@ class SAT(Solver):
         :type deployment_entities: list
         :param resources: list of :class:`continuum_deployer.resources.resource_entity.ResourceEntity` object to fill with deployments
         :type resources: list
+        :param selectors: bitset of the eligible resources per deployment, None for all resources
+        :type selectors: list, optional
         """
 
-        _model = cp_model.CpModel()
-
         _res_scaled_cpu = SAT.scale_cpu_values(resources, idle=True)
         _dep_scaled_cpu = SAT.scale_cpu_values(deployment_entities)
 
-        iter_resources = range(len(_res_scaled_cpu))
-        iter_deployment = range(len(_dep_scaled_cpu))
-
-        # Variables
-        x = []
-        for i in iter_resources:
-            t = []
-            for j in iter_deployment:
-                t.append(_model.NewBoolVar('x[%i,%i]' % (i, j)))
-            x.append(t)
-
-        # Constraints
-
-        # Each task is assigned to exactly one worker.
-        [_model.Add(sum(x[i][j] for i in iter_resources) == 1)
-         for j in iter_deployment]
-
-        # Each node is not overcommitted
-        for i in iter_resources:
-            _model.Add(sum(_dep_scaled_cpu[j] * x[i][j]
-                           for j in iter_deployment) <= _res_scaled_cpu[i])
-            _model.Add(sum(ent.memory * x[i][j]
-                           for j, ent in enumerate(deployment_entities)) <= resources[i].get_idle_memory())
-
-        # Objective: overall idle resources
-        idle_cpu = _model.NewIntVar(
-            0, sum(_res_scaled_cpu[i] for i in iter_resources), 'idle_cpu')
-        idle_ram = _model.NewIntVar(
-            0, sum(res.get_idle_memory() for i, res in enumerate(resources)), 'idle_ram')
-        _model.Add(idle_cpu == sum(_res_scaled_cpu[i] for i in iter_resources) - sum(
-            x[i][j] * _dep_scaled_cpu[j] for j in iter_deployment for i in iter_resources))
-        _model.Add(idle_ram == sum(res.get_idle_memory() for i, res in enumerate(resources)) - sum(
-            x[i][j] * dep.memory for j, dep in enumerate(deployment_entities) for i in iter_resources))
-
-        # read config and set optimization target
-        _target = self.config.get_setting('target').get_value().value
-        if _target == 'max_idle_cpu':
-            _model.Maximize(idle_cpu)
-        elif _target == 'max_idle_memory':
-            _model.Maximize(idle_ram)
-        elif _target == 'min_idle_cpu':
-            _model.Minimize(idle_cpu)
-        elif _target == 'min_idle_memory':
-            _model.Minimize(idle_ram)
-        elif _target == 'min_idle_resources':
-            _model.Minimize(idle_ram)
-            _model.Minimize(idle_cpu)
-        elif _target == 'max_idle_resources':
-            _model.Maximize(idle_ram)
-            _model.Maximize(idle_cpu)
-
-        solver = cp_model.CpSolver()
-        #status = solver.Solve(_model)
-        cb = CB(solver)
-        status = solver.SolveWithSolutionCallback(_model, cb)
-
-        if status == cp_model.OPTIMAL:
-            for i, res in enumerate(resources):
-                for j, dep in enumerate(deployment_entities):
-                    if solver.Value(x[i][j]) == 1:
-                        res.add_deployment(dep)
-        elif status == cp_model.INFEASIBLE:
-            self.placement_errors = deployment_entities
-
-        print(solver.ResponseStats())
+        # interchangeable deployments and resources are collapsed in the model
+        _placement = self._get_model(deployment_entities, resources,
+                                     _dep_scaled_cpu, _res_scaled_cpu, selectors)
+        _model = _placement.model
+
+        _objectives = self._get_objectives(_placement)
+        _placement.relax_stages()
+        _hint = self._get_hint(_placement, deployment_entities, resources)
+
+        # lexicographic stages, each keeps the optimum of the stages before
+        _counts = None
+        for stage, (terms, maximize) in enumerate(_objectives):
+            _remaining = self._remaining_time()
+            if _counts is not None and (self._stop_requested or (_remaining is not None and _remaining <= 0)):
+                # best solution was accepted or the time is up, skip the remaining stages
+                break
+            _placement.set_objective(terms, maximize)
+            if _hint is not None:
+                _placement.add_hint(_hint)
+            else:
+                _model.ClearHints()
+
+            solver = cp_model.CpSolver()
+            self._set_solver_parameters(solver)
+            cb = CB(solver, self, stage)
+            self._callback = cb
+            status = solver.Solve(_model, cb)
+            self._callback = None
+
+            _stats = {'stage': stage, 'status': solver.StatusName(status),
+                      'wall_time': solver.WallTime(), 'stopped': self._stop_requested}
+            self.solve_stats.append(_stats)
+            if tracing.enabled(tracing.INFO):
+                tracing.trace(tracing.INFO, 'sat.response', **_stats)
+            if tracing.enabled(tracing.DEBUG):
+                tracing.trace(tracing.DEBUG, 'sat.response_stats', response=solver.ResponseStats())
+            if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                # infeasible or no solution found within the limits
+                break
+
+            _stats.update(objective=solver.ObjectiveValue(), bound=solver.BestObjectiveBound(),
+                          gap=SAT._relative_gap(solver))
+            if status == cp_model.FEASIBLE:
+                # search stopped early, continue with best solution found so far
+                click.echo(click.style(
+                    '[Warning] Optimality not proven, using best found solution '
+                    '(relative gap {:.2%}).'.format(_stats['gap']), fg='yellow'))
+            _placement.save_solution(solver)
+            _counts = _hint = _placement.solution
+
+            _value = int(round(solver.ObjectiveValue()))
+            if maximize:
+                _placement.bound_stage(stage, terms, _value, cp_model.INT_MAX)
+            else:
+                _placement.bound_stage(stage, terms, cp_model.INT_MIN, _value)
+
+        if _counts is None:
+            self.placement_errors.extend(deployment_entities)
+            return
+        for i, dep in _placement.get_count_placements(_counts):
+            if not resources[i].add_deployment(dep):
+                self.placement_errors.append(dep)
+
+    def reset_matching(self):
+        super(SAT, self).reset_matching()
+        self.solve_stats = []
+        self._deadline = None
+        # only the models of the last run are updated by the next one
+        self.models = {key: self.models[key] for key in self._used_models if key in self.models}
+        self._used_models = set()
+
+    def get_solve_stats(self):
+        return self.solve_stats
+
+    def get_previous_placement(self):
+        return self.previous_placement
+
+    def subscribe(self, callback):
+        """Registers a callable that receives a
+        :class:`continuum_deployer.solving.sat.SolutionEvent` for each improving
+        solution. It is called from the CP-SAT search thread and should return quickly.
+
+        :param callback: callable with the event as only argument
+        :type callback: callable
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def publish(self, event):
+        for callback in list(self.subscribers):
+            callback(event)
+
+    def stop_search(self):
+        """Stops the running search and accepts the best solution found so far.
+        Can be called from any thread, a search without solution stops at its
+        first solution.
+        """
+        self._stop_requested = True
+        _callback = self._callback
+        # without a solution the callback stops the search once it finds one
+        if _callback is not None and _callback.solutions > 0:
+            _callback.StopSearch()
+
+    def is_stop_requested(self):
+        return self._stop_requested
 
     def match(self):
+        self._stop_requested = False
+        self._deadline = None
         super(SAT, self).match()
+        # keep the result by name, resources may be re-parsed until the next run
+        self.previous_placement = {
+            deployment.name: resource.name
+            for resource in self.resources for deployment in resource.get_deployments()}
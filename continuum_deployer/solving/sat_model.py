@@ -0,0 +1,482 @@
+import math
+from functools import reduce
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from continuum_deployer.resources.label_index import LabelIndex
+
+
+def _assign(field, values):
+    """Helper that replaces the values of a repeated proto field"""
+    try:
+        field.clear()
+    except AttributeError:
+        # protobuf message containers have no clear()
+        del field[:]
+    field.extend(values)
+
+
+def round_request(value):
+    """Rounds a request up to an integer, so a placement of the rounded requests
+    never exceeds the actual capacity. Float noise of scaled values is ignored.
+
+    :param value: request, e.g. memory or scaled cpu
+    :type value: float
+    :rtype: int
+    """
+    return int(math.ceil(round(value, 6)))
+
+
+def round_capacity(value):
+    """Rounds a capacity down to an integer, see :func:`round_request`
+
+    :param value: capacity, e.g. idle memory or scaled idle cpu
+    :type value: float
+    :rtype: int
+    """
+    return int(math.floor(round(value, 6)))
+
+
+def _weighted_sum(variables, coefficients):
+    """Helper that creates a linear expression, ScalProd is the name of
+    WeightedSum in older versions of OR-Tools"""
+    if hasattr(cp_model.LinearExpr, 'WeightedSum'):
+        return cp_model.LinearExpr.WeightedSum(variables, coefficients)
+    return cp_model.LinearExpr.ScalProd(variables, coefficients)
+
+
+class PlacementModel:
+    """CP-SAT model of a placement task in symmetry-collapsed form.
+
+    Deployments with equal requests are interchangeable, they are grouped into
+    workload classes and the model holds one integer variable per (resource,
+    workload class) pair that counts the placed deployments of the class.
+    Resources with equal idle capacity are interchangeable as well, their
+    symmetric solutions are cut off by ordering their cpu load. Optional
+    selectors restrict deployments to a subset of the resources, which allows
+    a single model over all label groups.
+
+    The model can be updated in place for a changed task on the same resources,
+    see :meth:`update`. Only bounds and coefficients are rewritten and the
+    last solution is kept as hint for the next solve.
+    """
+
+    def __init__(self, deployment_entities, resources, deployment_cpu, resource_cpu, selectors=None):
+        """
+        :param deployment_entities: deployments to place
+        :type deployment_entities: list
+        :param resources: resources to place on
+        :type resources: list
+        :param deployment_cpu: scaled integer cpu request per deployment
+        :type deployment_cpu: list
+        :param resource_cpu: scaled integer idle cpu per resource
+        :type resource_cpu: list
+        :param selectors: bitset of the eligible resources per deployment, None
+            entries or no selectors at all allow every resource
+        :type selectors: list, optional
+        """
+        self.model = cp_model.CpModel()
+        # count variables of the eligible (resource, class) pairs and their proto indices
+        self.count = dict()
+        self._count_index = dict()
+        self._count_bound = dict()
+
+        # workload classes, each a list of deployment indices with equal requests
+        self.classes = []
+        self.class_cpu = []
+        self.class_memory = []
+        self.class_selector = []
+        self._class_ids = dict()
+
+        # proto indices of the constraints that get rewritten on updates
+        self._demand = []
+        self._capacity_cpu = []
+        self._capacity_memory = []
+        self._symmetry = dict()
+        self._idle_cpu = None
+        self._idle_ram = None
+
+        # class counts of the last solution, see save_solution()
+        self.solution = dict()
+
+        for i in range(len(resources)):
+            self._capacity_cpu.append(self._new_linear())
+            self._capacity_memory.append(self._new_linear())
+
+        # Node usage: a resource is active if it holds at least one deployment
+        self.active = []
+        self._active_upper = []
+        self._active_lower = []
+        for i in range(len(resources)):
+            self.active.append(self.model.NewBoolVar('active[%i]' % i))
+            self._active_upper.append(self._new_linear())
+            self._active_lower.append(self._new_linear())
+
+        # Objective expressions: idle resources of the active resources
+        self.idle_cpu = self.model.NewIntVar(0, 0, 'idle_cpu')
+        self.idle_ram = self.model.NewIntVar(0, 0, 'idle_ram')
+        self._idle_cpu = self._new_linear()
+        self._idle_ram = self._new_linear()
+
+        # bounds that fix the optimum of earlier lexicographic stages
+        self._stages = []
+
+        self.update(deployment_entities, resources, deployment_cpu, resource_cpu, selectors)
+
+    def _new_linear(self):
+        """Appends an empty linear constraint to the model
+
+        :return: index of the constraint in the model proto
+        :rtype: int
+        """
+        _proto = self.model.Proto()
+        _proto.constraints.add()
+        return len(_proto.constraints) - 1
+
+    def _set_linear(self, index, variables, coefficients, lower, upper):
+        """Rewrites a linear constraint lower <= sum(coeff * var) <= upper
+
+        :param index: index of the constraint in the model proto
+        :type index: int
+        :param variables: proto indices of the variables
+        :type variables: list
+        :param coefficients: coefficient per variable
+        :type coefficients: list
+        :param lower: lower bound of the sum
+        :type lower: int
+        :param upper: upper bound of the sum
+        :type upper: int
+        """
+        _linear = self.model.Proto().constraints[index].linear
+        _assign(_linear.vars, variables)
+        _assign(_linear.coeffs, [int(coeff) for coeff in coefficients])
+        _assign(_linear.domain, [int(lower), int(upper)])
+
+    def _set_bounds(self, var, lower, upper):
+        _assign(self.model.Proto().variables[var.Index()].domain, [int(lower), int(upper)])
+
+    def _add_class(self, key):
+        k = len(self.classes)
+        self._class_ids[key] = k
+        self.classes.append([])
+        self.class_cpu.append(key[0])
+        self.class_memory.append(key[1])
+        self.class_selector.append(key[2])
+        self._demand.append(self._new_linear())
+        return k
+
+    def _upper_bounds(self):
+        """Computes how many deployments of each class fit on each resource
+
+        :return: matrix of upper bounds per (resource, class), zero or less for
+            pairs that can not be combined
+        :rtype: :class:`numpy.ndarray`
+        """
+        _unbounded = np.iinfo(np.int64).max
+        _sizes = np.array([len(members) for members in self.classes], dtype=np.int64)
+        _bounds = np.broadcast_to(_sizes, (len(self.resources), len(self.classes))).copy()
+        for capacity, demand in ((self.resource_cpu, self.class_cpu),
+                                 (self.resource_memory, self.class_memory)):
+            _capacity = np.array(capacity, dtype=np.int64)[:, None]
+            _demand = np.array(demand, dtype=np.int64)[None, :]
+            _bounds = np.minimum(_bounds, np.where(
+                _demand > 0, _capacity // np.maximum(_demand, 1), _unbounded))
+        return np.where(self._eligibility(), _bounds, 0)
+
+    def _eligibility(self):
+        """Computes which resources the selectors of the classes allow
+
+        :return: boolean matrix per (resource, class)
+        :rtype: :class:`numpy.ndarray`
+        """
+        _result = np.ones((len(self.resources), len(self.classes)), dtype=bool)
+        _masks = dict()
+        for k, selector in enumerate(self.class_selector):
+            if selector is None:
+                continue
+            if selector not in _masks:
+                _mask = np.zeros(len(self.resources), dtype=bool)
+                _mask[list(LabelIndex.iter_ids(selector))] = True
+                _masks[selector] = _mask
+            _result[:, k] = _masks[selector]
+        return _result
+
+    def update(self, deployment_entities, resources, deployment_cpu, resource_cpu, selectors=None):
+        """Adapts the model to a changed placement task on the same resources.
+        New workload classes get new variables, classes without deployments
+        are bounded to zero and all capacities and demands are rewritten.
+
+        :param deployment_entities: deployments to place
+        :type deployment_entities: list
+        :param resources: resources to place on, same number as the model was built for
+        :type resources: list
+        :param deployment_cpu: scaled integer cpu request per deployment
+        :type deployment_cpu: list
+        :param resource_cpu: scaled integer idle cpu per resource
+        :type resource_cpu: list
+        :param selectors: bitset of the eligible resources per deployment
+        :type selectors: list, optional
+        :raises ValueError: raised if the number of resources changed
+        """
+        if len(resources) != len(self._capacity_cpu):
+            raise ValueError('Number of resources differs from the model')
+
+        self.deployment_entities = deployment_entities
+        self.resources = resources
+        self.resource_cpu = resource_cpu
+        self.resource_memory = [round_capacity(r.get_idle_memory()) for r in resources]
+
+        for members in self.classes:
+            members.clear()
+        for j, deployment in enumerate(deployment_entities):
+            _selector = selectors[j] if selectors is not None else None
+            _key = (deployment_cpu[j], round_request(deployment.memory), _selector)
+            k = self._class_ids.get(_key)
+            if k is None:
+                k = self._add_class(_key)
+            self.classes[k].append(j)
+
+        # resource classes, each a list of resource indices with equal idle
+        # capacity, with selectors resources also need equal labels
+        _node_classes = dict()
+        for i, resource in enumerate(resources):
+            _labels = frozenset(resource.labels.items()) \
+                if selectors is not None and resource.labels else None
+            _node_classes.setdefault(
+                (self.resource_cpu[i], self.resource_memory[i], _labels), []).append(i)
+        self.node_classes = list(_node_classes.values())
+
+        self._build()
+
+    def _build(self):
+        iter_resources = range(len(self.resources))
+        iter_classes = range(len(self.classes))
+
+        # Variables: number of deployments of class k placed on resource i,
+        # only created for pairs where at least one deployment fits
+        _bounds = self._upper_bounds()
+        _rows, _columns = np.nonzero(_bounds > 0)
+        for i, k, bound in zip(_rows.tolist(), _columns.tolist(), _bounds[_rows, _columns].tolist()):
+            if (i, k) not in self.count:
+                self.count[i, k] = self.model.NewIntVar(0, bound, 'y[%i,%i]' % (i, k))
+                self._count_index[i, k] = self.count[i, k].Index()
+                self._count_bound[i, k] = bound
+        _node_vars = [[] for _ in iter_resources]
+        _class_vars = [[] for _ in iter_classes]
+        for (i, k), var in self.count.items():
+            _bound = max(0, int(_bounds[i, k]))
+            if self._count_bound[i, k] != _bound:
+                self._set_bounds(var, 0, _bound)
+                self._count_bound[i, k] = _bound
+            _node_vars[i].append(k)
+            _class_vars[k].append(i)
+
+        # common divisors of the requests keep the coefficients small
+        _cpu_gcd = reduce(math.gcd, [self.class_cpu[k] for k in iter_classes if self.classes[k]], 0) or 1
+        _memory_gcd = reduce(math.gcd, [self.class_memory[k] for k in iter_classes if self.classes[k]], 0) or 1
+        _cpu = [c // _cpu_gcd for c in self.class_cpu]
+        _memory = [m // _memory_gcd for m in self.class_memory]
+
+        # Constraints
+
+        # Each deployment of a class is placed exactly once
+        for k in iter_classes:
+            _size = len(self.classes[k])
+            self._set_linear(self._demand[k], [self._count_index[i, k] for i in _class_vars[k]],
+                             [1] * len(_class_vars[k]), _size, _size)
+
+        # Each node is not overcommitted
+        _node_index = []
+        for i in iter_resources:
+            _node_index.append([self._count_index[i, k] for k in _node_vars[i]])
+            self._set_linear(self._capacity_cpu[i], _node_index[i],
+                             [_cpu[k] for k in _node_vars[i]],
+                             cp_model.INT_MIN, self.resource_cpu[i] // _cpu_gcd)
+            self._set_linear(self._capacity_memory[i], _node_index[i],
+                             [_memory[k] for k in _node_vars[i]],
+                             cp_model.INT_MIN, self.resource_memory[i] // _memory_gcd)
+
+        # Symmetry breaking: identical nodes are ordered by their cpu load,
+        # orderings of nodes that are no longer identical are relaxed
+        _pairs = set()
+        for node_class in self.node_classes:
+            _pairs.update(zip(node_class, node_class[1:]))
+        for pair in self._symmetry.keys() - _pairs:
+            self._set_linear(self._symmetry[pair], [], [], cp_model.INT_MIN, cp_model.INT_MAX)
+        for a, b in _pairs:
+            if (a, b) not in self._symmetry:
+                self._symmetry[a, b] = self._new_linear()
+            self._set_linear(self._symmetry[a, b], _node_index[a] + _node_index[b],
+                             [_cpu[k] for k in _node_vars[a]] + [-_cpu[k] for k in _node_vars[b]],
+                             0, cp_model.INT_MAX)
+
+        # Node usage
+        _total = len(self.deployment_entities)
+        for i in iter_resources:
+            _variables = _node_index[i] + [self.active[i].Index()]
+            _ones = [1] * len(_node_index[i])
+            self._set_linear(self._active_upper[i], _variables,
+                             _ones + [-_total], cp_model.INT_MIN, 0)
+            self._set_linear(self._active_lower[i], _variables,
+                             _ones + [-1], 0, cp_model.INT_MAX)
+
+        # Objective expressions: idle resources of the active resources. The
+        # overall idle resources are constant as all deployments are placed.
+        _placed_cpu = sum(self.class_cpu[k] * len(self.classes[k]) for k in iter_classes)
+        _placed_memory = sum(self.class_memory[k] * len(self.classes[k]) for k in iter_classes)
+        _active = [var.Index() for var in self.active]
+        self._set_bounds(self.idle_cpu, 0, max(0, sum(self.resource_cpu)))
+        self._set_bounds(self.idle_ram, 0, max(0, sum(self.resource_memory)))
+        self._set_linear(self._idle_cpu, _active + [self.idle_cpu.Index()],
+                         list(self.resource_cpu) + [-1], _placed_cpu, _placed_cpu)
+        self._set_linear(self._idle_ram, _active + [self.idle_ram.Index()],
+                         list(self.resource_memory) + [-1], _placed_memory, _placed_memory)
+
+        self.relax_stages()
+
+    def set_objective(self, terms, maximize):
+        """Sets the objective sum(coeff * var), replaces an earlier objective
+
+        :param terms: list of (variable, coefficient) pairs
+        :type terms: list
+        :param maximize: flag to maximize instead of minimize the objective
+        :type maximize: bool
+        """
+        _objective = _weighted_sum([var for var, _ in terms], [coeff for _, coeff in terms])
+        if maximize:
+            self.model.Maximize(_objective)
+        else:
+            self.model.Minimize(_objective)
+
+    def bound_stage(self, stage, terms, lower, upper):
+        """Bounds the objective of a lexicographic stage for the following stages
+
+        :param stage: number of the stage, starting at 0
+        :type stage: int
+        :param terms: objective of the stage as list of (variable, coefficient) pairs
+        :type terms: list
+        :param lower: lower bound of the objective
+        :type lower: int
+        :param upper: upper bound of the objective
+        :type upper: int
+        """
+        while len(self._stages) <= stage:
+            self._stages.append(self._new_linear())
+        self._set_linear(self._stages[stage], [var.Index() for var, _ in terms],
+                         [coeff for _, coeff in terms], lower, upper)
+
+    def relax_stages(self):
+        """Removes the bounds of all lexicographic stages
+        """
+        for index in self._stages:
+            self._set_linear(index, [], [], cp_model.INT_MIN, cp_model.INT_MAX)
+
+    def first_fit_counts(self):
+        """Runs a vectorized first-fit decreasing pass on the class level. The
+        classes are filled in order of decreasing size, each class fills the
+        resources in list order as far as their remaining capacity allows.
+
+        :return: class counts per (resource index, class index), deployments
+            that do not fit anywhere are left out
+        :rtype: dict
+        """
+        _idle_cpu = np.array(self.resource_cpu, dtype=np.int64)
+        _idle_memory = np.array(self.resource_memory, dtype=np.int64)
+        _unbounded = np.iinfo(np.int64).max
+        _eligible = self._eligibility()
+
+        _counts = dict()
+        _order = sorted(range(len(self.classes)),
+                        key=lambda k: (self.class_cpu[k], self.class_memory[k]), reverse=True)
+        for k in _order:
+            _fits = np.full(len(self.resources), _unbounded, dtype=np.int64)
+            if self.class_cpu[k] > 0:
+                _fits = np.minimum(_fits, np.maximum(_idle_cpu, 0) // self.class_cpu[k])
+            if self.class_memory[k] > 0:
+                _fits = np.minimum(_fits, np.maximum(_idle_memory, 0) // self.class_memory[k])
+            _fits = np.where(_eligible[:, k], np.minimum(_fits, len(self.classes[k])), 0)
+
+            # take from each resource until the class is exhausted
+            _before = np.concatenate(([0], np.cumsum(_fits)[:-1]))
+            _take = np.clip(len(self.classes[k]) - _before, 0, _fits)
+
+            _idle_cpu -= _take * self.class_cpu[k]
+            _idle_memory -= _take * self.class_memory[k]
+            for i in np.flatnonzero(_take):
+                _counts[int(i), k] = int(_take[i])
+        return _counts
+
+    def assignment_counts(self, assignment):
+        """Converts a placement of single deployments to class counts
+
+        :param assignment: resource index per deployment index, deployments
+            without an entry are left out
+        :type assignment: dict
+        :return: class counts per (resource index, class index)
+        :rtype: dict
+        """
+        _counts = dict()
+        for k, members in enumerate(self.classes):
+            for j in members:
+                i = assignment.get(j)
+                if i is not None:
+                    _counts[i, k] = _counts.get((i, k), 0) + 1
+        return _counts
+
+    def add_hint(self, counts):
+        """Passes a (partial) solution as hint to the model. CP-SAT starts its
+        search from the hint and repairs it if it is infeasible. Hints of
+        earlier solves are replaced.
+
+        :param counts: class counts per (resource index, class index), missing
+            pairs are hinted as zero
+        :type counts: dict
+        """
+        self.model.ClearHints()
+        _active = set()
+        for (i, k), var in self.count.items():
+            _value = counts.get((i, k), 0)
+            self.model.AddHint(var, _value)
+            if _value > 0:
+                _active.add(i)
+        for i, var in enumerate(self.active):
+            self.model.AddHint(var, i in _active)
+
+    def save_solution(self, solver):
+        """Keeps the class counts of a solution to hint the next solve
+
+        :param solver: CP-SAT solver holding a solution of the model
+        :type solver: :class:`ortools.sat.python.cp_model.CpSolver`
+        """
+        self.solution = {key: solver.Value(var) for key, var in self.count.items()
+                         if solver.Value(var) > 0}
+
+    def get_placements(self, solver):
+        """Expands the class counts of a solution to concrete placements
+
+        :param solver: CP-SAT solver holding a solution of the model
+        :type solver: :class:`ortools.sat.python.cp_model.CpSolver`
+        :return: list of (resource index, deployment entity) pairs
+        :rtype: list
+        """
+        return self.get_count_placements(
+            {key: solver.Value(var) for key, var in self.count.items()})
+
+    def get_count_placements(self, counts):
+        """Expands class counts to concrete placements
+
+        :param counts: class counts per (resource index, class index)
+        :type counts: dict
+        :return: list of (resource index, deployment entity) pairs
+        :rtype: list
+        """
+        _placements = []
+        _next = [0] * len(self.classes)
+        for i in range(len(self.resources)):
+            for k, members in enumerate(self.classes):
+                _value = counts.get((i, k), 0)
+                for j in members[_next[k]:_next[k] + _value]:
+                    _placements.append((i, self.deployment_entities[j]))
+                _next[k] += _value
+        return _placements
@@ -3,24 +3,41 @@ import sys
 
 from yapsy.IPlugin import IPlugin
 
-from continuum_deployer.resources.deployment import DeploymentEntity
+from continuum_deployer.resources.deployment import DeploymentEntity, expand_replicas
 from continuum_deployer.resources.resources import Resources, ResourceEntity
+from continuum_deployer.resources.cluster_state import ClusterState
+from continuum_deployer.resources.label_index import LabelIndex
 from continuum_deployer.utils.config import Config, Setting, SettingValue
-from continuum_deployer.utils.exceptions import SolverError
+from continuum_deployer.utils.exceptions import SolverError, PreflightError
+from continuum_deployer.solving import parallel
+from continuum_deployer.solving.preflight import Preflight
 
 
 class Solver(IPlugin):
 
     UNLABELED_TOKEN = 'unlabeled'
+    # run capacity and lower bound checks before solving
+    PREFLIGHT_CHECKS = True
+    # stop the matching if the checks fail, otherwise warn and place what fits
+    PREFLIGHT_STRICT = True
+    # solve label groups with disjoint suitable resources in a process pool
+    PARALLEL_GROUPS = True
+    # minimum number of labeled deployments before a process pool is used
+    PARALLEL_MIN_DEPLOYMENTS = 256
+    # maximum number of worker processes, None uses the number of cores
+    PARALLEL_MAX_WORKERS = None
 
     def __init__(self,
                  deployment_entities: DeploymentEntity,
                  resources: Resources):
-        self.deployment_entities = deployment_entities
+        # deployments with multiple replicas can be passed in compact form
+        self.deployment_entities = expand_replicas(deployment_entities)
         self.resources = resources
         self.grouped_deployments = None
         self.grouped_resources = None
         self.placement_errors = []
+        # inverted label index over self.resources, built on first use
+        self.label_index = None
 
         self.config = self._gen_config()
 
@@ -59,23 +76,15 @@ class Solver(IPlugin):
         :raises SolverError: raised if largest deployment exceeds available resources
         """
 
+        _state = ClusterState(resources, entities, labels=False)
+
         # find max of resource requests on deployment entities
-        _max_memory_request = 0
-        _max_cpu_request = 0
-        for entity in entities:
-            if entity.memory > _max_memory_request:
-                _max_memory_request = entity.memory
-            if entity.cpu > _max_cpu_request:
-                _max_cpu_request = entity.cpu
+        _max_memory_request = _state.memory_request.max(initial=0)
+        _max_cpu_request = _state.cpu_request.max(initial=0)
 
         # find max of available resources on deployment targets
-        _max_memory_offer = 0
-        _max_cpu_offer = 0
-        for resource in resources:
-            if resource.memory > _max_memory_offer:
-                _max_memory_offer = resource.memory
-            if resource.cpu > _max_cpu_offer:
-                _max_cpu_offer = resource.cpu
+        _max_memory_offer = _state.memory_capacity.max(initial=0)
+        _max_cpu_offer = _state.cpu_capacity.max(initial=0)
 
         # check if max memory entity fits available resources
         if _max_memory_offer < _max_memory_request:
@@ -93,6 +102,25 @@ class Solver(IPlugin):
             )
             raise SolverError(message=_error_msg)
 
+    def check_feasibility(self, entities, resources):
+        """Runs the preflight checks on aggregated capacity, bin-packing lower bounds
+        and label groups without suitable resources.
+
+        :param entities: list of deployment entities
+        :type entities: list
+        :param resources: list of resource entities
+        :type resources: list
+        :raises PreflightError: raised if the checks prove the matching infeasible,
+            the attached report lists the failed checks
+        :return: report of the preflight checks
+        :rtype: :class:`continuum_deployer.solving.preflight.PreflightReport`
+        """
+        _label_index = self.get_label_index() if resources is self.resources else None
+        _report = Preflight(entities, resources, _label_index).run()
+        if not _report.is_feasible():
+            raise PreflightError(message=_report.summary(), report=_report)
+        return _report
+
     @staticmethod
     def _tokenize_labels(labels: dict):
         """Helper function that hashes a dict of labels
@@ -121,6 +149,25 @@ class Solver(IPlugin):
             data[token] = []
         return data
 
+    def get_label_index(self):
+        """Getter for the label index of the current resources, builds it if necessary
+
+        :return: label index over the current resources
+        :rtype: :class:`continuum_deployer.resources.label_index.LabelIndex`
+        """
+        if self.label_index is None:
+            self.label_index = LabelIndex.from_resources(self.resources)
+        return self.label_index
+
+    def set_label_index(self, label_index):
+        """Setter for an already built label index, e.g. the one maintained by
+        :class:`continuum_deployer.resources.resources.Resources`
+
+        :param label_index: label index over the current resources
+        :type label_index: :class:`continuum_deployer.resources.label_index.LabelIndex`
+        """
+        self.label_index = label_index
+
     def _get_suitable_resources(self, resources, labels):
         """Helper function that returns resources that have all of the given resources
 
@@ -131,12 +178,12 @@ class Solver(IPlugin):
         :return: list of resources that have all given labels assigned to them
         :rtype: list
         """
-        _suitable_resources = []
-        for resource in resources:
-            if resource.labels is not None:
-                if labels.items() <= resource.labels.items():
-                    _suitable_resources.append(resource)
-        return _suitable_resources
+        if resources is self.resources:
+            _index = self.get_label_index()
+        else:
+            _index = LabelIndex.from_resources(resources)
+
+        return [resources[i] for i in LabelIndex.iter_ids(_index.select(labels))]
 
     def group(self, entities):
         """Helper function that creates a dict datastructure containing
@@ -144,10 +191,11 @@ class Solver(IPlugin):
 
         :param entities: list of items to group
         :type entities: list
-        :return: grouped dict datastructure, keys are based on label hashes
+        :return: grouped dict datastructure, keys are based on label tokens
         :rtype: dict
         """
         _grouping = dict()
+        _index = self.get_label_index()
 
         for entity in entities:
             if entity.labels is None:
@@ -157,7 +205,7 @@ class Solver(IPlugin):
                 _grouping[self.UNLABELED_TOKEN].append(entity)
             else:
                 # entity is labeled
-                _token = Solver._tokenize_labels(entity.labels)
+                _token = _index.token(entity.labels)
                 _grouping = Solver._token_exists_or_create(_grouping, _token)
                 _grouping[_token].append(entity)
         return _grouping
@@ -167,11 +215,30 @@ class Solver(IPlugin):
         """
         raise NotImplementedError
 
+    def preflight(self):
+        """Runs the preflight checks on all deployments if enabled. Infeasible
+        matchings only stop the matching in strict mode, otherwise a warning is
+        shown and the deployments that do not fit become placement errors.
+
+        :raises PreflightError: raised in strict mode if the checks prove the matching infeasible
+        """
+        if not self.PREFLIGHT_CHECKS:
+            return
+        try:
+            self.check_feasibility(self.deployment_entities, self.resources)
+        except PreflightError as e:
+            if self.PREFLIGHT_STRICT:
+                raise
+            click.echo(click.style(
+                '[Warning] Matching is infeasible, deployments that do not fit are not placed:\n{}'.format(
+                    '\n'.join(' - {}'.format(issue) for issue in e.report.issues)), fg='yellow'))
+
     def match(self):
         """Main matcher method that invokes some preflight checks
         and starts the label based grouped matching
         """
         self.check_upper_bound(self.deployment_entities, self.resources)
+        self.preflight()
         self.match_labeled()
 
     def match_labeled(self):
@@ -187,20 +254,100 @@ class Solver(IPlugin):
             _unlabeled_deployments = self.grouped_deployments.pop(
                 self.UNLABELED_TOKEN)
 
+        _index = self.get_label_index()
+        _groups = []
         for token in sorted(self.grouped_deployments.keys()):
             # get group labels in dict form, first can be taken as they are equal throwout a group
             _group_labels = self.grouped_deployments[token][0].labels
+            _groups.append((self.grouped_deployments[token],
+                            _index.select(_group_labels)))
 
-            _suitable_resources = self._get_suitable_resources(
-                self.resources, _group_labels)
+        _components = Solver._independent_components(_groups)
 
-            self.do_matching(
-                self.grouped_deployments[token], _suitable_resources)
+        _labeled_count = sum(len(deployments) for deployments, _ in _groups)
+        if (self.PARALLEL_GROUPS and len(_components) > 1
+                and _labeled_count >= self.PARALLEL_MIN_DEPLOYMENTS):
+            self._match_components_parallel(_components)
+        else:
+            for deployments, suitable in _groups:
+                self.do_matching(
+                    deployments, [self.resources[i] for i in LabelIndex.iter_ids(suitable)])
 
         # match unlabeled deployments
         self.do_matching(
             _unlabeled_deployments, self.resources)
 
+    @staticmethod
+    def _independent_components(groups):
+        """Helper function that partitions label groups into components whose
+        suitable resources do not overlap with any other component.
+
+        :param groups: list of (deployments, bitset of suitable resources) pairs
+        :type groups: list
+        :return: list of components, each a list of groups in the given order
+        :rtype: list
+        """
+        # each component is a pair of its joined resource bitset and its groups
+        _components = []
+        for group in groups:
+            _bitset = group[1]
+            _members = [group]
+            _remaining = []
+            for component in _components:
+                if component[0] & _bitset:
+                    _bitset |= component[0]
+                    _members = component[1] + _members
+                else:
+                    _remaining.append(component)
+            _remaining.append((_bitset, _members))
+            _components = _remaining
+
+        # restore group order inside and across the components
+        _order = {id(group): i for i, group in enumerate(groups)}
+        _result = [sorted(members, key=lambda g: _order[id(g)])
+                   for _, members in _components]
+        return sorted(_result, key=lambda members: _order[id(members[0])])
+
+    def _match_components_parallel(self, components):
+        """Solves independent components of label groups in a process pool.
+        Placements are applied in component order afterwards, falls back to
+        serial solving if the solver can not be run in worker processes.
+
+        :param components: list of components as returned by _independent_components()
+        :type components: list
+        """
+        _tasks = []
+        for component in components:
+            _bitset = 0
+            for _, suitable in component:
+                _bitset |= suitable
+            _resource_ids = list(LabelIndex.iter_ids(_bitset))
+            _local_ids = {i: k for k, i in enumerate(_resource_ids)}
+            _jobs = [(parallel.detach_deployments(deployments),
+                      [_local_ids[i] for i in LabelIndex.iter_ids(suitable)])
+                     for deployments, suitable in component]
+            _resources = parallel.detach_resources(
+                [self.resources[i] for i in _resource_ids])
+            _tasks.append((_resource_ids, _jobs, _resources))
+
+        try:
+            with parallel.create_pool(self.PARALLEL_MAX_WORKERS) as pool:
+                _futures = [pool.submit(parallel.solve_detached, type(self), self.config, jobs, resources)
+                            for _, jobs, resources in _tasks]
+                _results = [future.result() for future in _futures]
+        except parallel.POOL_ERRORS:
+            for component in components:
+                for deployments, suitable in component:
+                    self.do_matching(
+                        deployments, [self.resources[i] for i in LabelIndex.iter_ids(suitable)])
+            return
+
+        for component, (resource_ids, _, _), result in zip(components, _tasks, _results):
+            _resources = [self.resources[i] for i in resource_ids]
+            for (deployments, _), (placements, errors) in zip(component, result):
+                self.placement_errors.extend(parallel.apply_placements(
+                    _resources, deployments, placements, errors))
+
     def reset_matching(self):
         """Resets current matching state of solver
         """
@@ -219,8 +366,9 @@ class Solver(IPlugin):
     def get_resources(self):
         return self.resources
 
-    def set_resources(self, resources):
+    def set_resources(self, resources, label_index=None):
         self.resources = resources
+        self.label_index = label_index
 
     def get_placement_errors(self):
         return self.placement_errors
@@ -229,4 +377,4 @@ class Solver(IPlugin):
         return self.deployment_entities
 
     def set_deployment_entities(self, deployments):
-        self.deployment_entities = deployments
+        self.deployment_entities = expand_replicas(deployments)
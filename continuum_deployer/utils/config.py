@@ -1,3 +1,8 @@
+import yaml
+
+from continuum_deployer.utils.file_handling import FileHandling
+
+
 class SettingValue:
 
     def __init__(self, value, description='', default=False):
@@ -32,6 +37,41 @@ class Setting:
                 return option
 
 
+class NumericSetting(Setting):
+    """Setting that holds a free numeric value instead of a choice of options"""
+
+    def __init__(self, name, default, value_type=float, minimum=None, maximum=None, description=''):
+        super().__init__(name, [], description=description)
+        self.default = default
+        self.value_type = value_type
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def parse(self, value):
+        """Converts and validates the given value
+
+        :param value: value to parse, e.g. user input
+        :type value: str or int or float
+        :raises ValueError: raised if value is not a number of the setting type or out of range
+        :return: parsed value
+        :rtype: int or float
+        """
+        _value = self.value_type(value)
+        if self.minimum is not None and _value < self.minimum:
+            raise ValueError('{} must be at least {}'.format(self.name, self.minimum))
+        if self.maximum is not None and _value > self.maximum:
+            raise ValueError('{} must be at most {}'.format(self.name, self.maximum))
+        return _value
+
+    def set_value(self, value):
+        if isinstance(value, SettingValue):
+            value = value.value
+        self.value = SettingValue(self.parse(value))
+
+    def get_default(self):
+        return SettingValue(self.default, description=self.description, default=True)
+
+
 class Config:
 
     def __init__(self, settings):
@@ -55,3 +95,31 @@ class Config:
 
     def get_setting(self, name):
         return self.settings.get(name)
+
+    def load_yaml(self, stream):
+        """Sets the values of the settings from a YAML mapping of setting
+        names to values. Settings with options take the option of the given
+        value, other settings parse the value themselves.
+
+        :param stream: YAML document
+        :type stream: str or file
+        :raises ValueError: raised if a setting is unknown or a value is invalid
+        :return: names of the settings that were set
+        :rtype: list
+        """
+        _values = yaml.load(stream, Loader=FileHandling.YAML_LOADER) or dict()
+        if not isinstance(_values, dict):
+            raise ValueError('solver config must be a mapping of setting names to values')
+        for name, value in _values.items():
+            _setting = self.get_setting(name)
+            if _setting is None:
+                raise ValueError('unknown setting {}'.format(name))
+            _options = _setting.get_options()
+            if not _options:
+                _setting.set_value(value)
+                continue
+            _option = next((option for option in _options if option.value == value), None)
+            if _option is None:
+                raise ValueError('{} is no option of {}'.format(value, name))
+            _setting.set_value(_option)
+        return list(_values.keys())
@@ -32,3 +32,13 @@ class SolverError(Exception):
 
     def __init__(self, message=""):
         self.message = message
+
+
+class PreflightError(SolverError):
+    """PreflightError is thrown if the preflight checks prove that the
+    matchmaking problem is infeasible before the actual solving starts.
+    """
+
+    def __init__(self, message="", report=None):
+        self.message = message
+        self.report = report
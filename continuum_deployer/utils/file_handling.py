@@ -1,5 +1,18 @@
+import yaml
+
+try:
+    # libyaml based loader, falls back to the pure Python loader if
+    # PyYAML was built without libyaml
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+
 class FileHandling:
 
+    # safe YAML loader used to read definitions
+    YAML_LOADER = _SafeLoader
+
     @staticmethod
     def get_file_content(path):
         """Helper function that returns the str content of
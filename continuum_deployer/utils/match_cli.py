@@ -2,6 +2,7 @@
 
 import sys
 import time
+import threading
 from io import StringIO
 
 from transitions import Machine
@@ -16,12 +17,15 @@ import click
 import continuum_deployer
 from continuum_deployer import plugins
 from continuum_deployer.utils.ui import UI
+from continuum_deployer.utils.config import NumericSetting
 from continuum_deployer.utils.exceptions import RequirementsError, FileTypeNotSupported, ImporterError, SolverError
 from continuum_deployer.dsl.importer.importer import Importer
 from continuum_deployer.dsl.importer.helm import Helm
 from continuum_deployer.resources.resources import Resources
 from continuum_deployer.solving.greedy import Greedy
 from continuum_deployer.solving.sat import SAT
+from continuum_deployer.solving.lns import LNS
+from continuum_deployer.solving.portfolio import Portfolio
 from continuum_deployer.solving.rbmm import Rbmm
 from continuum_deployer.dsl.exporter.exporter import Exporter
 from continuum_deployer.dsl.exporter.kubernetes import Kubernetes
@@ -45,6 +49,10 @@ class Settings:
     # solver options
     solver_type: int = field(default=None)
     solver: object = field(default=None)
+    # path to a YAML file with solver setting values
+    solver_config_path: str = field(default=None)
+    # stop if the preflight checks fail, otherwise place the deployments that fit
+    preflight_strict: bool = field(default=True)
     # exporter options
     exporter_type: int = field(default=None)
     exporter: object = field(default=None)
@@ -70,6 +78,24 @@ class ListValidator(Validator):
         return _result
 
 
+class NumericValidator(Validator):
+
+    def __init__(self, setting: NumericSetting):
+        self.setting = setting
+
+    def validate(self, document):
+        text = document.text
+
+        # empty input keeps the current value
+        if text == '':
+            return
+        try:
+            self.setting.parse(text)
+        except ValueError as e:
+            raise ValidationError(
+                message='Input {} not supported: {}'.format(text, e))
+
+
 class MatchCli:
 
     STATES = [
@@ -93,11 +119,14 @@ class MatchCli:
     _TEXT_ASKSAVERESULTS = 'Do you want to save the results to a file?'
     _TEXT_ERRORPLACEMENTS = 'The following workloads could not be scheduled'
     _TEXT_ASKEXPORTERTYPE = 'Enter Exporter type: '
+    _TEXT_STOPSEARCH = 'Press Ctrl+C to accept the best solution found so far and stop the search.'
+    _TEXT_SEARCHSTOPPED = 'Search stopped, using the best solution found so far.'
 
     INTERACTIVE_TIMEOUT = 1.5
     CLICK_PROMPT_FG_COLOR = 'bright_blue'
 
-    def __init__(self, resources_path, dsl_path, dsl_type, helmtype, solver, solvermode):
+    def __init__(self, resources_path, dsl_path, dsl_type, helmtype, solver, solvermode, solver_config_path=None,
+                 preflight_strict=True):
 
         self.resources = None
 
@@ -108,6 +137,8 @@ class MatchCli:
         self.settings.helmtype = helmtype
         self.settings.solver = solver
         self.settings.solvermode = solvermode
+        self.settings.solver_config_path = solver_config_path
+        self.settings.preflight_strict = preflight_strict
 
         # initialize the state machine
         self.machine = Machine(
@@ -177,9 +208,13 @@ class MatchCli:
             self.ask_resources()
 
     def _parse_resources(self):
-        _resources = Resources()
-        _resources.parse(self.settings.resources_content)
-        self.settings.resources = _resources.get_resources()
+        if self.resources is None:
+            self.resources = Resources()
+            self.resources.parse(self.settings.resources_content)
+        else:
+            # re-parse in place, keeps the label index updated incrementally
+            self.resources.update(self.settings.resources_content)
+        self.settings.resources = self.resources.get_resources()
 
     def _read_dsl(self):
         try:
@@ -205,12 +240,29 @@ class MatchCli:
 
     def _parse_dsl(self):
         self.settings.dsl_importer.parse(self.settings.dsl_content)
-        self.settings.deployment_entities = self.settings.dsl_importer.get_app_modules()
+        # solvers expand the replicas of the workloads themselves
+        self.settings.deployment_entities = self.settings.dsl_importer.get_workloads()
+
+    def _ask_setting_options(self, config, skip=()):
+        """Asks for the values of the settings of a config
 
-    def _ask_setting_options(self, config):
+        :param config: config to set the values of
+        :type config: :class:`continuum_deployer.utils.config.Config`
+        :param skip: names of settings that are already set, e.g. from a solver config file
+        :type skip: set, optional
+        """
 
         _config = config
         for setting in _config.get_settings():
+            if setting.name in skip:
+                continue
+            if isinstance(setting, NumericSetting):
+                self._ask_numeric_setting(setting)
+                continue
+            if not setting.get_options():
+                # settings without options are only set from a solver config file
+                continue
+
             click.echo('Configure {}:\n'.format(setting.name))
             _options = setting.get_options()
             for key, option in enumerate(_options):
@@ -229,6 +281,15 @@ class MatchCli:
 
             setting.set_value(_options[int(_option_choice)])
 
+    def _ask_numeric_setting(self, setting):
+        click.echo('Configure {} - {}:\n'.format(
+            setting.name, setting.description))
+        _value = prompt(ANSI(click.style('\nWhich value do you choose [{}]: '.format(
+            setting.get_value().value), fg=self.CLICK_PROMPT_FG_COLOR)),
+            validator=NumericValidator(setting))
+        if _value != '':
+            setting.set_value(_value)
+
     @staticmethod
     def _options_array_to_number_choices(options):
         _options_length = len(options)
@@ -328,9 +389,11 @@ class MatchCli:
 <b>Choose a solver for the workload placement:</b>
 \t [0] <b>Greedy Solver</b> (sorts workloads and fills targets in a greedy fashion)
 \t [1] <b>SAT Solver</b> (offers various options for mathematical optimal placements)
-\t [2] <b>RBMM Solver</b> (offers rule-based matchmaker called RBMM that combines several decision factors and applies rules to them) '''
+\t [2] <b>RBMM Solver</b> (offers rule-based matchmaker called RBMM that combines several decision factors and applies rules to them)
+\t [3] <b>LNS Solver</b> (improves a greedy placement with small SAT subproblems, for large clusters)
+\t [4] <b>Portfolio Solver</b> (races all solvers in parallel and uses the best placement found until the deadline) '''
 
-        _solvers = [Greedy, SAT, Rbmm]
+        _solvers = [Greedy, SAT, Rbmm, LNS, Portfolio]
 
         for plugin in plugins.plugin_manager.getPluginsOfCategory("Solver"):
             _solvers.append(plugin.plugin_object)
@@ -356,17 +419,31 @@ class MatchCli:
 
         self.settings.solver = _solver(
             self.settings.deployment_entities, self.settings.resources)
+        self.settings.solver.set_label_index(self.resources.get_label_index())
+        self.settings.solver.PREFLIGHT_STRICT = self.settings.preflight_strict
 
         self.configure_solver()
 
     def on_enter_config_solver(self):
         _config = self.settings.solver.get_config()
+        _loaded = set()
+        if self.settings.solver_config_path:
+            try:
+                _loaded = set(_config.load_yaml(
+                    self._get_file_content(self.settings.solver_config_path)))
+            except ValueError as e:
+                click.echo(click.style('[Error] Invalid solver config: {}'.format(e), fg='red'), err=True)
+                quit()
+
         unset = False
         for setting in _config.get_settings():
+            if setting.name in _loaded:
+                continue
             if setting.name == "target" and self.settings.solvermode:
                 _options = setting.get_options()
                 setting.set_value(_options[int(self.settings.solvermode)])
-            else:
+            elif setting.name == "target" or setting.get_default() is None:
+                # settings with a default fall back to it
                 unset = True
 
         if not unset:
@@ -376,32 +453,61 @@ class MatchCli:
         click.echo('\n')
         click.echo('Configure solver settings:\n')
 
-        for setting in _config.get_settings():
-            click.echo('Configure {}:\n'.format(setting.name))
-            _options = setting.get_options()
-            for key, option in enumerate(_options):
-                click.echo('[{}] {} - {}'.format(key,
-                                                 click.style(
-                                                     option.value, fg='blue'),
-                                                 option.description))
-
-            _list_of_options = list(range(len(_options)))
-            _list_of_options = ListValidator.list_items_to_str(
-                _list_of_options)
-
-            option_completer = WordCompleter(_list_of_options)
-            _option_choice = prompt(ANSI(click.style('\nWhich config option do you choose: ', fg=self.CLICK_PROMPT_FG_COLOR)),
-                                    completer=option_completer, validator=ListValidator(_list_of_options))
-
-            setting.set_value(_options[int(_option_choice)])
+        self._ask_setting_options(_config, skip=_loaded)
 
         self.start_matching()
 
+    def _print_progress(self, event):
+        click.echo(click.style(
+            '[Progress] stage {} solution {}: objective {:g}, bound {:g}, gap {:.2%} ({:.1f}s)'.format(
+                event.stage, event.solutions, event.objective, event.bound, event.gap(), event.wall_time),
+            fg='cyan'))
+
+    def _run_matching(self):
+        """Runs the matching of the solver. Solvers that publish their
+        solutions show live progress, the search then runs in a separate
+        thread and Ctrl+C accepts the best solution found so far.
+        """
+        _solver = self.settings.solver
+        if not hasattr(_solver, 'subscribe'):
+            _solver.match()
+            return
+
+        _errors = []
+        # a KeyboardInterrupt in Thread.join() can leave the thread marked as
+        # finished while it still runs, the end of the matching is signaled instead
+        _done = threading.Event()
+
+        def _match():
+            try:
+                _solver.match()
+            except BaseException as e:
+                _errors.append(e)
+            finally:
+                _done.set()
+
+        click.echo(click.style(self._TEXT_STOPSEARCH, fg=self.CLICK_PROMPT_FG_COLOR))
+        _solver.subscribe(self._print_progress)
+        _thread = threading.Thread(target=_match, daemon=True)
+        _thread.start()
+        try:
+            while not _done.is_set():
+                try:
+                    _done.wait(0.1)
+                except KeyboardInterrupt:
+                    _solver.stop_search()
+                    click.echo(click.style(self._TEXT_SEARCHSTOPPED, fg='yellow'))
+        finally:
+            _solver.unsubscribe(self._print_progress)
+
+        if _errors:
+            raise _errors[0]
+
     def automatch(self):
         self.settings.solver.reset_matching()
 
         try:
-            self.settings.solver.match()
+            self._run_matching()
         except SolverError as e:
             print("ERROR")
 
@@ -425,7 +531,7 @@ class MatchCli:
 
         if _start_matching:
             try:
-                self.settings.solver.match()
+                self._run_matching()
             except SolverError as e:
                 click.echo(click.style(e.message, fg='red'), err=True)
                 self.ask_alter()
@@ -471,7 +577,8 @@ class MatchCli:
             self._edit_file_with_editor(self.settings.resources_path)
             self._read_resources_file()
             self._parse_resources()
-            self.settings.solver.set_resources(self.settings.resources)
+            self.settings.solver.set_resources(
+                self.settings.resources, self.resources.get_label_index())
 
         _alter_deployments = confirm(
             ANSI(click.style(self._TEXT_ASKALTERWORKLOADS, fg=self.CLICK_PROMPT_FG_COLOR)))
@@ -0,0 +1,87 @@
+"""Leveled tracing of solver decisions. Trace points are skipped unless their
+level is enabled, call sites guard expensive fields with :func:`enabled`::
+
+    if tracing.enabled(tracing.DEBUG):
+        tracing.trace(tracing.DEBUG, 'rbmm.mapping', artefacts=len(app))
+
+Hot loops check the level once before the loop. Records are written as JSON
+lines to a trace file, or as short lines to stderr if no file is configured.
+"""
+
+import os
+import json
+import time
+
+import click
+
+OFF = 0
+INFO = 1
+DEBUG = 2
+TRACE = 3
+
+LEVELS = {'off': OFF, 'info': INFO, 'debug': DEBUG, 'trace': TRACE}
+_LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+# highest level that is traced
+_level = OFF
+# open trace file, None for stderr
+_sink = None
+_start = time.time()
+
+
+def configure(level=OFF, path=None):
+    """Sets the trace level and output. A trace file is truncated and
+    written line by line, so worker processes can append to it.
+
+    :param level: highest level to trace, one of the level constants or names
+    :type level: int or str
+    :param path: path of the JSONL trace file, None for stderr
+    :type path: str, optional
+    """
+    global _level, _sink, _start
+    close()
+    _level = LEVELS[level] if isinstance(level, str) else level
+    _start = time.time()
+    if path is not None and _level > OFF:
+        open(path, 'w').close()
+        _sink = open(path, 'a', buffering=1)
+
+
+def close():
+    """Closes the trace file and disables tracing"""
+    global _level, _sink
+    if _sink is not None:
+        _sink.close()
+    _sink = None
+    _level = OFF
+
+
+def enabled(level):
+    """Checks if trace points of the given level are traced
+
+    :param level: level of the trace point
+    :type level: int
+    :rtype: bool
+    """
+    return _level >= level
+
+
+def trace(level, event, **fields):
+    """Traces an event if its level is enabled
+
+    :param level: level of the trace point
+    :type level: int
+    :param event: name of the event, prefixed with the component
+    :type event: str
+    :param fields: values of the event, values that are not JSON types are written as strings
+    """
+    if _level < level:
+        return
+    if _sink is not None:
+        _record = {'t': round(time.time() - _start, 6), 'pid': os.getpid(),
+                   'level': _LEVEL_NAMES[level], 'event': event}
+        _record.update(fields)
+        _sink.write(json.dumps(_record, default=str) + '\n')
+    else:
+        click.echo(click.style('[Trace] {} {}'.format(event, ' '.join(
+            '{}={}'.format(key, value) for key, value in fields.items())), fg='bright_black'), err=True)
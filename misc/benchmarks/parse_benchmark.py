@@ -0,0 +1,105 @@
+"""Benchmark of parsing the bundled example charts and resources with the
+pure Python YAML loader and the loader used by the importers.
+
+Run from the repository root:
+
+    python misc/benchmarks/parse_benchmark.py [--repeat N] [--workers N] [FILES...]
+"""
+
+import os
+import sys
+import time
+import contextlib
+
+import click
+import yaml
+
+# the benchmark is run as script, make the package importable without installing it
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from continuum_deployer.dsl.importer.helm import Helm
+from continuum_deployer.resources.resources import Resources
+from continuum_deployer.utils.file_handling import FileHandling
+from continuum_deployer.utils.exceptions import RequirementsError
+
+CHARTS = [
+    'examples/charts/gitlab/gitlab.yaml',
+    'examples/charts/grafana-templated.yaml',
+    'examples/charts/redis/redis.yaml',
+    'examples/charts/wordpress/wordpress-9.6.2.yaml',
+    'examples/charts/sample_multi.yaml',
+]
+RESOURCES = [
+    'examples/resources/default.yaml',
+]
+
+
+def parse_chart(content, workers=1):
+    _helm = Helm()
+    _helm.get_config().get_setting('parse_workers').set_value(workers)
+    _helm.parse(content)
+    return len(_helm.get_app_modules())
+
+
+def parse_resources(content):
+    _resources = Resources()
+    _resources.parse(content)
+    return len(_resources.get_resources())
+
+
+def measure(parse, content, loader, repeat):
+    """Returns the best wall-clock time of parsing the content with the given loader, parse
+    is called with the content"""
+    _default = FileHandling.YAML_LOADER
+    FileHandling.YAML_LOADER = loader
+    _best = None
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for _ in range(repeat):
+                _start = time.perf_counter()
+                _count = parse(content)
+                _elapsed = time.perf_counter() - _start
+                _best = _elapsed if _best is None else min(_best, _elapsed)
+    finally:
+        FileHandling.YAML_LOADER = _default
+    return _best, _count
+
+
+@click.command()
+@click.option('-r', '--repeat', type=int, default=3, show_default=True, help='Runs per file, the best run counts')
+@click.option('-w', '--workers', type=int, default=1, show_default=True,
+              help='Processes of the parallel chart parsing, timed in an extra column if not 1')
+@click.argument('files', nargs=-1)
+def main(repeat, workers, files):
+    """Compares the parse times of the pure Python and the libyaml loader"""
+    if FileHandling.YAML_LOADER is yaml.SafeLoader:
+        click.echo(click.style('[Warning] PyYAML is built without libyaml, both runs use the pure Python loader.',
+                               fg='yellow'))
+
+    _jobs = [(path, parse_resources if path in RESOURCES else parse_chart)
+             for path in (files or CHARTS + RESOURCES)]
+    click.echo('{:<50} {:>9} {:>7} {:>11} {:>11} {:>8}{}'.format(
+        'file', 'size', 'parsed', 'python [s]', 'libyaml [s]', 'speedup',
+        '' if workers == 1 else ' {:>12}'.format('parallel [s]')))
+    for path, parse in _jobs:
+        with open(path, 'r') as file:
+            _content = file.read()
+        try:
+            _python, _count = measure(parse, _content, yaml.SafeLoader, repeat)
+            _fast, _ = measure(parse, _content, FileHandling.YAML_LOADER, repeat)
+            _parallel = None
+            if workers != 1 and parse is parse_chart:
+                _parallel, _ = measure(lambda content: parse_chart(content, workers), _content,
+                                       FileHandling.YAML_LOADER, repeat)
+        except RequirementsError as e:
+            click.echo(click.style('[Error] {}'.format(e), fg='red'), err=True)
+            sys.exit(1)
+        click.echo('{:<50} {:>8}K {:>7} {:>11.4f} {:>11.4f} {:>7.1f}x{}'.format(
+            path, len(_content) // 1024, _count, _python, _fast, _python / _fast,
+            '' if _parallel is None else ' {:>12.4f}'.format(_parallel)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import io
+import yaml
+from continuum_deployer.dsl.exporter.kubernetes import Kubernetes
+from continuum_deployer.resources.deployment import DeploymentEntity
+from continuum_deployer.resources.resource_entity import ResourceEntity
+
+
+def test_replicas_export():
+    template = DeploymentEntity(name='test-deployment', memory=256, cpu=0.5, replicas=3, yaml={
+        'kind': 'Deployment',
+        'metadata': {'name': 'test-deployment'},
+        'spec': {'replicas': 3, 'template': {'spec': {'containers': []}}}
+    })
+    replicas = template.get_replicas()
+
+    resources = [
+        ResourceEntity(name='test-node-1', memory=1024, cpu=1),
+        ResourceEntity(name='test-node-2', memory=1024, cpu=1),
+    ]
+    resources[0].add_deployment(replicas[0])
+    resources[0].add_deployment(replicas[1])
+    resources[1].add_deployment(replicas[2])
+
+    output = io.StringIO()
+    Kubernetes(output_stream=output).export(resources)
+    manifests = [m for m in yaml.safe_load_all(output.getvalue()) if m]
+
+    assert [(m['metadata']['name'], m['spec']['replicas']) for m in manifests] == [
+        ('test-deployment-test-node-1', 2), ('test-deployment-test-node-2', 1)]
+    assert manifests[1]['spec']['template']['spec']['nodeSelector'] == {
+        'kubernetes.io/hostname': 'test-node-2'}
+    # shared template definition stays untouched
+    assert 'nodeSelector' not in template.yaml['spec']['template']['spec']
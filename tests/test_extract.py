@@ -1,5 +1,9 @@
 import pytest
+import yaml
 from continuum_deployer.dsl.importer.helm import Helm
+from continuum_deployer.utils.file_handling import FileHandling
+from continuum_deployer.resources.resource_entity import ResourceEntity
+from continuum_deployer.solving.greedy import Greedy
 
 
 @pytest.fixture(scope="function")
@@ -49,3 +53,84 @@ def test_k8s_memory_calc(extractor):
 
     for memory in _memory_values:
         assert Helm.parse_k8s_memory_value(memory[0]) == memory[1]
+
+
+def test_replicas_share_template(extractor):
+    stream = open('./tests/yaml/replicas.yaml', 'r')
+
+    extractor.parse(stream)
+    modules = extractor.get_app_modules()
+    workloads = extractor.get_workloads()
+
+    assert len(workloads) == 3
+    assert workloads[0].replicas == 3
+    assert [m.name for m in modules[:3]] == [
+        'nginx-deployment-1-0', 'nginx-deployment-1-1', 'nginx-deployment-1-2']
+    assert modules[0].yaml is modules[2].yaml
+    assert modules[0].cpu == 0.4
+
+    # solvers take the workloads and place each replica
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=8) for i in range(2)]
+    matcher = Greedy(workloads, resources)
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+    assert sorted(d.name for r in resources for d in r.get_deployments()) == sorted(m.name for m in modules)
+
+
+def test_yaml_loader_fallback(monkeypatch):
+    if hasattr(yaml, 'CSafeLoader'):
+        assert FileHandling.YAML_LOADER is yaml.CSafeLoader
+
+    results = []
+    for loader in [FileHandling.YAML_LOADER, yaml.SafeLoader]:
+        monkeypatch.setattr(FileHandling, 'YAML_LOADER', loader)
+        extractor = Helm()
+        with open('./tests/yaml/multi_component.yaml', 'r') as stream:
+            extractor.parse(stream)
+        results.append([(m.name, m.cpu, m.memory, m.labels, m.yaml) for m in extractor.get_app_modules()])
+    assert results[0] == results[1]
+
+
+def test_kind_prefilter(extractor):
+    assert Helm.scan_kind('---\n# Source: chart\nkind: ConfigMap # comment\ndata: {}\n') == 'ConfigMap'
+    assert Helm.scan_kind('---\nkind: "Role"\n') == 'Role'
+    # kinds that can not be told from the text are constructed
+    assert Helm.scan_kind('--- {kind: Deployment}\n') is None
+    assert Helm.scan_kind('--- !custom\nkind: ConfigMap\n') is None
+    assert Helm.scan_kind('---\nkind: !!str ConfigMap\n') is None
+    assert Helm.scan_kind('---\nkind: ConfigMap\n"kind": Deployment\n') is None
+
+    with open('./tests/yaml/multi_component.yaml', 'r') as stream:
+        workloads = stream.read()
+    # documents of other kinds are skipped before construction
+    broken = '---\napiVersion: v1\nkind: ConfigMap\ndata: [unclosed\n'
+    assert len(Helm.split_documents(broken + workloads + broken)) == 4
+
+    extractor.parse(broken + workloads + broken)
+    assert [m.name for m in extractor.get_app_modules()] == [
+        'RELEASE-NAME-redis-master', 'fluentd-elasticsearch']
+
+
+def test_parallel_parse():
+    content = ''
+    for path in ['deployments.yaml', 'multi_component.yaml', 'replicas.yaml']:
+        with open('./tests/yaml/{}'.format(path), 'r') as stream:
+            content += stream.read() + '\n'
+
+    serial = Helm()
+    serial.parse(content)
+
+    extractor = Helm()
+    extractor.get_config().get_setting('parse_workers').set_value(2)
+    extractor.get_config().get_setting('parse_chunk_size').set_value(1)
+    extractor.parse(content)
+
+    def values(module):
+        return (module.name, module.cpu, module.memory, module.cpu_limit,
+                module.memory_limit, module.labels, module.replicas)
+
+    workloads = extractor.get_workloads()
+    assert [values(m) for m in extractor.get_app_modules()] == [values(m) for m in serial.get_app_modules()]
+    # definitions are constructed on first access
+    assert workloads[0]._yaml is None
+    assert [w.yaml for w in workloads] == [w.yaml for w in serial.get_workloads()]
@@ -1,9 +1,30 @@
+import os
+import json
+import signal
+import pickle
+import time
+import multiprocessing
+
 import pytest
+import numpy as np
+from ortools.sat.python import cp_model
 from continuum_deployer.solving.solver import Solver
 from continuum_deployer.solving.greedy import Greedy
+from continuum_deployer.solving.sat import SAT
+from continuum_deployer.solving.lns import LNS
+from continuum_deployer.solving.portfolio import Portfolio
+from continuum_deployer.solving.rbmm import Rbmm, Artefact, Resource, IDENTITY, branches
+from continuum_deployer.solving.rbmm_rules import FactorTable
+from continuum_deployer.solving.sat_model import PlacementModel
 from continuum_deployer.resources.deployment import DeploymentEntity
 from continuum_deployer.resources.resource_entity import ResourceEntity
-from continuum_deployer.utils.exceptions import SolverError
+from continuum_deployer.solving.preflight import Preflight
+from continuum_deployer.solving.capacity_index import CapacityTree, SortedCapacity
+from continuum_deployer.utils.config import SettingValue, NumericSetting
+from continuum_deployer.utils import tracing
+from continuum_deployer.utils import match_cli
+from continuum_deployer.utils.match_cli import MatchCli
+from continuum_deployer.utils.exceptions import SolverError, PreflightError
 
 
 def test_upper_bound_cpu_detection():
@@ -157,3 +178,735 @@ def test_greedy_matcher_with_labels():
     for i, res in enumerate(resources_matched):
         for exp_deploy in expected_results[i]:
             assert exp_deploy in res.get_deployments()
+
+
+def test_parallel_label_groups():
+
+    def _deployments():
+        return [
+            DeploymentEntity(name='test-deployment-1', memory=512,
+                             cpu=1, labels={'cloud': 'public'}),
+            DeploymentEntity(name='test-deployment-2', memory=512,
+                             cpu=1, labels={'tier': 'edge'}),
+            DeploymentEntity(name='test-deployment-3', memory=512,
+                             cpu=1, labels={'tier': 'edge'}),
+            DeploymentEntity(name='test-deployment-4', memory=512, cpu=1),
+        ]
+
+    def _resources():
+        return [
+            ResourceEntity(name='test-node-1', memory=1024,
+                           cpu=2, labels={'cloud': 'public'}),
+            ResourceEntity(name='test-node-2', memory=1024,
+                           cpu=2, labels={'tier': 'edge'}),
+            ResourceEntity(name='test-node-3', memory=1024, cpu=2),
+        ]
+
+    serial = Greedy(_deployments(), _resources())
+    serial.PARALLEL_GROUPS = False
+    serial.match()
+
+    matcher = Greedy(_deployments(), _resources())
+    matcher.PARALLEL_MIN_DEPLOYMENTS = 0
+    matcher.match()
+
+    assert matcher.get_placement_errors() == serial.get_placement_errors()
+    for res, expected in zip(matcher.get_resources(), serial.get_resources()):
+        assert res.get_deployments() == expected.get_deployments()
+    assert [d.name for d in matcher.get_resources()[1].get_deployments()] == [
+        'test-deployment-2', 'test-deployment-3']
+
+
+class _FailingWorkerGreedy(Greedy):
+    """Greedy solver that fails in worker processes only"""
+
+    PARENT = os.getpid()
+
+    def do_matching(self, deployment_entities, resources):
+        if os.getpid() != self.PARENT:
+            raise TypeError('failed in worker')
+        super().do_matching(deployment_entities, resources)
+
+
+def test_parallel_worker_errors_propagate():
+    deployments = [DeploymentEntity(name='test-deployment-1', memory=512, cpu=1, labels={'cloud': 'public'}),
+                   DeploymentEntity(name='test-deployment-2', memory=512, cpu=1, labels={'tier': 'edge'})]
+    resources = [ResourceEntity(name='test-node-1', memory=1024, cpu=2, labels={'cloud': 'public'}),
+                 ResourceEntity(name='test-node-2', memory=1024, cpu=2, labels={'tier': 'edge'})]
+    matcher = _FailingWorkerGreedy(deployments, resources)
+    matcher.PARALLEL_MIN_DEPLOYMENTS = 0
+
+    # errors of the solver are not mistaken for a pool that can not be used
+    with pytest.raises(TypeError, match='failed in worker'):
+        matcher.match()
+
+
+def test_preflight_lower_bound():
+    matcher = Solver(
+        [DeploymentEntity(name='test-deployment-{}'.format(i), memory=600, cpu=1)
+         for i in range(3)],
+        [ResourceEntity(name='test-node-{}'.format(i), memory=1000, cpu=4)
+         for i in range(2)]
+    )
+
+    with pytest.raises(PreflightError) as e:
+        matcher.match()
+    issues = e.value.report.issues
+    assert [(i.check, i.dimension, i.required, i.available) for i in issues] == [
+        ('lower_bound', 'memory', 3, 2)]
+
+    # without strict checks a warning is shown and the deployments that fit are placed
+    matcher = Greedy(matcher.get_deployment_entities(), matcher.get_resources())
+    matcher.PREFLIGHT_STRICT = False
+    matcher.match()
+    assert len(matcher.get_placement_errors()) == 1
+
+
+def test_preflight_label_groups():
+    matcher = Solver(
+        [
+            DeploymentEntity(name='test-deployment-1', memory=512,
+                             cpu=2, labels={'cloud': 'public'}),
+            DeploymentEntity(name='test-deployment-2', memory=512,
+                             cpu=1, labels={'tier': 'edge'}),
+        ],
+        [
+            ResourceEntity(name='test-node-1', memory=1024, cpu=4),
+            ResourceEntity(name='test-node-2', memory=1024,
+                           cpu=1, labels={'cloud': 'public'}),
+        ]
+    )
+
+    with pytest.raises(PreflightError) as e:
+        matcher.match()
+    issues = e.value.report.issues
+    assert [(i.check, i.dimension, i.group) for i in issues] == [
+        ('capacity', 'cpu', {'cloud': 'public'}),
+        ('no_resources', None, {'tier': 'edge'}),
+    ]
+
+
+def test_lower_bound_values():
+    assert Preflight.lower_bound(np.array([6, 6, 6]), 10) == 3
+    assert Preflight.lower_bound(np.array([5, 5, 5, 5]), 10) == 2
+    assert Preflight.lower_bound(np.array([7, 3, 3, 3]), 10) == 2
+
+
+def test_capacity_index_lookups():
+    rng = np.random.default_rng(42)
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=int(m), cpu=int(c))
+                 for i, (m, c) in enumerate(zip(rng.integers(512, 4096, 50), rng.integers(1, 8, 50)))]
+    tree = CapacityTree(resources)
+    index = SortedCapacity(resources, 'memory')
+
+    for i in range(200):
+        entity = DeploymentEntity(name='test-deployment-{}'.format(i),
+                                  memory=int(rng.integers(64, 1024)), cpu=int(rng.integers(0, 2)))
+        fitting = [k for k, r in enumerate(resources) if r.check_resources_fit(entity)]
+
+        assert tree.first_fit(entity.cpu, entity.memory) == (fitting[0] if fitting else None)
+        best = min(fitting, key=lambda k: (resources[k].get_idle_memory(), k)) if fitting else None
+        assert index.best_fit(entity.cpu, entity.memory) == best
+
+        if best is not None:
+            resources[best].add_deployment(entity)
+            tree.update(best)
+            index.update(best)
+
+
+def test_greedy_best_fit():
+    deployments = [
+        DeploymentEntity(name='test-deployment-1', memory=512, cpu=1),
+        DeploymentEntity(name='test-deployment-2', memory=256, cpu=1),
+    ]
+    matcher = Greedy(
+        deployments,
+        [
+            ResourceEntity(name='test-node-1', memory=4096, cpu=4),
+            ResourceEntity(name='test-node-2', memory=512, cpu=4),
+            ResourceEntity(name='test-node-3', memory=768, cpu=4),
+        ]
+    )
+    matcher.get_config().get_setting('target').set_value(SettingValue('best_fit_memory'))
+    matcher.match()
+    resources_matched = matcher.get_resources()
+
+    assert resources_matched[1].get_deployments() == [deployments[0]]
+    assert resources_matched[2].get_deployments() == [deployments[1]]
+
+
+def test_greedy_vector_heuristics():
+
+    def _match(target):
+        matcher = Greedy(
+            [
+                DeploymentEntity(name='test-deployment-1', memory=512, cpu=1),
+                DeploymentEntity(name='test-deployment-2', memory=512, cpu=2),
+                DeploymentEntity(name='test-deployment-3', memory=1536, cpu=1),
+            ],
+            [
+                ResourceEntity(name='test-node-1', memory=2048, cpu=3),
+                ResourceEntity(name='test-node-2', memory=1024, cpu=1),
+            ]
+        )
+        matcher.get_config().get_setting('target').set_value(SettingValue(target))
+        matcher.match()
+        return matcher
+
+    # single attribute sorting strands capacity on this input
+    assert len(_match('cpu').get_placement_errors()) == 1
+
+    for target in ['dot_product', 'l2_norm', 'dominant_resource']:
+        matcher = _match(target)
+        assert matcher.get_placement_errors() == []
+        assert [d.name for d in matcher.get_resources()[1].get_deployments()] == [
+            'test-deployment-1']
+
+    with pytest.raises(ValueError, match='cosine'):
+        Greedy.vector_scores('cosine', np.ones(2), np.ones((1, 2)), np.ones((1, 2)))
+
+
+def test_numeric_setting():
+    setting = NumericSetting('time_limit', 0.0, minimum=0)
+
+    assert setting.get_value().value == 0.0
+    setting.set_value('2.5')
+    assert setting.get_value().value == 2.5
+    with pytest.raises(ValueError):
+        setting.set_value('-1')
+    with pytest.raises(ValueError):
+        setting.set_value('abc')
+
+
+def test_sat_solver_settings():
+    deployments = [
+        DeploymentEntity(name='test-deployment-1', memory=1024, cpu=1),
+        DeploymentEntity(name='test-deployment-2', memory=512, cpu=2),
+        DeploymentEntity(name='test-deployment-3', memory=256, cpu=0.5),
+    ]
+    matcher = SAT(
+        deployments,
+        [
+            ResourceEntity(name='test-node-1', memory=1024, cpu=1),
+            ResourceEntity(name='test-node-2', memory=1024, cpu=3),
+        ]
+    )
+    config = matcher.get_config()
+    config.get_setting('time_limit').set_value(10)
+    config.get_setting('num_workers').set_value(2)
+    config.get_setting('random_seed').set_value(7)
+    matcher.match()
+    resources_matched = matcher.get_resources()
+
+    assert matcher.get_placement_errors() == []
+    assert resources_matched[0].get_deployments() == [deployments[0]]
+    assert matcher.get_solve_stats()[-1]['status'] == 'OPTIMAL'
+
+    # the total limit is shared by all runs, once it is used up the remaining stages are skipped
+    config.get_setting('total_time_limit').set_value(5)
+    config.get_setting('target').set_value(SettingValue('min_idle_resources'))
+    solver = cp_model.CpSolver()
+    matcher._set_solver_parameters(solver)
+    assert solver.parameters.max_time_in_seconds <= 5
+    matcher.reset_matching()
+    matcher._deadline = time.time() - 1
+    matcher.do_matching(deployments, matcher.get_resources())
+    assert matcher.get_placement_errors() == []
+    assert [stats['stage'] for stats in matcher.get_solve_stats()] == [0]
+
+
+def test_sat_collapsed_replicas():
+    template = DeploymentEntity(name='test-deployment', memory=256, cpu=0.1, replicas=40)
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2560, cpu=1)
+                 for i in range(4)]
+    matcher = SAT([template], resources)
+    matcher.match()
+
+    assert matcher.get_placement_errors() == []
+    # nodes are filled up completely, placing needs to be robust against float rounding
+    assert [len(r.get_deployments()) for r in resources] == [10, 10, 10, 10]
+
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2560, cpu=1)
+                 for i in range(4)]
+    model = PlacementModel(template.get_replicas(), resources, [100] * 40, [1000] * 4)
+    assert len(model.classes) == 1
+    assert len(model.count) == 4
+    assert model.node_classes == [[0, 1, 2, 3]]
+
+
+def test_sat_fractional_requests():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=50.5, cpu=0.35)
+                   for i in range(2)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=100, cpu=0.7)
+                 for i in range(2)]
+    matcher = SAT(deployments, resources)
+    matcher.get_config().get_setting('target').set_value(SettingValue('min_idle_resources'))
+    matcher.match()
+
+    # requests are rounded up, so packing does not put both deployments on one node
+    assert matcher.get_placement_errors() == []
+    assert [len(r.get_deployments()) for r in resources] == [1, 1]
+    assert SAT.scale_cpu_values([DeploymentEntity(name='test', memory=1, cpu=0.1001)]) == [101]
+    assert SAT.scale_cpu_values([ResourceEntity(name='test', memory=1, cpu=0.7999)], idle=True) == [799]
+
+
+def test_sat_warm_start():
+    deployments = [DeploymentEntity(name='big-{}'.format(i), memory=1024, cpu=0.6) for i in range(2)] + \
+        [DeploymentEntity(name='small-{}'.format(i), memory=256, cpu=0.2) for i in range(4)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=1)
+                 for i in range(2)]
+
+    model = PlacementModel(deployments, resources, SAT.scale_cpu_values(deployments),
+                           SAT.scale_cpu_values(resources, idle=True))
+    # first-fit decreasing places the big deployments first, then fills up
+    assert model.first_fit_counts() == {(0, 0): 1, (1, 0): 1, (0, 1): 2, (1, 1): 2}
+    assert model.assignment_counts({0: 1, 2: 1, 3: 0}) == {(1, 0): 1, (1, 1): 1, (0, 1): 1}
+
+    matcher = SAT(deployments, resources)
+    matcher.get_config().get_setting('warm_start').set_value(SettingValue('previous'))
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+    _previous = matcher.get_previous_placement()
+    assert set(_previous.keys()) == set(d.name for d in deployments)
+
+    # a rerun keeps the previous placement available as hint
+    matcher.reset_matching()
+    assert matcher.get_previous_placement() == _previous
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+
+
+def test_sat_incremental_resolve():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=512, cpu=0.5)
+                   for i in range(4)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=1024, cpu=1)
+                 for i in range(2)]
+    matcher = SAT(deployments, resources)
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+    _model = next(iter(matcher.models.values()))
+    assert _model.solution
+
+    # edit one deployment and one node, the kept model is updated in place
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=512, cpu=0.5)
+                   for i in range(3)] + [DeploymentEntity(name='test-deployment-3', memory=1024, cpu=1)]
+    resources = [ResourceEntity(name='test-node-0', memory=1024, cpu=1),
+                 ResourceEntity(name='test-node-1', memory=2048, cpu=2)]
+    matcher.set_resources(resources)
+    matcher.set_deployment_entities(deployments)
+    matcher.reset_matching()
+    matcher.match()
+
+    assert matcher.get_placement_errors() == []
+    assert next(iter(matcher.models.values())) is _model
+    assert len(_model.classes) == 2
+    assert sorted(len(r.get_deployments()) for r in resources) == [1, 3]
+    assert sum(r.get_idle_cpu() for r in resources) == pytest.approx(0.5)
+
+    # label groups on the same resources keep separate models
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=1024, cpu=1,
+                                labels={'zone': 'a', 'tier': 'x'}) for i in range(2)]
+    deployments = [DeploymentEntity(name='test-deployment-a', memory=512, cpu=0.5, labels={'zone': 'a'}),
+                   DeploymentEntity(name='test-deployment-x', memory=512, cpu=0.5, labels={'tier': 'x'})]
+    matcher.set_resources(resources)
+    matcher.set_deployment_entities(deployments)
+    matcher.reset_matching()
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+    assert len(matcher.models) == 4
+
+    # models that were not used by the last run are dropped
+    matcher.reset_matching()
+    assert len(matcher.models) == 3
+    matcher.clear_models()
+    assert matcher.models == {}
+
+
+@pytest.mark.parametrize('mode', ['lexicographic', 'weighted'])
+def test_sat_multi_objective(mode):
+    def _match(target):
+        deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=512, cpu=0.5)
+                       for i in range(2)]
+        resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=2)
+                     for i in range(2)]
+        matcher = SAT(deployments, resources)
+        matcher.get_config().get_setting('target').set_value(SettingValue(target))
+        matcher.get_config().get_setting('objective_mode').set_value(SettingValue(mode))
+        matcher.match()
+        assert matcher.get_placement_errors() == []
+        return matcher, sorted(len(r.get_deployments()) for r in resources)
+
+    matcher, placed = _match('min_idle_resources')
+    # idle resources of used nodes are minimized by packing onto one node
+    assert placed == [0, 2]
+    _stages = 2 if mode == 'lexicographic' else 1
+    assert [stats['stage'] for stats in matcher.get_solve_stats()] == list(range(_stages))
+    if mode == 'lexicographic':
+        # idle cpu of the used node in scaled units
+        assert matcher.get_solve_stats()[0]['objective'] == 1000
+
+    matcher, placed = _match('max_idle_resources')
+    assert placed == [1, 1]
+
+
+def test_sat_model_sparse_variables():
+    deployments = [DeploymentEntity(name='test-small', memory=512, cpu=0.5),
+                   DeploymentEntity(name='test-large', memory=512, cpu=1.5)]
+    resources = [ResourceEntity(name='test-node-small', memory=1024, cpu=1),
+                 ResourceEntity(name='test-node-large', memory=1024, cpu=2)]
+    model = PlacementModel(deployments, resources, SAT.scale_cpu_values(deployments),
+                           SAT.scale_cpu_values(resources, idle=True))
+    # the large deployment does not fit on the small node
+    assert sorted(model.count.keys()) == [(0, 0), (1, 0), (1, 1)]
+
+    # cpu coefficients are reduced by their common divisor 500
+    _linear = model.model.Proto().constraints[model._capacity_cpu[1]].linear
+    assert sorted(_linear.coeffs) == [1, 3]
+    assert list(_linear.domain)[1] == 4
+
+    matcher = SAT(deployments, resources)
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+    assert [d.name for d in resources[1].get_deployments()] == ['test-large']
+
+
+def test_sat_global_label_mode():
+    def _match(label_mode):
+        deployments = [DeploymentEntity(name='test-labeled-{}'.format(i), memory=256, cpu=0.5,
+                                        labels={'zone': 'a'}) for i in range(2)] + \
+            [DeploymentEntity(name='test-unlabeled', memory=256, cpu=1),
+             DeploymentEntity(name='test-unsuitable', memory=256, cpu=0.1, labels={'zone': 'b'})]
+        resources = [ResourceEntity(name='test-node-{}'.format(i), memory=1024, cpu=1,
+                                    labels={'zone': 'a'}) for i in range(2)]
+        matcher = SAT(deployments, resources)
+        matcher.PREFLIGHT_CHECKS = False
+        matcher.get_config().get_setting('label_mode').set_value(SettingValue(label_mode))
+        matcher.match()
+        return matcher, resources
+
+    # the labeled group is spread first and leaves no node for the unlabeled deployment
+    matcher, _ = _match('grouped')
+    assert 'test-unlabeled' in [d.name for d in matcher.get_placement_errors()]
+
+    matcher, resources = _match('global')
+    assert [d.name for d in matcher.get_placement_errors()] == ['test-unsuitable']
+    assert sorted(len(r.get_deployments()) for r in resources) == [1, 2]
+    assert len(matcher.get_solve_stats()) == 1
+
+    # a group over capacity falls back to solving the groups one by one
+    deployments = [DeploymentEntity(name='test-full-{}'.format(i), memory=1024, cpu=0.5,
+                                    labels={'zone': 'a'}) for i in range(3)] + \
+        [DeploymentEntity(name='test-edge', memory=256, cpu=0.5, labels={'zone': 'b'}),
+         DeploymentEntity(name='test-unlabeled', memory=256, cpu=0.5)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=1024, cpu=1,
+                                labels={'zone': 'a'}) for i in range(2)] + \
+        [ResourceEntity(name='test-edge-node', memory=1024, cpu=1, labels={'zone': 'b'})]
+    matcher = SAT(deployments, resources)
+    matcher.PREFLIGHT_CHECKS = False
+    matcher.get_config().get_setting('label_mode').set_value(SettingValue('global'))
+    matcher.match()
+    assert matcher.get_solve_stats()[0]['status'] == 'INFEASIBLE'
+    # all runs are recorded in this instance
+    assert not SAT.PARALLEL_GROUPS
+    assert len(matcher.get_solve_stats()) == 4
+    assert sorted(d.name for d in matcher.get_placement_errors()) == [
+        'test-full-0', 'test-full-1', 'test-full-2']
+    assert 'test-edge' in [d.name for d in resources[2].get_deployments()]
+    assert sum(len(r.get_deployments()) for r in resources) == 2
+
+
+def test_lns_improves_first_fit():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=256, cpu=0.5)
+                   for i in range(4)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=2)
+                 for i in range(4)]
+
+    # first fit packs all deployments onto the first node
+    assert LNS.first_fit(deployments, resources) == []
+    assert [len(r.get_deployments()) for r in resources] == [4, 0, 0, 0]
+    for resource in resources:
+        resource.clear_deployments()
+
+    matcher = LNS(deployments, resources)
+    matcher.get_config().get_setting('neighborhood_size').set_value(2)
+    matcher.get_config().get_setting('num_workers').set_value(1)
+    matcher.match()
+
+    assert matcher.get_placement_errors() == []
+    assert len(matcher.get_search_stats()) == 10
+    # max_idle_cpu spreads the deployments over the resources
+    assert sum(1 for r in resources if r.get_deployments()) > 1
+    assert sum(len(r.get_deployments()) for r in resources) == 4
+
+
+def test_sat_solution_events():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=256, cpu=0.5)
+                   for i in range(4)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=2)
+                 for i in range(4)]
+    matcher = SAT(deployments, resources)
+    matcher.get_config().get_setting('target').set_value(SettingValue('min_idle_resources'))
+
+    events = []
+    matcher.subscribe(events.append)
+    matcher.match()
+    assert events
+    assert [e.stage for e in events] == sorted(e.stage for e in events)
+    assert events[-1].stage == 1
+
+    # stopping accepts the first solution and skips the remaining stages
+    events.clear()
+    matcher.subscribe(lambda event: matcher.stop_search())
+    matcher.reset_matching()
+    matcher.match()
+    assert matcher.get_placement_errors() == []
+    assert [stats['stage'] for stats in matcher.get_solve_stats()] == [0]
+    assert matcher.get_solve_stats()[0]['stopped']
+    assert len(events) == 1
+
+    # a stop before the first solution is left to the callback, which stops at the first solution
+    class _Callback:
+        solutions = 0
+        stopped = False
+
+        def StopSearch(self):
+            self.stopped = True
+
+    matcher._callback = _Callback()
+    matcher.stop_search()
+    assert not matcher._callback.stopped and matcher.is_stop_requested()
+    matcher._callback.solutions = 1
+    matcher.stop_search()
+    assert matcher._callback.stopped
+    matcher._callback = None
+
+
+def test_sat_sigint_stops_search():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=256, cpu=0.5)
+                   for i in range(4)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=2)
+                 for i in range(4)]
+    matcher = SAT(deployments, resources)
+    matcher.get_config().get_setting('target').set_value(SettingValue('min_idle_resources'))
+
+    def _interrupt(event):
+        # Ctrl+C at the first solution, the search waits until the CLI has stopped it
+        matcher.unsubscribe(_interrupt)
+        os.kill(os.getpid(), signal.SIGINT)
+        _end = time.time() + 5
+        while not matcher.is_stop_requested() and time.time() < _end:
+            time.sleep(0.01)
+
+    matcher.subscribe(_interrupt)
+    cli = object.__new__(MatchCli)
+    cli.settings = match_cli.Settings(solver=matcher)
+    cli._run_matching()
+
+    assert matcher.is_stop_requested()
+    assert matcher.get_placement_errors() == []
+    assert [stats['stage'] for stats in matcher.get_solve_stats()] == [0]
+    assert matcher.get_solve_stats()[0]['stopped']
+
+
+def test_portfolio_picks_best_result():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=256, cpu=0.5)
+                   for i in range(4)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=2048, cpu=2)
+                 for i in range(4)]
+    matcher = Portfolio(deployments, resources)
+    matcher.get_candidates = lambda: [Greedy, SAT]
+    matcher.get_config().get_setting('deadline').set_value(30)
+    matcher.match()
+
+    assert matcher.get_placement_errors() == []
+    assert sorted(s['solver'] for s in matcher.get_portfolio_stats()) == ['Greedy', 'SAT']
+    # greedy packs the first node, SAT spreads to maximize idle cpu of used nodes
+    assert matcher.get_winner() == 'SAT'
+    assert [len(r.get_deployments()) for r in resources] == [1, 1, 1, 1]
+
+
+def _process_alive(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid)) as stat:
+            # zombies are reaped by whoever adopted them
+            return stat.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_portfolio_cancels_at_deadline(tmp_path):
+    pid_file = tmp_path / 'worker.pid'
+
+    class Slow(Greedy):
+        def do_matching(self, deployment_entities, resources):
+            # worker process of the candidate, like the pools of LNS and RBMM
+            _worker = multiprocessing.Process(target=time.sleep, args=(30,))
+            _worker.start()
+            pid_file.write_text(str(_worker.pid))
+            time.sleep(10)
+
+    deployments = [DeploymentEntity(name='test-deployment', memory=256, cpu=0.5)]
+    resources = [ResourceEntity(name='test-node', memory=2048, cpu=2)]
+    matcher = Portfolio(deployments, resources)
+    matcher.get_candidates = lambda: [Slow, Greedy]
+    matcher.get_config().get_setting('deadline').set_value(1)
+    matcher.match()
+
+    assert matcher.get_winner() == 'Greedy'
+    assert {s['solver']: s['status'] for s in matcher.get_portfolio_stats()} == \
+        {'Greedy': 'finished', 'Slow': 'cancelled'}
+
+    # workers of cancelled candidates are stopped as well
+    if os.path.isdir('/proc'):
+        _pid = int(pid_file.read_text())
+        _end = time.time() + 5
+        while _process_alive(_pid) and time.time() < _end:
+            time.sleep(0.05)
+        assert not _process_alive(_pid)
+
+
+def test_rbmm_branch_and_bound():
+    dep_rules = {"memory": ("memory", ">=", IDENTITY), "cpu": ("cpu", ">=", IDENTITY)}
+    acc_rules = {"memory": "-"}
+    matcher = Rbmm([], [])
+
+    # the first resource fits both artefacts, the large one needs it
+    app = [Artefact({"name": "small", "cpu": 1, "memory": 1}),
+           Artefact({"name": "large", "cpu": 4, "memory": 4})]
+    res = [Resource({"name": "node-1", "cpu": 4, "memory": 4}),
+           Resource({"name": "node-2", "cpu": 1, "memory": 1})]
+    mapping = matcher.mapArtefactResources(app, res, dep_rules, acc_rules)
+    assert {a.factors["name"]: r.factors["name"] for a, r in mapping.items()} == \
+        {"small": "node-2", "large": "node-1"}
+    # accumulation is undone
+    assert res[0].factors["memory"] == 4
+
+    assert matcher.mapArtefactResources(app, res[:1], dep_rules, acc_rules) is None
+
+    # hundreds of artefacts, each with exactly one resource of its own size
+    app = [Artefact({"name": "a-{}".format(i), "cpu": i, "memory": i}) for i in range(300)]
+    res = [Resource({"name": "r-{}".format(i), "cpu": i, "memory": i}) for i in reversed(range(300))]
+    mapping = matcher.mapArtefactResources(app, res, dep_rules, acc_rules)
+    assert all(a.factors["cpu"] == r.factors["cpu"] for a, r in mapping.items())
+
+
+def test_rbmm_shares_resources_without_distinct_mapping():
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=256, cpu=0.5)
+                   for i in range(3)]
+    deployments.append(DeploymentEntity(name='test-unsuitable', memory=4096, cpu=0.5))
+    resources = [ResourceEntity(name='test-node', memory=1024, cpu=1)]
+    matcher = Rbmm(deployments, resources)
+    matcher.do_matching(deployments, resources)
+
+    assert len(resources[0].get_deployments()) == 2
+    assert [d.name for d in matcher.get_placement_errors()] == ['test-deployment-2', 'test-unsuitable']
+
+
+def test_rbmm_rules_from_config(monkeypatch):
+    deployments = [
+        DeploymentEntity(name='test-gpu', memory=256, cpu=0.5, labels={'gpu': '1'}),
+        DeploymentEntity(name='test-cpu', memory=256, cpu=0.5),
+    ]
+    resources = [
+        ResourceEntity(name='test-node-1', memory=1024, cpu=2),
+        ResourceEntity(name='test-node-2', memory=1024, cpu=2, labels={'gpu': '2'}),
+    ]
+    matcher = Rbmm(deployments, resources)
+    names = matcher.get_config().load_yaml("""
+rules:
+  dep_rules:
+    cpu: [cpu, '>=', '*']
+    memory: {operator: '>=', value: '*'}
+    gpu: {operator: '>='}
+  acc_rules:
+    memory: '-'
+""")
+    assert names == ['rules']
+    matcher.do_matching(deployments, resources)
+
+    assert matcher.get_placement_errors() == []
+    assert [d.name for d in resources[1].get_deployments()] == ['test-gpu']
+    assert [d.name for d in resources[0].get_deployments()] == ['test-cpu']
+
+    with pytest.raises(ValueError):
+        matcher.get_config().load_yaml("rules: {dep_rules: {cpu: [cpu, '~', '*']}}")
+    with pytest.raises(ValueError):
+        matcher.get_config().load_yaml("unknown: 1")
+
+    # the config can be shipped to worker processes
+    rules = pickle.loads(pickle.dumps(matcher.get_config())).get_setting('rules').get_value().value
+    assert rules.dep_rules == matcher.get_config().get_setting('rules').get_value().value.dep_rules
+    table = FactorTable([Resource({'gpu': 0}), Resource({'gpu': 2})])
+    assert rules.evaluate({'gpu': 1}, table).tolist() == [False, True]
+
+    sat = SAT([], [])
+    sat.get_config().load_yaml("target: min_idle_resources\ntime_limit: 5")
+    assert sat.get_config().get_setting('target').get_value().value == 'min_idle_resources'
+    assert sat.get_config().get_setting('time_limit').get_value().value == 5
+
+    # settings loaded from the file are not asked again
+    def _prompt(*args, **kwargs):
+        raise AssertionError('prompted for a loaded setting')
+
+    sat = SAT([], [])
+    names = sat.get_config().load_yaml("""
+target: min_idle_resources
+objective_mode: weighted
+warm_start: none
+label_mode: global
+time_limit: 5
+total_time_limit: 10
+num_workers: 1
+relative_gap: 0
+random_seed: 1
+""")
+    monkeypatch.setattr(match_cli, 'prompt', _prompt)
+    MatchCli._ask_setting_options(object.__new__(MatchCli), sat.get_config(), skip=set(names))
+
+
+def test_rbmm_parallel_subtrees():
+    # mapping the first artefact to resource 1 passes the pruning, but leaves
+    # the second and third artefact only resource 2
+    masks = [0b00011, 0b00110, 0b00110, 0b11000]
+    order = [0, 1, 2, 3]
+    candidates = [[1, 0], [1, 2], [1, 2], [3, 4]]
+    assert list(branches(masks, order, candidates, 1)) == [[1], [0]]
+    assert next(branches(masks, order, candidates, 4)) == [0, 1, 2, 3]
+
+    matcher = Rbmm([], [])
+    matcher.PARALLEL_MIN_ARTEFACTS = 1
+    matcher.get_config().get_setting('num_workers').set_value(2)
+    for depth in [1, 2]:
+        matcher.get_config().get_setting('split_depth').set_value(depth)
+        assert matcher.search(masks, order, candidates) == [0, 1, 2, 3]
+    assert matcher.search(masks[:3] + [0b00110], order, candidates[:3] + [[1, 2]]) is None
+
+
+def test_solver_tracing(tmp_path, capsys):
+    deployments = [DeploymentEntity(name='test-deployment-{}'.format(i), memory=256, cpu=0.5)
+                   for i in range(2)]
+    resources = [ResourceEntity(name='test-node-{}'.format(i), memory=1024, cpu=2)
+                 for i in range(2)]
+
+    # disabled tracing does not write anything
+    tracing.close()
+    SAT(deployments, resources).match()
+    Rbmm(deployments, [ResourceEntity(name=r.name, memory=r.memory, cpu=r.cpu) for r in resources]).match()
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert captured.err == ''
+
+    path = tmp_path / 'trace.jsonl'
+    tracing.configure('trace', str(path))
+    try:
+        for resource in resources:
+            resource.clear_deployments()
+        Rbmm(deployments, resources).match()
+    finally:
+        tracing.close()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    events = [record['event'] for record in records]
+    assert events[0] == 'rbmm.mapping'
+    assert events.count('rbmm.rules') == 2
+    assert events.count('rbmm.assign') == 2
+    assert records[-1]['mapping'] == {'test-deployment-0': 'test-node-0', 'test-deployment-1': 'test-node-1'}
@@ -0,0 +1,127 @@
+import pytest
+from continuum_deployer.resources.deployment import DeploymentEntity
+from continuum_deployer.resources.resource_entity import ResourceEntity
+from continuum_deployer.resources.cluster_state import ClusterState
+from continuum_deployer.resources.label_index import LabelIndex
+from continuum_deployer.resources.resources import Resources
+
+
+def test_resource_running_totals():
+    resource = ResourceEntity(name='test-node', memory=1024, cpu=2)
+    deployment_1 = DeploymentEntity(name='test-deployment-1', memory=512, cpu=1)
+    deployment_2 = DeploymentEntity(name='test-deployment-2', memory=256, cpu=0.5)
+
+    assert resource.add_deployment(deployment_1)
+    assert resource.add_deployment(deployment_2)
+    assert resource.get_idle_cpu() == 0.5
+    assert resource.get_idle_memory() == 256
+
+    # does not fit anymore, totals must stay untouched
+    assert not resource.add_deployment(
+        DeploymentEntity(name='test-deployment-3', memory=512, cpu=0.1))
+    assert resource.get_used_memory() == 768
+
+    assert resource.remove_deployment(deployment_1)
+    assert not resource.remove_deployment(deployment_1)
+    assert resource.get_idle_cpu() == 1.5
+    assert resource.get_idle_memory() == 768
+
+    resource.clear_deployments()
+    assert resource.get_idle_cpu() == 2
+    assert resource.get_idle_memory() == 1024
+
+
+def test_resource_totals_from_init():
+    resource = ResourceEntity(name='test-node', memory=1024, cpu=2, deployments=[
+        DeploymentEntity(name='test-deployment-1', memory=512, cpu=1)
+    ])
+
+    assert resource.get_idle_cpu() == 1
+    assert resource.get_idle_memory() == 512
+    assert not resource.check_resources_fit(
+        DeploymentEntity(name='test-deployment-2', memory=1024, cpu=1))
+
+
+def test_cluster_state_fitting_nodes():
+    resources = [
+        ResourceEntity(name='test-node-1', memory=1024, cpu=1),
+        ResourceEntity(name='test-node-2', memory=2048, cpu=4),
+        ResourceEntity(name='test-node-3', memory=2048,
+                       cpu=4, labels={'node': '3'}),
+    ]
+    deployments = [
+        DeploymentEntity(name='test-deployment-1', memory=1024, cpu=2),
+        DeploymentEntity(name='test-deployment-2', memory=512,
+                         cpu=0.5, labels={'node': '3'}),
+    ]
+    state = ClusterState(resources, deployments)
+
+    assert list(state.fitting_nodes(0)) == [False, True, True]
+    assert list(state.fitting_nodes(1)) == [False, False, True]
+
+    state.place(0, 2)
+    assert list(state.fitting_nodes(0)) == [False, True, True]
+    state.place(1, 2)
+    assert list(state.fitting_nodes(0)) == [False, True, False]
+    # entities are only touched on apply
+    assert resources[2].get_deployments() == []
+
+    assert state.apply() == []
+    assert resources[2].get_deployments() == deployments
+
+    # capacity only state without labels
+    state = ClusterState(resources, deployments, labels=False)
+    assert list(state.eligible_nodes(1)) == [True, True, True]
+    assert list(state.idle_memory()) == [1024, 2048, 512]
+    assert resources[2].get_idle_cpu() == 1.5
+
+
+def test_label_index_select():
+    resources = [
+        ResourceEntity(name='test-node-1', memory=1024, cpu=1),
+        ResourceEntity(name='test-node-2', memory=1024, cpu=1,
+                       labels={'cloud': 'public', 'tier': 'edge'}),
+        ResourceEntity(name='test-node-3', memory=1024, cpu=1,
+                       labels={'cloud': 'public'}),
+    ]
+    index = LabelIndex.from_resources(resources)
+
+    assert list(LabelIndex.iter_ids(index.select({'cloud': 'public'}))) == [1, 2]
+    assert list(LabelIndex.iter_ids(
+        index.select({'cloud': 'public', 'tier': 'edge'}))) == [1]
+    assert index.select({'cloud': 'private'}) == 0
+    assert index.token({'a': 1, 'b': 2}) == index.token({'b': 2, 'a': 1})
+
+    index.update(2, resources[2].labels, {'cloud': 'public', 'tier': 'edge'})
+    index.update(1, resources[1].labels, None)
+    assert list(LabelIndex.iter_ids(
+        index.select({'cloud': 'public', 'tier': 'edge'}))) == [2]
+
+
+def test_resources_update_keeps_index():
+    resources = Resources()
+    resources.parse("""
+resources:
+  - name: node-1
+    cpu: 2
+    memory: 1024
+  - name: node-2
+    cpu: 2
+    memory: 1024
+    labels:
+      cloud: public
+""")
+    nodes = resources.get_resources()
+
+    resources.update("""
+resources:
+  - name: node-1
+    cpu: 2
+    memory: 1024
+    labels:
+      cloud: public
+""")
+
+    assert resources.get_resources() is nodes
+    assert len(nodes) == 1
+    assert resources.get_label_index().select({'cloud': 'public'}) == 1